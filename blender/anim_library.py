@@ -0,0 +1,374 @@
+"""
+anim_library.py — 3 体（kyuroku / bug / R4）共通のアニメーションクリップとリターゲット
+（bpy 不要・素の Python）
+
+クリップはリグに依存しない形で 1 回だけ書く:
+
+  - 関節は抽象名（scene.js の KYUROKU_JOINTS + Hips）
+  - 回転は (pitch, yaw, roll) ラジアン
+      pitch = 前後（前屈・脚/腕の前後スイング・肘膝の屈曲）
+      yaw   = ひねり（首振り・振り向き）
+      roll  = 左右（首かしげ・腕の開き）
+    値と符号は kyuroku（three.js の Euler XYZ, x=pitch / y=yaw / z=roll）に合わせる
+  - 'bob'   ルートの上下（m）
+  - 'blink' まばたき（0 = 開, 1 = 閉）
+
+リグごとの違いは RIGS に書く:
+
+  bones   抽象関節 → ボーン / ノード名
+  axes    抽象関節 → '+x+y+z' 形式の軸指定（pitch, yaw, roll の順に、書き込む
+          Euler 成分と符号）。無い関節は既定の '+x+y+z'
+  bob     (ボーン, プロパティ, 成分, 倍率) — 'bob' の書き先
+  blink   [(ボーン, プロパティ, 成分, 閉眼時の値)] — 'blink' の書き先。プロパティが
+          'weights' のときは成分がモーフターゲット名
+  morphs  ノード → モーフターゲット名の並び（face_morphs.py が作るターゲット）
+  names   クリップ名の別名（Unity の Animator ステート名など）
+  clips   書き出すクリップ
+
+retarget_all(rig) がリグ 1 つ分の全クリップを
+(名前, フレーム列, [(ボーン, プロパティ, [(x, y, z), ...]), ...]) で返し
+（'weights' は [(ターゲットごとの重み, ...), ...]）、
+各ビルドスクリプトがそれを書き込む:
+
+  kyuroku  kyuroku_clips.py  → glTF アニメーション（kyuroku.glb）
+  bug      animate_bug.py    → Blender Action（keyframes.write_clip）
+  R4       create_r4_character.py → Blender Action（同上）
+
+クリップを足す・変えるときはこのファイルだけを編集し、
+python3 blender/build.py で 3 体を並列に再ビルドする。
+
+使い方:
+  python anim_library.py            # リグ × クリップのチャンネル数・長さ
+  python anim_library.py --rig bug  # 指定リグのみ、ボーンごとの書き先も表示
+  python anim_library.py --locomotion  # 移動クリップの速度（ブレンドツリーのしきい値）
+"""
+import argparse
+import math
+import sys
+
+FPS = 30
+T_MAX = 120.0       # 周期合わせで許すクリップ長の上限（秒）
+ERR_OK = 0.02       # 許す周波数のずれ（相対）。この範囲で短いクリップ長を優先する
+
+BLINK_T = 1 / 3     # まばたき 1 回の長さ（秒）
+TURN_T = 1.0        # 振り向き（180°）の長さ（秒）
+LEG = 0.85          # 股関節の高さ（m, 身長 1.88 基準）
+RUN_SWING = 0.70    # Run の太ももの振り幅（rad）。ほかの移動クリップの動きの大きさの基準
+
+# 移動クリップ: 名前 → (歩幅 m/歩, ケイデンス 歩/秒)。速度 = 歩幅 × ケイデンス
+LOCOMOTION = {
+    'Walk': (0.65, 1.8),
+    'Jog':  (0.85, 2.0),
+    'Run':  (2 * LEG * math.sin(RUN_SWING), 7.0 / math.pi),
+}
+CONTACTS = (0.25, 0.75)     # 左足・右足の接地（周期に対する位置）
+
+
+# ──────────────────────────────────────────────────────────────────────
+# クリップ（s(ω) = sin(ω t)。戻り値は {関節: (pitch, yaw, roll)}、'bob'、'blink'）
+# ──────────────────────────────────────────────────────────────────────
+def idle(t, s):
+    return {'bob': s(1.1) * 0.018,
+            'Head': (0, s(0.66) * 0.07, s(0.52) * 0.03),
+            'Spine': (s(0.7) * 0.008, 0, 0),
+            'UpperArmL': (0.06, 0, 0.10), 'UpperArmR': (0.06, 0, -0.10),
+            'LowerArmL': (0.12, 0, 0), 'LowerArmR': (0.12, 0, 0)}
+
+
+def locomotion(stride, cadence):
+    """歩幅（m/歩）とケイデンス（歩/秒）から移動サイクルを作る。戻り値: (関数, 角周波数)
+
+    1 周期 = 2 歩。太ももの振り幅は歩幅と股下（LEG）から決め、体の前傾・膝・腕の
+    振り・上下動は Run（振り幅 RUN_SWING）に対する比で縮める。位相はどの速度でも
+    同じ（左足の接地 = 周期の 1/4、右足 = 3/4）なので、同じ正規化時刻で再生すれば
+    速度でブレンドしても足が滑らない。
+    """
+    w = math.pi * cadence
+    swing = math.asin(min(1.0, stride / (2 * LEG)))
+    k = swing / RUN_SWING
+
+    def fn(t, s):
+        ph = s(w)
+        return {'bob': (abs(ph) * 0.055 - 0.022) * k,
+                'Spine': (-0.14 * k, 0, 0), 'Head': (0.10 * k, 0, 0),
+                'ThighL': (ph * swing, 0, 0), 'ThighR': (-ph * swing, 0, 0),
+                'ShinL': (max(0, -ph) * 0.85 * k, 0, 0), 'ShinR': (max(0, ph) * 0.85 * k, 0, 0),
+                'FootL': ((-0.20 + ph * 0.20) * k, 0, 0), 'FootR': ((-0.20 - ph * 0.20) * k, 0, 0),
+                'UpperArmL': (-ph * 0.60 * k, 0, 0.10 + 0.06 * k),
+                'UpperArmR': (ph * 0.60 * k, 0, -0.10 - 0.06 * k),
+                'LowerArmL': ((0.45 + max(0, ph) * 0.45) * k, 0, 0),
+                'LowerArmR': ((0.45 + max(0, -ph) * 0.45) * k, 0, 0)}
+    return fn, (w,)
+
+
+def talk(t, s):
+    return {'bob': s(4.2) * 0.012,
+            'Head': (s(4.2) * 0.13, s(2.6) * 0.09, 0),
+            'Spine': (-0.06, 0, 0),
+            'UpperArmR': (-0.58 + s(4.2) * 0.16, 0, -0.32),
+            'LowerArmR': (0.70 + s(4.2) * 0.14, 0, 0),
+            'UpperArmL': (0.05, 0, 0.14), 'LowerArmL': (0.15, 0, 0)}
+
+
+def listen(t, s):
+    return {'bob': s(0.9) * 0.010,
+            'Spine': (-0.09, 0, 0),
+            'Head': (-0.07, s(0.48) * 0.04, 0.145),
+            'UpperArmL': (0.04, 0, 0.14), 'UpperArmR': (0.04, 0, -0.14),
+            'LowerArmL': (0.12, 0, 0), 'LowerArmR': (0.12, 0, 0)}
+
+
+def think(t, s):
+    return {'bob': s(0.8) * 0.010,
+            'Head': (0.09, s(0.55) * 0.05, -0.16),
+            'Spine': (-0.05, 0, 0),
+            'UpperArmR': (-0.82, 0, -0.58), 'LowerArmR': (1.12, 0, 0),
+            'UpperArmL': (0.06, 0, 0.14), 'LowerArmL': (0.18, 0, 0)}
+
+
+def blink(t, s):
+    return {'blink': min(1.0, math.sin(math.pi * t / BLINK_T) * 7)}
+
+
+def turn(t, s):
+    return {'Hips': (0, -math.pi * t / TURN_T, 0)}
+
+
+# 名前: (関数, 式に含まれる角周波数のタプル = ループ / 数値 = ループしない長さ（秒）)
+CLIPS = {
+    'Idle':   (idle,   (1.1, 0.66, 0.52, 0.7)),
+    **{name: locomotion(*p) for name, p in LOCOMOTION.items()},
+    'Talk':   (talk,   (4.2, 2.6)),
+    'Listen': (listen, (0.9, 0.48)),
+    'Think':  (think,  (0.8, 0.55)),
+    'Blink':  (blink,  BLINK_T),
+    'Turn':   (turn,   TURN_T),
+}
+
+JOINTS = ('Hips', 'Spine', 'Head',
+          'UpperArmL', 'UpperArmR', 'LowerArmL', 'LowerArmR', 'HandL', 'HandR',
+          'ThighL', 'ThighR', 'ShinL', 'ShinR', 'FootL', 'FootR')
+
+
+def clip_info(name, duration=None):
+    """クリップのメタデータ（glb_meta が clips[] に足す）。移動クリップは速度・歩幅・
+    ケイデンス・接地位置、それ以外は空
+
+    duration（GLB のクリップ長, 秒）がこのライブラリの長さと半フレーム以上違えば
+    別物（ライブラリ以前の書き出し・FPS 違い）なので空を返す。
+    """
+    if name not in LOCOMOTION:
+        return {}
+    if duration is not None and abs(duration - clip_length(name)) > 0.5 / FPS:
+        return {}
+    stride, cadence = LOCOMOTION[name]
+    return {'speed': round(stride * cadence, 4), 'stride': round(stride, 4),
+            'cadence': round(cadence, 4), 'contacts': list(CONTACTS)}
+
+
+# ──────────────────────────────────────────────────────────────────────
+# リグ
+# ──────────────────────────────────────────────────────────────────────
+# kyuroku: glTF ノード（Empty 階層）。回転は three.js と同じ Euler XYZ
+KYUROKU = {
+    'bones': {j: j for j in JOINTS if j != 'Hips'},
+    'axes': {},
+    'bob': ('CharRoot', 'location', 1, 1.0),
+    # 目と口はモーフターゲット（face_morphs.py）。まばたきは重み 1 本
+    'blink': [('EyeL', 'weights', 'Blink', 1.0), ('EyeR', 'weights', 'Blink', 1.0)],
+    'morphs': {'EyeL': ('Blink',), 'EyeR': ('Blink',),
+               'Mouth': ('Open', 'A', 'I', 'U', 'E', 'O')},
+    'names': {},
+    'clips': ('Idle', 'Walk', 'Jog', 'Run', 'Talk', 'Listen', 'Think', 'Blink'),
+}
+
+# bug: Biped リグ（animate_bug.py の骨軸の分析結果）
+#   上腕は local Z が前後スイング、local X が開き（左右で符号が逆）
+#   スネ・足首・頭の左右は kyuroku と符号が逆
+BUG = {
+    'bones': {
+        'Hips': 'Bip Pelvis_02', 'Spine': 'Bip Spine1_010', 'Head': 'Bip Head_031',
+        'UpperArmL': 'Bip L UpperArm_012', 'UpperArmR': 'Bip R UpperArm_035',
+        'LowerArmL': 'Bip L Forearm_013', 'LowerArmR': 'Bip R Forearm_036',
+        'HandL': 'Bip L Hand_014', 'HandR': 'Bip R Hand_037',
+        'ThighL': 'Bip L Thigh_03', 'ThighR': 'Bip R Thigh_06',
+        'ShinL': 'Bip L Calf_04', 'ShinR': 'Bip R Calf_07',
+        'FootL': 'Bip L Foot_05', 'FootR': 'Bip R Foot_08',
+    },
+    'axes': {
+        'Head': '+x+y-z',
+        'UpperArmL': '+z+y+x', 'UpperArmR': '-z+y-x',
+        'ShinL': '-x+y+z', 'ShinR': '-x+y+z',
+        'FootL': '-x+y+z', 'FootR': '-x+y+z',
+    },
+    'bob': None,        # ルートはスキンの正規化用 Empty（BugRoot）なので揺らさない
+    # まぶた: rotation_euler.y が L は正値、R は負値で閉眼
+    'blink': [('Bone Eyelid_L_032', 'rotation_euler', 1, 0.50),
+              ('Bone Eyelid_R_033', 'rotation_euler', 1, -0.50)],
+    'morphs': {},
+    'names': {},
+    'clips': ('Idle', 'Walk', 'Jog', 'Run', 'Talk', 'Listen', 'Think', 'Blink'),
+}
+
+# R4: Blender のボーン（体幹は上向き・roll 0 なので local Y = 上、X = 左右軸）
+#   腕の開き（roll）は kyuroku と符号が逆
+R4 = {
+    'bones': {
+        'Hips': 'Hips', 'Spine': 'Spine', 'Head': 'Head',
+        'UpperArmL': 'UpperArm_L', 'UpperArmR': 'UpperArm_R',
+        'LowerArmL': 'LowerArm_L', 'LowerArmR': 'LowerArm_R',
+        'HandL': 'Hand_L', 'HandR': 'Hand_R',
+        'ThighL': 'UpperLeg_L', 'ThighR': 'UpperLeg_R',
+        'ShinL': 'LowerLeg_L', 'ShinR': 'LowerLeg_R',
+        'FootL': 'Foot_L', 'FootR': 'Foot_R',
+    },
+    'axes': {
+        'UpperArmL': '+x+y-z', 'UpperArmR': '+x+y-z',
+    },
+    'bob': ('Hips', 'location', 1, 1.0),
+    'blink': [],
+    'morphs': {},
+    # Unity の Animator ステート名（README の Animator Controller 設定）
+    'names': {'Talk': 'Talking', 'Listen': 'Listening'},
+    'clips': ('Idle', 'Walk', 'Jog', 'Run', 'Turn', 'Talk', 'Listen', 'Think'),
+}
+
+RIGS = {'kyuroku': KYUROKU, 'bug': BUG, 'r4': R4}
+
+REST = {'rotation_euler': (0.0, 0.0, 0.0), 'location': (0.0, 0.0, 0.0),
+        'scale': (1.0, 1.0, 1.0)}
+
+
+def rest(rig, bone, prop):
+    """チャンネルの静止値。'weights' はノードのターゲット数だけの 0"""
+    if prop == 'weights':
+        return (0.0,) * len(rig['morphs'][bone])
+    return REST[prop]
+
+
+def parse_axes(spec):
+    """'+z+y-x' → [(成分, 符号)] × (pitch, yaw, roll)"""
+    return [('xyz'.index(spec[i + 1]), -1.0 if spec[i] == '-' else 1.0)
+            for i in range(0, 6, 2)]
+
+
+# ──────────────────────────────────────────────────────────────────────
+# サンプリング
+# ──────────────────────────────────────────────────────────────────────
+def loop_period(omegas, fps=FPS, t_max=T_MAX, err_ok=ERR_OK):
+    """全周波数が整数周期で収まる、整数フレームの長さ T と丸めた周波数
+
+    誤差が err_ok 以下になる最短の T から +5% の範囲で誤差が最小の T を選ぶ。
+    t_max までのどの長さでも err_ok を超えるなら ValueError（周波数を黙って
+    ずらさない。式の周波数か T_MAX を見直す）。
+    戻り値: (T, {ω: 丸めた ω}, 最大の相対誤差)
+    """
+    def fit(T):
+        snap = {w: 2 * math.pi * max(1, round(w * T / (2 * math.pi))) / T for w in omegas}
+        return T, snap, max(abs(snap[w] - w) / w for w in omegas)
+
+    cands = [fit(n / fps) for n in range(1, int(t_max * fps) + 1)]
+    ok = [c for c in cands if c[2] <= err_ok]
+    if not ok:
+        T, _, err = min(cands, key=lambda c: c[2])
+        raise ValueError(f'frequencies {omegas} do not loop within {t_max:g}s '
+                         f'(best {T:.2f}s is off by {err:.1%} > {err_ok:.0%})')
+    return min((c for c in ok if c[0] <= ok[0][0] * 1.05), key=lambda c: c[2])
+
+
+def _period(name, fps=FPS):
+    """(長さ T, {ω: 丸めた ω}, 周波数の誤差)"""
+    spec = CLIPS[name][1]
+    if isinstance(spec, tuple):
+        return loop_period(spec, fps)
+    return spec, {}, 0.0
+
+
+def clip_length(name, fps=FPS):
+    """書き出されるクリップの長さ（秒）。整数フレームに丸めたもの"""
+    return max(1, round(_period(name, fps)[0] * fps)) / fps
+
+
+def sample(name, fps=FPS):
+    """クリップを整数フレームでサンプリング。(フレーム列, [各フレームの dict], 周波数の誤差)"""
+    fn = CLIPS[name][0]
+    T, snap, err = _period(name, fps)
+    n = max(1, round(T * fps))
+    frames = list(range(n + 1))     # 末尾 = 先頭と同じ位相（ループの継ぎ目を一致させる）
+    poses = [fn(f * T / n, lambda w, t=f * T / n: math.sin(snap.get(w, w) * t))
+             for f in frames]
+    return frames, poses, err
+
+
+# ──────────────────────────────────────────────────────────────────────
+# リターゲット
+# ──────────────────────────────────────────────────────────────────────
+def retarget(name, rig, fps=FPS):
+    """抽象クリップ name を rig（RIGS の値）のチャンネルにする
+
+    戻り値: (リグでのクリップ名, フレーム列,
+             [(ボーン, プロパティ, [(x, y, z), ...]), ...], 周波数の誤差)
+    location は静止位置からのオフセット、scale は静止スケールに掛ける値
+    """
+    frames, poses, err = sample(name, fps)
+    out = {}            # (ボーン, プロパティ) → フレームごとの [x, y, z]
+
+    def put(bone, prop, f, comp, value):
+        if prop == 'weights':
+            comp = rig['morphs'][bone].index(comp)
+        if (bone, prop) not in out:
+            out[bone, prop] = [list(rest(rig, bone, prop)) for _ in frames]
+        out[bone, prop][f][comp] = value
+
+    for f, pose in enumerate(poses):
+        for key, value in pose.items():
+            if key == 'bob':
+                if rig['bob']:
+                    bone, prop, comp, k = rig['bob']
+                    put(bone, prop, f, comp, value * k)
+            elif key == 'blink':
+                for bone, prop, comp, closed in rig['blink']:
+                    # 静止値は weights が 0、ほかは REST の成分
+                    base = 0.0 if prop == 'weights' else REST[prop][comp]
+                    put(bone, prop, f, comp, base + (closed - base) * value)
+            elif key in rig['bones']:
+                for (comp, sign), v in zip(parse_axes(rig['axes'].get(key, '+x+y+z')), value):
+                    put(rig['bones'][key], 'rotation_euler', f, comp, sign * v)
+    channels = [(bone, prop, [tuple(r) for r in rows]) for (bone, prop), rows in out.items()]
+    return rig['names'].get(name, name), frames, channels, err
+
+
+def retarget_all(rig, fps=FPS):
+    """リグ（名前か RIGS の値）の全クリップを retarget する"""
+    if isinstance(rig, str):
+        rig = RIGS[rig]
+    return [retarget(name, rig, fps) for name in rig['clips']]
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(prog='anim_library.py')
+    ap.add_argument('--rig', choices=tuple(RIGS))
+    ap.add_argument('--fps', type=int, default=FPS)
+    ap.add_argument('--locomotion', action='store_true',
+                    help='移動クリップの速度・歩幅・ケイデンスと Run に対する速度比を表示')
+    args = ap.parse_args(argv)
+    if args.locomotion:
+        top = clip_info('Run')['speed']
+        print(f"  {'clip':<8}{'speed':>9}{'stride':>9}{'cadence':>9}{'/Run':>7}")
+        for name in LOCOMOTION:
+            i = clip_info(name)
+            print(f"  {name:<8}{i['speed']:7.2f}m/s{i['stride']:7.2f}m{i['cadence']:7.2f}/s"
+                  f"{i['speed'] / top:7.2f}")
+        return
+    for key in ([args.rig] if args.rig else RIGS):
+        print(f'  {key}')
+        for name, frames, channels, err in retarget_all(key, args.fps):
+            print(f"    {name:<10}{frames[-1] / args.fps:7.2f}s  {len(frames):5} frames"
+                  f"  {len(channels):3} channels" + (f"  (freq {err:+.1%})" if err else ''))
+            if args.rig:
+                for bone, prop, _ in channels:
+                    print(f'        {bone} .{prop}')
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,278 @@
+"""
+anim_optimize.py — エクスポート済み GLB のアニメーション軽量化パス
+
+Blender の glTF エクスポーターは Euler 回転を必ずサンプリングし、
+アーマチュアの全ボーンに T/R/S チャンネルを書き出す。
+（インポートしたリグはポーズのずれが全クリップ共通の一定値として毎クリップ出る）
+そこで書き出し直後の GLB に対して以下を行う:
+
+  0. 全クリップで同じ一定値のチャンネルは、その値をノードの TRS（レスト値）に移す
+  1. レスト値（ノードの TRS）から動かないチャンネルを削除
+     → three.js の AnimationMixer はトラックの無いプロパティを元の値に保つ
+  2. クリップ内で一定値のチャンネル（保持ポーズ）は STEP の 1 キーに縮約
+     （クリップの末尾まで動くチャンネルが無いときは長さを保つため先頭/末尾の 2 キー）
+  3. LINEAR サンプラーは線形補間（回転は slerp）で再現できるキーを削除
+     （Douglas–Peucker 方式、回転の誤差は角度 = tol_deg で判定）。曲がりの
+     大きい所だけキーが残るので、サンプリング間隔が曲率に合わせて変わる
+     weights（モーフターゲットの重み）はキーごとに全ターゲットの組で判定する
+  4. STEP サンプラーは直前と同じ値のキーを削除
+
+0〜2 で AnimationMixer が毎フレーム補間するトラック数自体が減る（bug は
+1 クリップ 201 → 5〜14 トラック）。回転の出力は後段の glb_optimize が int16 にする。
+
+使い方:
+  python anim_optimize.py in.glb [-o out.glb] [--tol-deg 0.25]
+"""
+import argparse
+import math
+import os
+import sys
+
+import glb
+
+
+# ── 誤差関数 ─────────────────────────────────────────────────────────
+def quat_angle(a, b):
+    """2 つのクォータニオン間の回転角（rad）。int16 から読んだ長さ ≠ 1 の値も正規化して比べる"""
+    n = math.sqrt(sum(x * x for x in a) * sum(y * y for y in b)) or 1.0
+    d = abs(sum(x * y for x, y in zip(a, b))) / n
+    return 2.0 * math.acos(min(1.0, d))
+
+
+def slerp(a, b, u):
+    d = sum(x * y for x, y in zip(a, b))
+    if d < 0.0:
+        b, d = tuple(-x for x in b), -d
+    if d > 0.9995:
+        q = tuple(x + (y - x) * u for x, y in zip(a, b))
+    else:
+        th = math.acos(d)
+        s = math.sin(th)
+        wa, wb = math.sin((1 - u) * th) / s, math.sin(u * th) / s
+        q = tuple(wa * x + wb * y for x, y in zip(a, b))
+    n = math.sqrt(sum(x * x for x in q)) or 1.0
+    return tuple(x / n for x in q)
+
+
+def lerp(a, b, u):
+    return tuple(x + (y - x) * u for x, y in zip(a, b))
+
+
+def dist(a, b):
+    return math.sqrt(sum((x - y) ** 2 for x, y in zip(a, b)))
+
+
+REST = {'translation': (0.0, 0.0, 0.0), 'rotation': (0.0, 0.0, 0.0, 1.0),
+        'scale': (1.0, 1.0, 1.0)}
+
+
+def metric(path, tol_deg, tol_pos):
+    """(補間関数, 誤差関数, 許容誤差) を返す"""
+    if path == 'rotation':
+        return slerp, quat_angle, math.radians(tol_deg)
+    if path == 'weights':
+        return lerp, lambda a, b: max(abs(x - y) for x, y in zip(a, b)), 1e-3
+    return lerp, dist, tol_pos
+
+
+# ── キー削減 ─────────────────────────────────────────────────────────
+def reduce_keys(times, values, interp, err, tol):
+    """端点を残し、補間で tol 以内に再現できる中間キーを削る。残すインデックスを返す"""
+    keep = {0, len(times) - 1}
+    stack = [(0, len(times) - 1)]
+    while stack:
+        i, j = stack.pop()
+        if j - i < 2:
+            continue
+        worst, wk = -1.0, -1
+        span = times[j] - times[i]
+        for k in range(i + 1, j):
+            u = (times[k] - times[i]) / span if span else 0.0
+            e = err(values[k], interp(values[i], values[j], u))
+            if e > worst:
+                worst, wk = e, k
+        if worst > tol:
+            keep.add(wk)
+            stack += [(i, wk), (wk, j)]
+    return sorted(keep)
+
+
+def rest_value(g, node, path):
+    if path == 'weights':
+        # ノードの weights → メッシュの weights → 全ターゲット 0
+        mesh = g['meshes'][node['mesh']] if 'mesh' in node else {}
+        n = len(mesh.get('primitives', [{}])[0].get('targets', []))
+        return tuple(node.get('weights', mesh.get('weights', (0.0,) * n)))
+    return tuple(node.get(path, REST.get(path, ())))
+
+
+def _channel(asset, an, ch):
+    """(サンプラー, 時刻列, キーごとの値) を返す"""
+    s = an['samplers'][ch['sampler']]
+    times = [t[0] for t in asset.read(s['input'])]
+    values = asset.read(s['output'])
+    if ch['target']['path'] == 'weights':
+        # 出力はキーごとに全ターゲットの重みが並んだスカラー列 → キーごとの tuple に
+        n = len(values) // len(times)
+        values = [tuple(v[0] for v in values[i * n:(i + 1) * n]) for i in range(len(times))]
+    return s, times, values
+
+
+def _constant(s, values, err, tol):
+    return s.get('interpolation', 'LINEAR') != 'CUBICSPLINE' \
+        and all(err(v, values[0]) <= tol for v in values)
+
+
+# ── レスト値への移動 ─────────────────────────────────────────────────
+def hoist(asset, tol_deg=0.25, tol_pos=1e-4):
+    """全クリップで同じ一定値を取る T/R/S チャンネルの値をノードの TRS に書く
+
+    optimize の「レスト値と同じ一定値は削除」でそのまま消えるようになる。
+    どれかのクリップに無い・動く・値が違うチャンネルと matrix を持つノードは
+    そのまま（トラックが無いクリップの見た目が変わるため）。戻り値: 移した数
+    """
+    g = asset.gltf
+    anims = g.get('animations', [])
+    seen = {}           # (ノード, path) → クリップごとの一定値（動くなら None）
+    for an in anims:
+        for ch in an['channels']:
+            path = ch['target']['path']
+            if path == 'weights' or 'node' not in ch['target']:
+                continue
+            s, _, values = _channel(asset, an, ch)
+            _, err, tol = metric(path, tol_deg, tol_pos)
+            seen.setdefault((ch['target']['node'], path), []).append(
+                values[0] if _constant(s, values, err, tol) else None)
+    n = 0
+    for (ni, path), vals in seen.items():
+        node = g['nodes'][ni]
+        _, err, tol = metric(path, tol_deg, tol_pos)
+        if len(vals) != len(anims) or None in vals or 'matrix' in node \
+                or any(err(v, vals[0]) > tol for v in vals):
+            continue
+        v = vals[0]
+        if err(v, rest_value(g, node, path)) <= tol:
+            continue
+        if path == 'rotation':
+            m = math.sqrt(sum(x * x for x in v)) or 1.0
+            v = tuple(x / m for x in v)
+        node[path] = list(v)
+        n += 1
+    return n
+
+
+def optimize(asset, tol_deg=0.25, tol_pos=1e-4):
+    """asset (glb.Asset) のアニメーションを書き換えて、クリップごとの統計を返す
+
+    戻り値: {clip: dict(bytes_before, bytes_after, channels_before,
+                        channels_after, keys_before, keys_after)}
+    """
+    g = asset.gltf
+    hoist(asset, tol_deg, tol_pos)
+    report = {}
+    for an in g.get('animations', []):
+        before = _clip_bytes(asset, an)
+        st = {'bytes_before': before, 'channels_before': len(an['channels']),
+              'keys_before': sum(g['accessors'][s['input']]['count'] for s in an['samplers'])}
+
+        chans = [(ch, *_channel(asset, an, ch)) for ch in an['channels']]
+        end = max((times[-1] for _, _, times, _ in chans), default=0.0)
+        # 末尾まで動くチャンネルがあればクリップ長はそれで決まり、保持ポーズは 1 キーでよい
+        spans = False
+        for ch, s, times, values in chans:
+            _, err, tol = metric(ch['target']['path'], tol_deg, tol_pos)
+            spans |= times[-1] >= end - 1e-6 and not _constant(s, values, err, tol)
+
+        inputs = {}          # 時刻列 → アクセサ（同じ時刻列は共有）
+        channels, samplers = [], []
+        for ch, s, times, values in chans:
+            path = ch['target']['path']
+            interp, err, tol = metric(path, tol_deg, tol_pos)
+            mode = s.get('interpolation', 'LINEAR')
+
+            if mode == 'CUBICSPLINE':
+                keep = list(range(len(times)))
+            elif _constant(s, values, err, tol):
+                # 一定値チャンネル → レスト値なら削除、そうでなければ STEP の 1（2）キー
+                node = g['nodes'][ch['target']['node']]
+                rest = rest_value(g, node, path)
+                if rest and err(values[0], rest) <= tol:
+                    continue
+                keep = [0] if spans else sorted({0, len(times) - 1})
+                mode = 'STEP'
+            elif mode == 'LINEAR':
+                keep = reduce_keys(times, values, interp, err, tol)
+            else:
+                # STEP: 直前と同じ値のキーは無くても同じ（末尾はクリップ長のため残す）
+                keep = [i for i in range(len(times))
+                        if i in (0, len(times) - 1) or err(values[i], values[i - 1]) > tol]
+
+            if len(keep) == len(times):
+                inp, out = s['input'], s['output']
+            else:
+                key = tuple(times[i] for i in keep)
+                if key not in inputs:
+                    inputs[key] = asset.add_accessor([(t,) for t in key], minmax=True)
+                inp = inputs[key]
+                rows = [values[i] for i in keep]
+                if path == 'weights':
+                    rows = [(w,) for r in rows for w in r]
+                out = asset.add_accessor(rows)
+            samplers.append({'input': inp, 'output': out, 'interpolation': mode})
+            channels.append({'sampler': len(samplers) - 1, 'target': ch['target']})
+
+        an['channels'], an['samplers'] = channels, samplers
+        st['channels_after'] = len(channels)
+        st['keys_after'] = sum(g['accessors'][s['input']]['count'] for s in samplers)
+        report[an.get('name', str(len(report)))] = st
+
+    asset.compact()
+    for an in g.get('animations', []):
+        report[an.get('name')]['bytes_after'] = _clip_bytes(asset, an)
+    return report
+
+
+def _clip_bytes(asset, an):
+    """クリップが参照するアクセサの総バイト数（共有入力は 1 回だけ数える）"""
+    used = {s['input'] for s in an['samplers']} | {s['output'] for s in an['samplers']}
+    return sum(asset.accessor_nbytes(i) for i in used)
+
+
+def print_report(report, size_before=None, size_after=None):
+    print(f"  {'clip':<8}{'channels':>14}{'keys':>14}{'bytes':>20}{'saved':>10}")
+    for name, st in report.items():
+        saved = st['bytes_before'] - st['bytes_after']
+        print(f"  {name:<8}{st['channels_before']:>6} → {st['channels_after']:<5}"
+              f"{st['keys_before']:>6} → {st['keys_after']:<5}"
+              f"{st['bytes_before']:>9} → {st['bytes_after']:<8}{saved:>10}")
+    if size_before is not None:
+        print(f"  file: {size_before} → {size_after} bytes "
+              f"(-{size_before - size_after})")
+
+
+def optimize_file(src, dst=None, tol_deg=0.25, tol_pos=1e-4, verbose=True):
+    asset = glb.Asset.load(src)
+    before = os.path.getsize(src)
+    report = optimize(asset, tol_deg, tol_pos)
+    after = asset.save(dst or src)
+    if verbose:
+        print(f"[anim_optimize] {os.path.basename(src)}  tol={tol_deg}°")
+        print_report(report, before, after)
+    return report
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(prog='anim_optimize.py')
+    ap.add_argument('src')
+    ap.add_argument('-o', '--out')
+    ap.add_argument('--tol-deg', type=float, default=0.25)
+    ap.add_argument('--tol-pos', type=float, default=1e-4)
+    args = ap.parse_args(argv)
+    try:
+        optimize_file(args.src, args.out, args.tol_deg, args.tol_pos)
+    except ValueError as e:
+        sys.exit(f'anim_optimize: {e}')
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
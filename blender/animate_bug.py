@@ -2,70 +2,131 @@
 animate_bug.py — Mega Man X DiVE bug style モデルにアニメーションを追加
 出力: public/models/bug_animated.glb
 
-骨軸の分析結果:
+クリップは anim_library.py（3 体共通）のものをこのリグにリターゲットして書く。
+ボーン名と軸の対応は anim_library.BUG。骨軸の分析結果:
   脊椎/腰/頭     : rotation_euler.x = 前後リーン
   太もも/スネ/足  : rotation_euler.x = 前後スイング
   上腕           : rotation_euler.z = 前後スイング（local Z ≈ 世界上方）
   前腕           : rotation_euler.x = 肘屈曲
   まぶたL        : rotation_euler.y = 正値で閉眼
   まぶたR        : rotation_euler.y = 負値で閉眼
+
+オプション（"--" 以降に指定）:
+  --keys layer|insert  キー書き込み経路（既定: layer = F カーブ一括書き込み）
+  --bench N            両経路で全クリップを N 回ずつ作成して時間を比較（エクスポートなし）
+  --tol-deg DEG        書き出し後のキー削減の角度許容誤差（既定 0.25°）
+  --no-optimize        書き出し後のチャンネル削除・キー削減（anim_optimize）と
+                       量子化・重複除去（glb_optimize）を行わない
+  --meshopt            glb_optimize で EXT_meshopt_compression も掛ける
+  --decimate RATIO     書き出し前にメッシュを Decimate（LOD 用: 0.5 / 0.25 など、既定 1.0 = なし）
+  --src PATH           元 GLB（既定: SRC）
+  --reimport           元 GLB の前処理キャッシュ（.buildcache/bug-source/）を使わずインポートし直す
+  --out PATH           出力 GLB（既定: OUT）
+  --stage all|actions|glb  ステージ単位で実行（build.py のインクリメンタルビルド用）
+                         actions: インポート + 全クリップ作成 → --save の .blend
+                         glb    : --load の .blend を開いて書き出し + 最適化
+  --profile DIR        フェーズごとの計測を DIR に書く（instrument.py、--cprofile 併用可）
 """
-import bpy, math
+import bpy, hashlib, inspect, os, sys, time, argparse
 
-SRC = '/Users/matsumuratakumi/R4/public/models/megaman_x_dive_mmexe_bug_style.glb'
-OUT = '/Users/matsumuratakumi/R4/public/models/bug_animated.glb'
-FPS = 30
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from keyframes import InsertKeys, KeyLayer, write_clip
+import anim_library, scene_reset, anim_optimize, glb_optimize, glb_meta, instrument
 
-# ── ボーン名 ──────────────────────────────────────────────────────────
-HEAD = 'Bip Head_031'
-SP0  = 'Bip Spine_09'
-SP1  = 'Bip Spine1_010'
-PEL  = 'Bip Pelvis_02'
-LTH  = 'Bip L Thigh_03'
-RTH  = 'Bip R Thigh_06'
-LCA  = 'Bip L Calf_04'
-RCA  = 'Bip R Calf_07'
-LFT  = 'Bip L Foot_05'
-RFT  = 'Bip R Foot_08'
-LUA  = 'Bip L UpperArm_012'
-RUA  = 'Bip R UpperArm_035'
-LFA  = 'Bip L Forearm_013'
-RFA  = 'Bip R Forearm_036'
-LEY  = 'Bone Eyelid_L_032'
-REY  = 'Bone Eyelid_R_033'
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SRC = os.path.join(ROOT, 'public', 'models', 'megaman_x_dive_mmexe_bug_style.glb')
+OUT = os.path.join(ROOT, 'public', 'models', 'bug_animated.glb')
+FPS = anim_library.FPS
 
-ALL_BONES = [HEAD, SP0, SP1, PEL,
-             LTH, RTH, LCA, RCA, LFT, RFT,
-             LUA, RUA, LFA, RFA, LEY, REY]
+# 元 GLB の前処理キャッシュ（元 GLB のハッシュごとに 1 つの .blend）
+SOURCE_CACHE = os.path.join(ROOT, '.buildcache', 'bug-source')
+CHAR_H = 1.88        # 正規化後の身長（最上部ボーン〜最下部ボーン, m）
 
 # ── シーンクリア＆インポート ──────────────────────────────────────────
-bpy.ops.object.select_all(action='SELECT')
-bpy.ops.object.delete()
-bpy.ops.import_scene.gltf(filepath=SRC)
-
-arm = next((o for o in bpy.data.objects if o.type == 'ARMATURE'), None)
-if not arm:
-    raise RuntimeError("Armature not found")
-
-bpy.context.view_layer.objects.active = arm
-bpy.ops.object.mode_set(mode='POSE')
+def source_cache_path(src):
+    """キャッシュのパス。元 GLB と前処理（normalize_source のソース・CHAR_H）で決まる"""
+    h = hashlib.sha256(f'{CHAR_H}:'.encode())
+    for fn in (normalize_source, find_armature):
+        h.update(inspect.getsource(fn).encode())
+    with open(src, 'rb') as f:
+        h.update(f.read())
+    return os.path.join(SOURCE_CACHE, f'source-{h.hexdigest()[:16]}.blend')
+
+def normalize_source(height=CHAR_H):
+    """ボーン位置で身長を測り、身長 height・足元 Z=0 にそろえる
+
+    元モデルはスキン頂点が Z≈-80 にあり、ボーンの位置でしか身長が取れない。
+    スキンメッシュとアーマチュアに transform_apply するとポーズボーンの移動量が
+    スケールされず崩れるので、新しいルート Empty（BugRoot）1 つの変換で合わせる。
+    書き出し後は glTF のルートノードの TRS になり、ランタイムの補正が要らなくなる。
+    戻り値: (倍率, 正規化前の最下部ボーン Z)
+    """
+    bpy.context.view_layer.update()
+    arm = find_armature()
+    zs = [(arm.matrix_world @ pb.head).z for pb in arm.pose.bones
+          if pb.name.startswith(('Bip', 'Bone'))]
+    lo, hi = min(zs), max(zs)
+    s = height / (hi - lo) if hi - lo > 0.5 else 1.0
+
+    root = bpy.data.objects.new('BugRoot', None)
+    bpy.context.scene.collection.objects.link(root)
+    for o in bpy.data.objects:
+        if o.parent is None and o is not root:
+            o.parent = root          # root は単位行列なので parent inverse も単位
+    root.scale = (s, s, s)
+    root.location = (0, 0, -lo * s)
+    # インポーターがボーン表示用に作る Icosphere（glTF_not_exported コレクション）を消す。
+    # キャッシュからはオブジェクトをシーン直下にリンクするので、残すと書き出しに混ざる
+    hidden = bpy.data.collections.get('glTF_not_exported')
+    if hidden:
+        for o in list(hidden.objects):
+            bpy.data.objects.remove(o)
+        bpy.data.collections.remove(hidden)
+    return s, lo
+
+def load_source(src=SRC, cache=True):
+    """元 GLB をシーンに読み込む
+
+    初回はインポートして normalize_source を掛け、その結果を
+    SOURCE_CACHE/source-<ハッシュ>.blend に書き出す。2 回目以降は
+    glTF インポーターを通さずその .blend からオブジェクトを append する。
+    """
+    scene_reset.reset()
+    # anim_library は FPS でキーを打つ。factory の 24fps のままだと 0.8 倍速で書き出される
+    bpy.context.scene.render.fps = FPS
+    bpy.context.scene.render.fps_base = 1
+    path = source_cache_path(src)
+    if cache and os.path.exists(path):
+        with bpy.data.libraries.load(path, link=False) as (lib, dst):
+            dst.objects = list(lib.objects)
+        for o in dst.objects:
+            bpy.context.scene.collection.objects.link(o)
+        print(f"[bug] source: {os.path.relpath(path, ROOT)} (cached)")
+    else:
+        bpy.ops.import_scene.gltf(filepath=src)
+        s, lo = normalize_source()
+        print(f"[bug] source: imported {os.path.basename(src)}  scale {s:.5f}, floor {lo:.3f}")
+        if cache:
+            # LOD バリアントが並列で同時に書くことがあるので一時名から rename
+            os.makedirs(SOURCE_CACHE, exist_ok=True)
+            part = f'{path[:-6]}.{os.getpid()}.blend'
+            bpy.data.libraries.write(part, set(bpy.data.objects), fake_user=True)
+            os.replace(part, path)
+
+    arm = find_armature()
+    bpy.ops.object.mode_set(mode='POSE')
+    return arm
+
+def find_armature():
+    arm = next((o for o in bpy.data.objects if o.type == 'ARMATURE'), None)
+    if not arm:
+        raise RuntimeError("Armature not found")
+
+    bpy.context.view_layer.objects.active = arm
+    return arm
 
 # ── ヘルパー ──────────────────────────────────────────────────────────
-def kf(name, xyz, frame):
-    """ボーンにEuler XYZキーフレームを挿入"""
-    pb = arm.pose.bones.get(name)
-    if not pb:
-        return
-    pb.rotation_mode = 'XYZ'
-    pb.rotation_euler = xyz
-    pb.keyframe_insert(data_path='rotation_euler', frame=frame)
-
-def kf_all_rest(frame):
-    """全ボーンをレスト（0,0,0）でキーフレーム"""
-    for n in ALL_BONES:
-        kf(n, (0, 0, 0), frame)
-
-def new_action(name):
+def new_action(arm, name):
     """新しいActionを作成してアームにバインド"""
     act = bpy.data.actions.new(name=name)
     if arm.animation_data is None:
@@ -78,186 +139,142 @@ def new_action(name):
     return act
 
 # ════════════════════════════════════════════════════════════════════════
-# IDLE  (2秒 = 60フレーム)
-# ════════════════════════════════════════════════════════════════════════
-new_action('Idle')
-F = FPS * 2  # 60
-
-# 開始ポーズ（0フレーム）
-kf_all_rest(0)
-kf(LUA, (0, 0,  0.12), 0)   # 腕を少し下ろす
-kf(RUA, (0, 0, -0.12), 0)
-kf(LFA, (0.20, 0, 0), 0)    # 肘わずかに曲げ
-kf(RFA, (0.20, 0, 0), 0)
-
-# 中間（30フレーム）: ゆったり揺れ
-kf(PEL,  (-0.018, 0,  0.008), 30)
-kf(SP1,  (-0.022, 0, -0.010), 30)
-kf(HEAD, (-0.015, 0,  0.055), 30)   # 頭を少し傾ける
-kf(LUA,  (0,      0,  0.18),  30)
-kf(RUA,  (0,      0, -0.18),  30)
-kf(LFA,  (0.22,   0,  0),     30)
-kf(RFA,  (0.22,   0,  0),     30)
-
-# まばたき（フレーム40〜50）
-kf(LEY, (0,  0.00, 0), 38)
-kf(REY, (0,  0.00, 0), 38)
-kf(LEY, (0,  0.50, 0), 44)   # 閉眼 (L:正値, R:負値)
-kf(REY, (0, -0.50, 0), 44)
-kf(LEY, (0,  0.00, 0), 50)
-kf(REY, (0,  0.00, 0), 50)
-
-# 終了（60フレーム）: 開始と同じ
-kf_all_rest(F)
-kf(LUA, (0, 0,  0.12), F)
-kf(RUA, (0, 0, -0.12), F)
-kf(LFA, (0.20, 0, 0), F)
-kf(RFA, (0.20, 0, 0), F)
-
-# ════════════════════════════════════════════════════════════════════════
-# RUN  (1秒 = 30フレーム)
+# クリップ（anim_library の共通クリップをこのリグにリターゲット）
 # ════════════════════════════════════════════════════════════════════════
-new_action('Run')
-F = FPS * 1  # 30
-STEPS = 30
-
-for i in range(STEPS + 1):
-    t  = i / STEPS
-    ph = t * math.pi * 2
-    f  = round(t * F)
-
-    s  = math.sin(ph)
-    c  = math.cos(ph)
-
-    # 上半身前傾
-    kf(PEL,  (-0.10, 0, 0), f)
-    kf(SP0,  (-0.12, 0, 0), f)
-    kf(SP1,  (-0.10, 0, 0), f)
-    kf(HEAD, (-0.06, 0, 0), f)
-
-    # 脚：左右交互
-    kf(LTH, ( s * 0.55, 0, 0), f)
-    kf(RTH, (-s * 0.55, 0, 0), f)
+CLIPS = tuple((clip[0], lambda k, clip=clip: write_clip(k, clip))
+              for clip in anim_library.retarget_all('bug', FPS))
+WRITERS = {'layer': KeyLayer, 'insert': InsertKeys}
+
+def author_all(arm, writer):
+    for name, fn in CLIPS:
+        act = new_action(arm, name)
+        act.use_fake_user = True   # .blend 保存時に未使用扱いで消えないように
+        k = writer(arm)
+        fn(k)
+        k.flush(act)
 
-    # 膝：後ろ脚のみ曲がる
-    kf(LCA, (-max(0, -s) * 0.65, 0, 0), f)
-    kf(RCA, (-max(0,  s) * 0.65, 0, 0), f)
-
-    # 足首
-    kf(LFT, (-s * 0.15, 0, 0), f)
-    kf(RFT, ( s * 0.15, 0, 0), f)
-
-    # 腕：脚と逆位相（z軸スイング）
-    kf(LUA, (0, 0, -s * 0.45), f)
-    kf(RUA, (0, 0, -s * 0.45), f)
-
-    # 肘：一定角度を保つ
-    kf(LFA, (0.65, 0, 0), f)
-    kf(RFA, (0.65, 0, 0), f)
-
-# ════════════════════════════════════════════════════════════════════════
-# TALK  (0.75秒 = 22フレーム)
 # ════════════════════════════════════════════════════════════════════════
-new_action('Talk')
-F = round(FPS * 0.75)  # 22
-
-kf_all_rest(0)
-kf(LUA, (0, 0,  0.12), 0)
-kf(RUA, (0, 0, -0.12), 0)
-
-# 頭・体ジェスチャー
-kf(SP1,  (-0.06, 0,     0),    5)
-kf(HEAD, ( 0.12, 0,     0.06), 5)    # 頭を上下 + 傾け
-kf(RUA,  (-0.55, 0,    -0.30), 5)    # 右腕を上げる
-kf(RFA,  ( 0.70, 0,     0),    5)    # 右肘を曲げる
-
-kf(SP1,  (-0.06, 0,     0),    11)
-kf(HEAD, (-0.10, 0,    -0.04), 11)
-kf(RUA,  (-0.55, 0,    -0.30), 11)
-kf(RFA,  ( 0.55, 0,     0),    11)
-
-kf(SP1,  (-0.06, 0,     0),    17)
-kf(HEAD, ( 0.08, 0,     0.05), 17)
-kf(RUA,  (-0.55, 0,    -0.30), 17)
-kf(RFA,  ( 0.65, 0,     0),    17)
-
-kf_all_rest(F)
-kf(LUA, (0, 0,  0.12), F)
-kf(RUA, (0, 0, -0.12), F)
-
-# ════════════════════════════════════════════════════════════════════════
-# LISTEN  (1.5秒 = 45フレーム)
-# ════════════════════════════════════════════════════════════════════════
-new_action('Listen')
-F = round(FPS * 1.5)  # 45
-
-kf_all_rest(0)
-kf(HEAD, (0,     0, -0.14), 0)   # 頭を傾ける
-kf(SP1,  (-0.08, 0,  0),    0)
-kf(LUA,  (0,     0,  0.12), 0)
-kf(RUA,  (0,     0, -0.12), 0)
-kf(LFA,  (0.18,  0,  0),    0)
-kf(RFA,  (0.18,  0,  0),    0)
-
-kf(HEAD, (-0.05, 0, -0.12), 22)  # ゆっくり揺れ
-kf(SP1,  (-0.06, 0,  0),    22)
-
-kf_all_rest(F)
-kf(HEAD, (0,     0, -0.14), F)
-kf(SP1,  (-0.08, 0,  0),    F)
-kf(LUA,  (0,     0,  0.12), F)
-kf(RUA,  (0,     0, -0.12), F)
-kf(LFA,  (0.18,  0,  0),    F)
-kf(RFA,  (0.18,  0,  0),    F)
-
-# ════════════════════════════════════════════════════════════════════════
-# THINK  (1.5秒 = 45フレーム)
+# GLBエクスポート（全アクションを NLA にベイクして出力）
 # ════════════════════════════════════════════════════════════════════════
-new_action('Think')
-F = round(FPS * 1.5)  # 45
+def decimate(arm, ratio):
+    """アーマチュア配下のメッシュに Collapse の Decimate を積む（書き出し時に適用）
 
-kf_all_rest(0)
-kf(HEAD, ( 0.08, 0, 0.16),  0)   # 考え込む
-kf(SP1,  (-0.05, 0, 0),     0)
-kf(LUA,  ( 0,    0, 0.12),  0)
-kf(RUA,  (-0.80, 0, -0.55), 0)   # 右腕を顎に当てる
-kf(RFA,  ( 1.10, 0, 0),     0)
-kf(LFA,  ( 0.18, 0, 0),     0)
+    Armature モディファイアより後ろに置くので、ウェイトは縮約後の頂点に補間される。
+    """
+    for o in arm.children_recursive:
+        if o.type == 'MESH':
+            mod = o.modifiers.new('LOD', 'DECIMATE')
+            mod.decimate_type = 'COLLAPSE'
+            mod.ratio = ratio
 
-kf(HEAD, ( 0.10, 0, 0.14), 22)   # ゆっくり揺れ
-kf(RFA,  ( 1.00, 0, 0),    22)
+def export_glb(arm, path):
+    bpy.ops.object.mode_set(mode='OBJECT')
 
-kf_all_rest(F)
-kf(HEAD, ( 0.08, 0, 0.16),  F)
-kf(SP1,  (-0.05, 0, 0),     F)
-kf(LUA,  ( 0,    0, 0.12),  F)
-kf(RUA,  (-0.80, 0, -0.55), F)
-kf(RFA,  ( 1.10, 0, 0),     F)
-kf(LFA,  ( 0.18, 0, 0),     F)
+    # すべてのアクションを NLA トラックに積む
+    if arm.animation_data is None:
+        arm.animation_data_create()
+    arm.animation_data.action = None   # 現在のアクションをデタッチ
+
+    for act in bpy.data.actions:
+        track = arm.animation_data.nla_tracks.new()
+        track.name = act.name
+        strip = track.strips.new(act.name, start=0, action=act)
+
+    bpy.ops.export_scene.gltf(
+        filepath            = path,
+        export_format       = 'GLB',
+        export_yup          = True,
+        export_animations   = True,
+        export_nla_strips   = True,
+        export_anim_single_armature = True,
+        # Euler のボーン回転はクォータニオンにするためサンプリングが要る。キーの間引き・
+        # 全クリップ共通の一定値のレスト値への移動・保持ポーズの STEP 化は anim_optimize
+        export_force_sampling = True,
+        export_apply        = True,    # LOD の Decimate を反映（Armature は除外される）
+        export_draco_mesh_compression_enable = False,
+    )
 
 # ════════════════════════════════════════════════════════════════════════
-# GLBエクスポート（全アクションを NLA にベイクして出力）
+# キー書き込み経路の比較（insert vs layer）
 # ════════════════════════════════════════════════════════════════════════
-bpy.ops.object.mode_set(mode='OBJECT')
-
-# すべてのアクションを NLA トラックに積む
-if arm.animation_data is None:
-    arm.animation_data_create()
-arm.animation_data.action = None   # 現在のアクションをデタッチ
-
-for act in bpy.data.actions:
-    track = arm.animation_data.nla_tracks.new()
-    track.name = act.name
-    strip = track.strips.new(act.name, start=0, action=act)
-
-bpy.ops.export_scene.gltf(
-    filepath            = OUT,
-    export_format       = 'GLB',
-    export_yup          = True,
-    export_animations   = True,
-    export_nla_strips   = True,
-    export_anim_single_armature = True,
-    export_force_sampling = True,
-    export_draco_mesh_compression_enable = False,
-)
-print(f"Exported: {OUT}")
+def bench(arm, n):
+    med = {}
+    for label, writer in WRITERS.items():
+        for name, fn in CLIPS:
+            ts = []
+            for _ in range(n):
+                act = new_action(arm, f'_bench_{name}')
+                t0 = time.perf_counter()
+                k = writer(arm)
+                fn(k)
+                k.flush(act)
+                ts.append(time.perf_counter() - t0)
+                arm.animation_data.action = None
+                bpy.data.actions.remove(act)
+            med[label, name] = sorted(ts)[n // 2]
+
+    print(f"\n[bug] clip authoring time  (median of {n})")
+    print(f"  {'clip':<8}{'insert':>10}{'layer':>10}{'speedup':>9}")
+    for name, _ in CLIPS:
+        a, b = med['insert', name], med['layer', name]
+        print(f"  {name:<8}{a*1000:8.2f}ms{b*1000:8.2f}ms{a/b:8.1f}x")
+    print()
+
+def script_args():
+    """Blender の "--" 以降の引数だけを返す"""
+    return sys.argv[sys.argv.index('--') + 1:] if '--' in sys.argv else []
+
+def main():
+    ap = argparse.ArgumentParser(prog='animate_bug.py')
+    ap.add_argument('--keys', choices=tuple(WRITERS), default='layer')
+    ap.add_argument('--bench', type=int, default=0, metavar='N')
+    ap.add_argument('--tol-deg', type=float, default=0.25)
+    ap.add_argument('--no-optimize', action='store_true')
+    ap.add_argument('--meshopt', action='store_true')
+    ap.add_argument('--decimate', type=float, default=1.0, metavar='RATIO')
+    ap.add_argument('--src', default=SRC)
+    ap.add_argument('--reimport', action='store_true')
+    ap.add_argument('--out', default=OUT)
+    ap.add_argument('--stage', choices=('all', 'actions', 'glb'), default='all')
+    ap.add_argument('--load', metavar='BLEND')
+    ap.add_argument('--save', metavar='BLEND')
+    instrument.add_args(ap)
+    args = ap.parse_args(script_args())
+
+    prof = instrument.from_args(f'bug-{args.stage}', args)
+    if args.stage == 'glb':
+        with prof.phase('load'):
+            bpy.ops.wm.open_mainfile(filepath=args.load)
+            arm = find_armature()
+    else:
+        with prof.phase('import'):
+            arm = load_source(args.src, cache=not args.reimport)
+        if args.bench:
+            bench(arm, args.bench)
+            return
+        with prof.phase('author'):
+            author_all(arm, WRITERS[args.keys])
+    if args.stage == 'actions':
+        with prof.phase('save'):
+            bpy.ops.wm.save_as_mainfile(filepath=args.save, check_existing=False)
+        prof.finish()
+        return
+    if args.decimate < 1.0:
+        with prof.phase('decimate'):
+            decimate(arm, args.decimate)
+    with prof.phase('export'):
+        export_glb(arm, args.out)
+    if not args.no_optimize:
+        # 静止チャンネル削除 + キー削減（クリップごとの削減量を表示）
+        with prof.phase('anim_optimize'):
+            anim_optimize.optimize_file(args.out, tol_deg=args.tol_deg)
+        # 量子化・重複除去（+ meshopt 圧縮）
+        with prof.phase('optimize'):
+            glb_optimize.optimize_file(args.out, meshopt=args.meshopt)
+    # 身長・床・マテリアル・クリップ長を extras に（scene.js のボーン走査を省く）
+    glb_meta.add_metadata_file(args.out, clip_info=anim_library.clip_info)
+    prof.finish()
+    print(f"Exported: {args.out}")
+
+if __name__ == "__main__":
+    main()
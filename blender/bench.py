@@ -0,0 +1,266 @@
+"""
+bench.py — アセットビルドのベンチマークとサイズ予算チェック
+（bpy 不要・素の Python で実行）
+
+マニフェスト（blender/assets.json）のジョブごとに、スクリプトを
+ヘッドレス Blender で N 回フルビルドして所要時間の分位点を取り、
+出力 GLB から以下を数える:
+
+  - triangles     描画される三角形数（ノードの参照ぶん数える）
+  - draw_calls    プリミティブ × 参照ノード（1 プリミティブ = 1 マテリアル = 1 ドローコール）
+  - clips / channels / keys   アニメーションのクリップ・チャンネル・キー数
+  - bytes_total / bytes_json / bytes_bin   ファイルと各チャンクのバイト数
+
+結果はコミット済みのベースライン（blender/bench_baseline.json）と比べ、
+どれかが「ベースライン × (1 + 許容率)」を超えたら一覧を出して終了コード 1。
+ベースラインに無い指標（初回の時間など）は記録だけして比較しない。
+
+ビルドは一時ディレクトリに出力するので public/models/ は書き換えない。
+--no-build はビルドせず、マニフェストの出力先にある成果物だけを測る
+（Blender の無い CI でもサイズ予算は見られる）。
+
+使い方:
+  python blender/bench.py                    # 全ジョブ × 3 回
+  python blender/bench.py kyuroku -n 5       # 指定アセットのみ
+  python blender/bench.py --no-build         # 成果物のサイズ・三角形数だけ
+  python blender/bench.py --tol seconds=0.3  # 許容率の上書き
+  python blender/bench.py --update           # 現在値でベースラインを書き直す
+"""
+import argparse
+import glob
+import json
+import math
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import build
+import glb
+
+BASELINE = os.path.join(build.HERE, 'bench_baseline.json')
+
+# 指標ごとの既定の許容率（ベースラインファイルの "tolerance" で上書きされる）
+TOLERANCE = {
+    'seconds': 0.25,        # 時間はマシンの揺れが大きい
+    'bytes': 0.02,
+    'triangles': 0.0,
+    'draw_calls': 0.0,
+    'meshes': 0.0,
+    'materials': 0.0,
+    'clips': 0.0,           # 増やすときはベースラインも更新する
+    'keys': 0.05,
+    'channels': 0.0,
+}
+
+
+# ──────────────────────────────────────────────────────────────────────
+# GLB の計測
+# ──────────────────────────────────────────────────────────────────────
+def _prim_triangles(g, p):
+    mode = p.get('mode', 4)
+    n = g['accessors'][p['indices']]['count'] if 'indices' in p \
+        else g['accessors'][p['attributes']['POSITION']]['count']
+    if mode == 4:                       # TRIANGLES
+        return n // 3
+    if mode in (5, 6):                  # TRIANGLE_STRIP / FAN
+        return max(0, n - 2)
+    return 0                            # 点・線
+
+
+def glb_stats(path):
+    """GLB 1 ファイルの三角形数・ドローコール数・アニメーション量・チャンクサイズ"""
+    g = glb.Asset.load(path).gltf
+    meshes = g.get('meshes', [])
+    tris = [sum(_prim_triangles(g, p) for p in m['primitives']) for m in meshes]
+    refs = [n['mesh'] for n in g.get('nodes', []) if 'mesh' in n]
+    anims = g.get('animations', [])
+    st = {
+        'triangles': sum(tris[m] for m in refs),
+        'draw_calls': sum(len(meshes[m]['primitives']) for m in refs),
+        'meshes': len(meshes),
+        'materials': len(g.get('materials', [])),
+        'clips': len(anims),
+        'channels': sum(len(a['channels']) for a in anims),
+        'keys': sum(g['accessors'][s['input']]['count'] for a in anims for s in a['samplers']),
+    }
+    st.update({f'bytes_{k}': v for k, v in glb.chunk_sizes(path).items()})
+    return st
+
+
+def output_stats(path):
+    if path.endswith('.glb'):
+        return glb_stats(path)
+    return {'bytes_total': os.path.getsize(path)}
+
+
+# ──────────────────────────────────────────────────────────────────────
+# 計時
+# ──────────────────────────────────────────────────────────────────────
+def percentile(xs, q):
+    """最近傍順位法の分位点（q: 0〜100）"""
+    xs = sorted(xs)
+    return xs[max(0, math.ceil(q / 100 * len(xs)) - 1)]
+
+
+def time_job(blender, job, asset, runs, workdir):
+    """スクリプトを runs 回フルビルド。(時間の統計, 最後の出力パス, フェーズ別秒数)"""
+    ext = os.path.splitext(asset.out)[1]
+    out = os.path.join(workdir, job.rstrip(':').replace(':', '-') + ext)
+    prof = os.path.join(workdir, 'profile-' + os.path.basename(out))
+    cmd = [blender, '--background', '--factory-startup', '--python-exit-code', '1',
+           '--python', os.path.join(build.HERE, asset.script), '--',
+           *asset.args, '--out', out, '--profile', prof]
+    times, phases = [], {}
+    for i in range(runs):
+        t0 = time.perf_counter()
+        r = subprocess.run(cmd, cwd=build.ROOT, stdout=subprocess.PIPE,
+                           stderr=subprocess.STDOUT, text=True)
+        times.append(time.perf_counter() - t0)
+        if r.returncode != 0 or not os.path.exists(out):
+            sys.stdout.write(r.stdout[-4000:])
+            raise build.StageError(f'{asset.script} failed on run {i + 1}', r.returncode or 1, None)
+        # instrument.py のフェーズ別時間（スクリプトの中だけ、起動時間を含まない）
+        for path in glob.glob(os.path.join(prof, '*-all.json')):
+            with open(path, encoding='utf-8') as f:
+                for p in json.load(f)['phases']:
+                    phases.setdefault(p['phase'], []).append(p['seconds'])
+    st = {'seconds_p50': percentile(times, 50), 'seconds_p90': percentile(times, 90),
+          'seconds_min': min(times), 'seconds_max': max(times), 'runs': runs}
+    st = {k: round(v, 3) if isinstance(v, float) else v for k, v in st.items()}
+    return st, out, {k: round(percentile(v, 50), 3) for k, v in phases.items()}
+
+
+# ──────────────────────────────────────────────────────────────────────
+# ベースライン比較
+# ──────────────────────────────────────────────────────────────────────
+def family(metric):
+    """'seconds_p50' → 'seconds'、'bytes_bin' → 'bytes'"""
+    return metric.split('_')[0] if metric.split('_')[0] in ('seconds', 'bytes') else metric
+
+
+def compare(results, baseline, tolerance):
+    """ベースラインを超えた指標を [(job, metric, base, now, limit)] で返す
+
+    比較するのは値が小さいほど良い指標（時間・サイズ・数）。p90 / max は揺れが
+    大きいので時間は p50 と min だけ見る。
+    """
+    bad = []
+    for job, now in results.items():
+        base = baseline.get(job, {})
+        for k, v in now.items():
+            if k not in base or k in ('runs', 'seconds_p90', 'seconds_max', 'phases'):
+                continue
+            tol = tolerance.get(family(k))
+            if tol is None:
+                continue
+            limit = base[k] * (1 + tol)
+            if v > limit:
+                bad.append((job, k, base[k], v, limit))
+    return bad
+
+
+def print_table(results, baseline):
+    for job, st in results.items():
+        print(f"  {job.rstrip(':')}")
+        base = baseline.get(job, {})
+        for k, v in st.items():
+            if k == 'phases':
+                continue
+            b = base.get(k)
+            diff = f'{(v - b) / b:+7.1%}' if b else ''
+            print(f"    {k:<14}{v:>12}{'' if b is None else b:>12}  {diff}")
+        if st.get('phases'):
+            print('    phases (p50): ' + '  '.join(f'{k} {v:.3f}s' for k, v in st['phases'].items()))
+
+
+def load_baseline(path):
+    if not os.path.exists(path):
+        return {'tolerance': dict(TOLERANCE), 'jobs': {}}
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    data['tolerance'] = {**TOLERANCE, **data.get('tolerance', {})}
+    return data
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(prog='bench.py')
+    ap.add_argument('assets', nargs='*', metavar='ASSET[:VARIANT]')
+    ap.add_argument('--manifest', default=build.MANIFEST)
+    ap.add_argument('--baseline', default=BASELINE)
+    ap.add_argument('-n', '--runs', type=int, default=3)
+    ap.add_argument('--blender')
+    ap.add_argument('--no-build', action='store_true',
+                    help='ビルドせずマニフェストの出力先の成果物だけを測る')
+    ap.add_argument('--tol', action='append', default=[], metavar='METRIC=RATE',
+                    help='許容率の上書き（例: seconds=0.3, bytes=0.05）')
+    ap.add_argument('--update', action='store_true', help='現在値でベースラインを書き直す')
+    ap.add_argument('--json', metavar='PATH', help='結果を JSON で書き出す')
+    args = ap.parse_args(argv)
+
+    jobs = build.load_manifest(args.manifest)
+    try:
+        names = build.select_jobs(jobs, args.assets)
+    except KeyError as e:
+        ap.error(f'unknown asset: {e.args[0]} (choose from {", ".join(jobs)})')
+    baseline = load_baseline(args.baseline)
+    tolerance = dict(baseline['tolerance'])
+    for t in args.tol:
+        k, _, v = t.partition('=')
+        tolerance[k] = float(v)
+
+    results = {}
+    blender = None if args.no_build else build.find_blender(args.blender)
+    with tempfile.TemporaryDirectory(prefix='r4bench-') as tmp:
+        for job in names:
+            asset = jobs[job]
+            if args.no_build:
+                out = os.path.join(build.ROOT, asset.out)
+                if not os.path.exists(out):
+                    print(f'  {job.rstrip(":")}: {asset.out} がありません（スキップ）')
+                    continue
+                results[job] = output_stats(out)
+                continue
+            print(f'[bench] {job.rstrip(":")} × {args.runs}')
+            try:
+                timing, out, phases = time_job(blender, job, asset, args.runs, tmp)
+            except build.StageError as e:
+                print(f'[bench] {e}')
+                return 1
+            results[job] = {**timing, **output_stats(out)}
+            if phases:
+                results[job]['phases'] = phases
+
+    print_table(results, baseline['jobs'])
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+    if args.update:
+        for job, st in results.items():
+            keep = {k: v for k, v in baseline['jobs'].get(job, {}).items()
+                    if args.no_build and k.startswith('seconds')}
+            baseline['jobs'][job] = {**keep, **{k: v for k, v in st.items()
+                                                if k not in ('runs', 'phases')}}
+        baseline['tolerance'] = tolerance
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(baseline, f, indent=2)
+            f.write('\n')
+        print(f'[bench] baseline updated → {args.baseline}')
+        return 0
+
+    bad = compare(results, baseline['jobs'], tolerance)
+    for job, k, b, v, limit in bad:
+        print(f'  REGRESSION {job.rstrip(":")}/{k}: {v} > {limit:.6g} '
+              f'(baseline {b}, +{(v - b) / b:.1%})' if b else
+              f'  REGRESSION {job.rstrip(":")}/{k}: {v} > {limit:.6g} (baseline 0)')
+    if bad:
+        print(f'[bench] {len(bad)} regression(s)')
+        return 1
+    print(f'[bench] {len(results)} job(s) within baseline')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,398 @@
+"""
+build.py — Blender アセットの並列インクリメンタルビルドドライバー
+（bpy 不要・素の Python で実行）
+
+マニフェスト（既定: blender/assets.json）に並んだアセットとバリアントを
+ジョブに分け、CPU コア数ぶんのワーカーで `blender --background --python`
+を並列に起動する。全アセットの再ビルドは最も遅いジョブの時間で終わる。
+出力先はマニフェストから --out / --save で各スクリプトに渡す。
+
+各アセットはステージに分け、ステージごとに入力のハッシュを取り、
+出力（.blend / .glb / .fbx）を .buildcache/ にキャッシュする。
+ステージの入力:
+  - スクリプトのトップレベル定義（寸法定数・PALETTE/COLORS・キー表・関数）を
+    ast で切り出したもの。owns に挙げた名前はそのステージだけ、
+    それ以外は先頭ステージの入力（コメントや空白の変更では再ビルドしない）
+  - ステージが読む補助モジュールや元 GLB（deps）
+  - 前ステージのキー（連鎖するので上流が変われば下流も作り直し）
+何も変わっていなければ Blender を起動せずに終わる。
+
+--worker HOST:PORT（複数可）を指定すると、ステージごとに Blender を起動する
+代わりに常駐ワーカー（blender/worker.py）へジョブを送る。起動コストが無くなり、
+小さなステージの再ビルドは 1 秒未満で終わる。並列数はワーカー数。
+
+ジョブごとのステージ結果・終了コード・ログ・所要時間は JSON サマリー
+（既定: .buildcache/summary.json）にまとめる。最後に public/models/ に実在する
+LOD を public/models/lods.json に書き、scene.js は無い段階を取りに行かない。
+
+使い方:
+  python blender/build.py                   # 全アセット × 全バリアント
+  python blender/build.py kyuroku bug       # 指定アセットのみ（バリアント込み）
+  python blender/build.py kyuroku:skinned   # 特定バリアントのみ（既定は 'kyuroku:'）
+  python blender/build.py --force -j 2      # キャッシュ無視・ワーカー 2 つ
+  python blender/build.py --worker localhost:8765   # 常駐 Blender（worker.py）で実行
+  Blender 実行ファイルは --blender / 環境変数 BLENDER / PATH の順で探す
+"""
+import argparse
+import ast
+import filecmp
+import glob
+import hashlib
+import json
+import os
+import queue
+import shutil
+import socket
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+CACHE = os.path.join(ROOT, '.buildcache')
+MANIFEST = os.path.join(HERE, 'assets.json')
+MAC_BLENDER = '/Applications/Blender.app/Contents/MacOS/Blender'
+KEEP = 3            # ステージごとに残すキャッシュ世代数
+LOD_INDEX = os.path.join(ROOT, 'public', 'models', 'lods.json')
+
+
+@dataclass
+class Stage:
+    name: str
+    ext: str              # '.blend' は中間成果物、それ以外は最終出力
+    owns: tuple = ()      # このステージだけが使うトップレベル定義名
+    deps: tuple = ()      # 入力ファイル（ルート相対）
+
+
+@dataclass
+class Asset:
+    script: str           # blender/ 内のスクリプト名
+    out: str              # 最終出力先（ルート相対 or 絶対パス）
+    stages: tuple
+    args: tuple = ()      # 全ステージに渡す追加引数（キーにも含める）
+
+
+def load_manifest(path=MANIFEST):
+    """マニフェストを {ジョブ名: Asset} に展開する
+
+    ジョブ名は 'asset:variant'（既定バリアントは 'asset:'）。バリアントは
+    args（追加引数）と out（出力先）だけを上書きし、ステージ定義は共有する。
+    """
+    with open(path, encoding='utf-8') as f:
+        spec = json.load(f)
+    jobs = {}
+    for name, a in spec.items():
+        stages = tuple(Stage(st['name'], st['ext'], tuple(st.get('owns', ())),
+                             tuple(st.get('deps', ()))) for st in a['stages'])
+        base = tuple(a.get('args', ()))
+        jobs[f'{name}:'] = Asset(a['script'], a['out'], stages, base)
+        for vname, v in a.get('variants', {}).items():
+            jobs[f'{name}:{vname}'] = Asset(a['script'], v['out'], stages,
+                                            base + tuple(v.get('args', ())))
+    return jobs
+
+
+def select_jobs(jobs, names):
+    """CLI の指定（'asset' / 'asset:variant'）に合うジョブ名を返す。空なら全部"""
+    if not names:
+        return list(jobs)
+    picked = []
+    for n in names:
+        hit = [j for j in jobs if j == n or (':' not in n and j.split(':')[0] == n)]
+        if not hit:
+            raise KeyError(n)
+        picked += [j for j in hit if j not in picked]
+    return picked
+
+
+# ──────────────────────────────────────────────────────────────────────
+# ハッシュ
+# ──────────────────────────────────────────────────────────────────────
+def _top_name(node):
+    if isinstance(node, (ast.FunctionDef, ast.ClassDef)):
+        return node.name
+    if isinstance(node, ast.Assign) and len(node.targets) == 1 \
+            and isinstance(node.targets[0], ast.Name):
+        return node.targets[0].id
+    if isinstance(node, ast.AnnAssign) and isinstance(node.target, ast.Name):
+        return node.target.id
+    return ''
+
+
+def sections(path):
+    """トップレベル文を {名前: ast.dump} に分解。名前の無い文は '' にまとめる"""
+    with open(path, encoding='utf-8') as f:
+        tree = ast.parse(f.read())
+    out = {}
+    for node in tree.body:
+        if isinstance(node, ast.Expr) and isinstance(node.value, ast.Constant) \
+                and isinstance(node.value.value, str):
+            continue            # モジュール docstring
+        name = _top_name(node)
+        out[name] = out.get(name, '') + ast.dump(node)
+    return out
+
+
+def file_digest(path):
+    """.py は ast.dump（コメント無視）、それ以外はバイト列のハッシュ"""
+    h = hashlib.sha256()
+    if path.endswith('.py'):
+        with open(path, encoding='utf-8') as f:
+            h.update(ast.dump(ast.parse(f.read())).encode())
+    else:
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                h.update(block)
+    return h.hexdigest()
+
+
+def stage_keys(asset):
+    secs = sections(os.path.join(HERE, asset.script))
+    owned = {n for st in asset.stages for n in st.owns}
+    keys, prev = [], b''
+    for i, st in enumerate(asset.stages):
+        h = hashlib.sha256(prev)
+        h.update(repr((asset.script, st.name, asset.args)).encode())
+        names = [n for n in sorted(secs) if n not in owned] if i == 0 else []
+        for n in (*names, *st.owns):
+            h.update(n.encode() + b'\0' + secs.get(n, '').encode())
+        for d in st.deps:
+            h.update(file_digest(os.path.join(ROOT, d)).encode())
+        prev = h.hexdigest().encode()
+        keys.append(prev.decode())
+    return keys
+
+
+# ──────────────────────────────────────────────────────────────────────
+# 実行
+# ──────────────────────────────────────────────────────────────────────
+class StageError(RuntimeError):
+    def __init__(self, msg, returncode, log):
+        super().__init__(msg)
+        self.returncode = returncode
+        self.log = log
+
+
+def find_blender(explicit=None):
+    for c in (explicit, os.environ.get('BLENDER'), shutil.which('blender'), MAC_BLENDER):
+        if c and os.path.exists(c):
+            return c
+    sys.exit('Blender が見つかりません（--blender か環境変数 BLENDER で指定）')
+
+
+def cache_dir(job):
+    """'kyuroku:' → .buildcache/kyuroku、'kyuroku:skinned' → .buildcache/kyuroku-skinned"""
+    return os.path.join(CACHE, job.rstrip(':').replace(':', '-'))
+
+
+def cache_path(job, stage, key):
+    return os.path.join(cache_dir(job), f'{stage.name}-{key[:16]}{stage.ext}')
+
+
+def worker_call(addr, req, timeout=None):
+    """常駐ワーカー（worker.py）に 1 リクエスト送って応答の dict を返す"""
+    host, _, port = addr.rpartition(':')
+    with socket.create_connection((host or '127.0.0.1', int(port)), timeout=timeout) as s, \
+            s.makefile('rwb') as f:
+        f.write(json.dumps(req).encode() + b'\n')
+        f.flush()
+        line = f.readline()
+    if not line:
+        raise ConnectionError(f'worker {addr} closed the connection')
+    return json.loads(line)
+
+
+def run_stage(blender, asset, stage, load, out, threads=0, worker=None):
+    """Blender をヘッドレスで起動して 1 ステージ実行。成果物は一時名から rename
+
+    threads: Blender のスレッド数（0 = 全コア）。並列ジョブ同士のコアの奪い合いを避ける
+    worker: 常駐ワーカーのアドレス。指定時は起動せずにワーカーで実行する
+    戻り値: (終了コード, ログのパス)
+    """
+    part = out[:-len(stage.ext)] + '.part' + stage.ext
+    argv = ['--stage', stage.name, *asset.args]
+    if load:
+        argv += ['--load', load]
+    argv += ['--save', part] if stage.ext == '.blend' else ['--out', part]
+    log = out[:-len(stage.ext)] + '.log'
+    if worker:
+        try:
+            code = worker_call(worker, {'script': asset.script, 'argv': argv,
+                                        'log': log})['exit_code']
+        except (OSError, ValueError, KeyError) as e:
+            raise StageError(f'worker {worker}: {e}', 1, log) from e
+    else:
+        cmd = [blender, '--background', '--factory-startup', '--python-exit-code', '1',
+               '--threads', str(threads),
+               '--python', os.path.join(HERE, asset.script), '--', *argv]
+        with open(log, 'w') as f:
+            code = subprocess.run(cmd, stdout=f, stderr=subprocess.STDOUT,
+                                  cwd=ROOT).returncode
+    if code != 0 or not os.path.exists(part):
+        raise StageError(f'{asset.script} --stage {stage.name} failed (log: {log})',
+                         code or 1, log)
+    os.replace(part, out)
+    _prune(out, stage)
+    return code, log
+
+
+def _prune(out, stage):
+    """同じステージの古いキャッシュを KEEP 世代まで削る"""
+    pat = os.path.join(os.path.dirname(out), f'{stage.name}-*{stage.ext}')
+    old = sorted(glob.glob(pat), key=os.path.getmtime, reverse=True)[KEEP:]
+    for p in old:
+        for q in (p, p[:-len(stage.ext)] + '.log'):
+            if os.path.exists(q):
+                os.remove(q)
+
+
+def build_asset(job, asset, blender=None, force=False, threads=0, workers=None):
+    """1 ジョブをビルドしてサマリー用 dict を返す
+
+    workers: 常駐ワーカーのアドレスの Queue。ステージごとに 1 つ借りて返す
+
+    stages: [{stage, status (hit/miss/skip/fail), key, seconds, exit_code, log}]
+    """
+    t0 = time.perf_counter()
+    keys = stage_keys(asset)
+    paths = [cache_path(job, st, k) for st, k in zip(asset.stages, keys)]
+    os.makedirs(cache_dir(job), exist_ok=True)
+
+    # キャッシュが残っている最も下流のステージより後ろだけ実行
+    start = 0
+    if not force:
+        for i in reversed(range(len(paths))):
+            if os.path.exists(paths[i]):
+                start = i + 1
+                break
+
+    rows, ok = [], True
+    for i, (st, key, path) in enumerate(zip(asset.stages, keys, paths)):
+        row = {'stage': st.name, 'key': key, 'seconds': 0.0,
+               'exit_code': None, 'log': None}
+        rows.append(row)
+        if i < start or not ok:
+            row['status'] = 'hit' if ok and os.path.exists(path) else 'skip'
+            continue
+        worker = workers.get() if workers else None
+        if not worker:
+            blender = blender or find_blender()
+        s0 = time.perf_counter()
+        try:
+            row['exit_code'], row['log'] = run_stage(
+                blender, asset, st, paths[i - 1] if i else None, path, threads, worker)
+            row['status'] = 'miss'
+        except StageError as e:
+            row.update(status='fail', exit_code=e.returncode, log=e.log)
+            ok = False
+        finally:
+            if worker:
+                workers.put(worker)
+        row['seconds'] = round(time.perf_counter() - s0, 3)
+
+    dest = os.path.join(ROOT, asset.out)
+    if ok and (not os.path.exists(dest) or not filecmp.cmp(paths[-1], dest, shallow=False)):
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        shutil.copy2(paths[-1], dest)
+    return {'job': job, 'script': asset.script, 'args': list(asset.args),
+            'out': asset.out, 'ok': ok, 'stages': rows,
+            'seconds': round(time.perf_counter() - t0, 3)}
+
+
+def build_all(jobs, names, blender=None, force=False, workers=0, addrs=()):
+    """names のジョブを並列に実行し、指定順で結果を返す
+
+    addrs: 常駐ワーカーのアドレス。指定時は並列数 = ワーカー数
+    """
+    cores = os.cpu_count() or 1
+    n = max(1, min(workers or len(addrs) or cores, len(names)))
+    threads = max(1, cores // n)
+    pool = None
+    if addrs:
+        pool = queue.Queue()
+        for a in addrs:
+            pool.put(a)
+    # Blender 本体は子プロセス（またはワーカー）なので、待ち受けはスレッドで十分
+    with ThreadPoolExecutor(max_workers=n) as ex:
+        futs = [ex.submit(build_asset, j, jobs[j], blender, force, threads, pool)
+                for j in names]
+        return [f.result() for f in futs], n
+
+
+def write_lod_index(jobs, path=LOD_INDEX):
+    """public/models/ に出す GLB ごとに、実在する LOD の接尾辞を書く
+
+    {"kyuroku": ["_lod1", "_lod2"], "bug_animated": []} の形。LOD はバリアントの出力のうち
+    '<既定の出力名>_<名前>.glb' のもの。中身が変わらなければ書かない。戻り値: 書いた dict
+    """
+    index = {}
+    for j, a in jobs.items():
+        if not (j.endswith(':') and a.out.startswith('public/models/')):
+            continue
+        base = os.path.splitext(os.path.basename(a.out))[0]
+        outs = sorted(jobs[v].out for v in jobs if v.startswith(j) and v != j)
+        index[base] = [os.path.splitext(os.path.basename(o))[0][len(base):] for o in outs
+                       if os.path.dirname(o) == os.path.dirname(a.out)
+                       and os.path.basename(o).startswith(base + '_')
+                       and os.path.exists(os.path.join(ROOT, o))]
+    text = json.dumps(index, indent=2) + '\n'
+    if os.path.exists(path):
+        with open(path, encoding='utf-8') as f:
+            if f.read() == text:
+                return index
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    return index
+
+
+def print_summary(results):
+    for r in results:
+        for st in r['stages']:
+            t = f"{st['seconds']:7.2f}s" if st['status'] in ('miss', 'fail') else ''
+            print(f"  {r['job'].rstrip(':') + '/' + st['stage']:<24}"
+                  f"{st['status']:<6}{st['key'][:12]}  {t}")
+            if st['status'] == 'fail':
+                print(f"    exit {st['exit_code']}  log: {st['log']}")
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(prog='build.py')
+    ap.add_argument('assets', nargs='*', metavar='ASSET[:VARIANT]')
+    ap.add_argument('--manifest', default=MANIFEST)
+    ap.add_argument('--force', action='store_true')
+    ap.add_argument('--blender')
+    ap.add_argument('-j', '--jobs', type=int, default=0,
+                    help='並列ワーカー数（既定: CPU コア数）')
+    ap.add_argument('--worker', action='append', default=[], metavar='HOST:PORT',
+                    help='常駐ワーカー（blender/worker.py）で実行（複数指定可）')
+    ap.add_argument('--summary', default=os.path.join(CACHE, 'summary.json'))
+    args = ap.parse_args(argv)
+    jobs = load_manifest(args.manifest)
+    try:
+        names = select_jobs(jobs, args.assets)
+    except KeyError as e:
+        ap.error(f'unknown asset: {e.args[0]} (choose from {", ".join(jobs)})')
+
+    t0 = time.perf_counter()
+    blender = args.blender and find_blender(args.blender)
+    results, workers = build_all(jobs, names, blender, args.force, args.jobs,
+                                   args.worker)
+    wall = time.perf_counter() - t0
+    print_summary(results)
+    write_lod_index(jobs)
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.summary)), exist_ok=True)
+    with open(args.summary, 'w', encoding='utf-8') as f:
+        json.dump({'manifest': os.path.relpath(os.path.abspath(args.manifest), ROOT),
+                   'workers': workers, 'seconds': round(wall, 3), 'jobs': results},
+                  f, indent=2, ensure_ascii=False)
+    failed = [r['job'] for r in results if not r['ok']]
+    print(f'[build] {len(results) - len(failed)}/{len(results)} ok in {wall:.2f}s'
+          f'  (summary: {args.summary})')
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
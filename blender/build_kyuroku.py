@@ -4,23 +4,67 @@ Blender 5.x headless 実行用
 
 使い方:
   /Applications/Blender.app/Contents/MacOS/Blender \
-      --background --python /Users/matsumuratakumi/R4/blender/build_kyuroku.py
-
-出力: /Users/matsumuratakumi/R4/public/models/kyuroku.glb
+      --background --python blender/build_kyuroku.py [-- --out PATH]
+
+出力: public/models/kyuroku.glb（リポジトリ相対）
+
+オプション（"--" 以降に指定）:
+  --backend data|ops   プリミティブ生成経路（既定: data = bmesh/データAPI）
+  --compare N          両経路で N 回ずつビルドして時間を比較（エクスポートなし）
+  --skinned            Empty 階層をアーマチュアに変換し、マテリアルごとに 1 メッシュへ
+                       結合したスキンメッシュ GLB を出力（ドローコール削減）
+  --detail F           テッセレーション品質（既定 1.0）。曲面の弦の許容誤差を
+                       CHORD_ERR / F² にする。LOD 用に 0.5 / 0.25 などで書き出す
+  --tess-report        曲面パーツごとの三角形数（固定分割 → 適応分割）を表示
+  --meshopt            書き出し後の glb_optimize で EXT_meshopt_compression も掛ける
+  --out PATH           出力 GLB（既定: OUT_PATH）
+  --stage all|mesh|glb ステージ単位で実行（build.py のインクリメンタルビルド用）
+                         mesh: メッシュを構築して --save の .blend に保存
+                         glb : --load の .blend を開き、PALETTE を反映して書き出し
+  --profile DIR        フェーズごとの計測を DIR に書く（instrument.py、--cprofile 併用可）
 """
 
-import bpy, math
-from mathutils import Vector, Euler
-
-OUT_PATH = "/Users/matsumuratakumi/R4/public/models/kyuroku.glb"
-
-# ──────────────────────────────────────────────────────────────────────
-# シーンクリア
-# ──────────────────────────────────────────────────────────────────────
-bpy.ops.object.select_all(action='SELECT')
-bpy.ops.object.delete()
-for col in list(bpy.data.collections):
-    bpy.data.collections.remove(col)
+import bpy
+import math
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import meshgen
+import rigging
+import scene_reset
+import form_variants
+import palette
+import face_morphs
+import anim_library
+import kyuroku_clips
+import anim_optimize
+import glb_optimize
+import glb_meta
+import instrument
+
+OUT_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                        'public', 'models', 'kyuroku.glb')
+
+# 'data' = bmesh / データAPI で直接生成,  'ops' = 従来の bpy.ops 経路
+BACKEND = 'data'
+
+# テッセレーション品質（LOD 用: 1.0 = フル, 0.5, 0.25 …）
+# 曲面の分割数は「弦の誤差 ≦ CHORD_ERR / DETAIL²」を満たす最小値で決める。
+# 分割数は誤差の平方根に反比例するので、DETAIL 0.5 でおよそ半分になる。
+DETAIL = 1.0
+# scene.js のカメラ（距離 3.6 m, fov 44°）で 1440 px 高の画面の約 0.5 px
+CHORD_ERR = 0.0008
+
+# 分割数ごとの三角形数ログ: (パーツ名, 固定分割での数, 適応分割での数)
+TRI_LOG = []
+
+# データAPI経路のメッシュ共有: (形状, 寸法…, マテリアル) → Mesh
+# 左右の手足のように関節ローカルで同じ形のパーツは 1 つのメッシュを参照する
+# （GLB でも 1 メッシュを 2 ノードが参照する形で書き出される）
+SHARED = {}
 
 # ──────────────────────────────────────────────────────────────────────
 # マテリアル（キャストオフ形態 / Rockman X DiVE 色）
@@ -30,6 +74,15 @@ def srgb(h):
     r = int(h[0:2],16)/255; g = int(h[2:4],16)/255; b = int(h[4:6],16)/255
     return (r**2.2, g**2.2, b**2.2, 1.0)
 
+def set_principled(m, col_hex, metal=0.0, rough=0.5, emit_hex=None, emit_s=0.0):
+    B = m.node_tree.nodes['Principled BSDF']
+    B.inputs['Base Color'].default_value  = srgb(col_hex)
+    B.inputs['Metallic'].default_value    = metal
+    B.inputs['Roughness'].default_value   = rough
+    if emit_hex:
+        B.inputs['Emission Color'].default_value    = srgb(emit_hex)
+    B.inputs['Emission Strength'].default_value = emit_s if emit_hex else 0.0
+
 def mat(name, col_hex, metal=0.0, rough=0.5, emit_hex=None, emit_s=0.0):
     m = bpy.data.materials.new(name)
     m.use_nodes = True
@@ -38,27 +91,36 @@ def mat(name, col_hex, metal=0.0, rough=0.5, emit_hex=None, emit_s=0.0):
     B = n.new('ShaderNodeBsdfPrincipled')
     O = n.new('ShaderNodeOutputMaterial')
     lk.new(B.outputs['BSDF'], O.inputs['Surface'])
-    B.inputs['Base Color'].default_value  = srgb(col_hex)
-    B.inputs['Metallic'].default_value    = metal
-    B.inputs['Roughness'].default_value   = rough
-    if emit_hex:
-        B.inputs['Emission Color'].default_value    = srgb(emit_hex)
-        B.inputs['Emission Strength'].default_value = emit_s
+    set_principled(m, col_hex, metal, rough, emit_hex, emit_s)
     return m
 
-MT = {
-    'suit' : mat('Suit',  '0c1828', 0.10, 0.78),
-    'armor': mat('Armor', '1e4e96', 0.75, 0.25),
-    'trim' : mat('Trim',  'c8a030', 0.95, 0.12),
-    'visor': mat('Visor', '88ccff', 0.10, 0.05, '4488ff', 2.5),
-    'skin' : mat('Skin',  'eec080', 0.00, 0.82),
-    'hair' : mat('Hair',  '18102a', 0.05, 0.78),
-    'eye'  : mat('Eye',   '44aaff', 0.10, 0.05, '2288ff', 5.0),
-    'embA' : mat('EmbA',  'dd2222', 0.45, 0.18, 'dd2222', 3.5),
-    'embB' : mat('EmbB',  '2244cc', 0.45, 0.18, '2244cc', 3.5),
-    'dark' : mat('Dark',  '060608', 0.05, 0.85),
+# key: (マテリアル名, ベース色, metallic, roughness[, 発光色, 発光強度])
+PALETTE = {
+    'suit' : ('Suit',  '0c1828', 0.10, 0.78),
+    'armor': ('Armor', '1e4e96', 0.75, 0.25),
+    'trim' : ('Trim',  'c8a030', 0.95, 0.12),
+    'visor': ('Visor', '88ccff', 0.10, 0.05, '4488ff', 2.5),
+    'skin' : ('Skin',  'eec080', 0.00, 0.82),
+    'hair' : ('Hair',  '18102a', 0.05, 0.78),
+    'eye'  : ('Eye',   '44aaff', 0.10, 0.05, '2288ff', 5.0),
+    'embA' : ('EmbA',  'dd2222', 0.45, 0.18, 'dd2222', 3.5),
+    'embB' : ('EmbB',  '2244cc', 0.45, 0.18, '2244cc', 3.5),
+    'dark' : ('Dark',  '060608', 0.05, 0.85),
 }
 
+MT = {}
+
+def create_materials():
+    MT.clear()
+    MT.update({k: mat(*v) for k, v in PALETTE.items()})
+
+def apply_palette():
+    """保存済み .blend のマテリアルに PALETTE の値を書き戻す（glb ステージ用）"""
+    MT.clear()
+    for k, (name, *vals) in PALETTE.items():
+        MT[k] = bpy.data.materials[name]
+        set_principled(MT[k], *vals)
+
 # ──────────────────────────────────────────────────────────────────────
 # ヘルパー
 # ──────────────────────────────────────────────────────────────────────
@@ -79,45 +141,102 @@ def smooth(obj):
     bpy.ops.object.shade_smooth()
 
 def apply_all(obj):
+    if BACKEND == 'data':
+        if obj.data.users > 1:       # 共有メッシュは焼き込む前に切り離す
+            obj.data = obj.data.copy()
+        meshgen.apply_rot_scale(obj); return
     bpy.ops.object.select_all(action='DESELECT')
     obj.select_set(True)
     bpy.context.view_layer.objects.active = obj
     bpy.ops.object.transform_apply(location=False, rotation=True, scale=True)
 
+def place(name, key, make, mk, loc):
+    """データAPI経路: 変換済みメッシュをオブジェクト化してマテリアルを割り当て
+
+    同じ key（形状と寸法）・マテリアルのメッシュが既にあればそれを共有する
+    """
+    key += (mk,)
+    if key not in SHARED:
+        SHARED[key] = make()
+    o = meshgen.link(name, SHARED[key], loc)
+    assign(o, mk); return o
+
+def mirror(src, name):
+    """src と同じメッシュを X 反転した変換で参照する（左右で鏡像になるパーツ用）
+
+    src は親付け前（location がワールド座標）のものを渡す
+    """
+    x, y, z = src.location
+    o = meshgen.link(name, src.data, (-x, y, z))
+    o.scale = (-1, 1, 1)
+    return o
+
+def seg(r, cap, lo):
+    """半径 r の円周を弦の誤差 CHORD_ERR / DETAIL² 以内に収める分割数（lo 〜 cap）"""
+    err = CHORD_ERR / (DETAIL * DETAIL)
+    n = cap if err >= r else math.ceil(math.pi / math.acos(1 - err / r))
+    return max(lo, min(cap, n))
+
 def sphere(name, mk, r, loc, sc=(1,1,1)):
-    bpy.ops.mesh.primitive_uv_sphere_add(segments=32, ring_count=16, radius=r, location=loc)
+    u = seg(r * max(sc), 32, 8)
+    v = max(4, u // 2)
+    TRI_LOG.append((name, 2*32*15, 2*u*(v-1)))
+    if BACKEND == 'data':
+        return place(name, ('sphere', r, u, v, tuple(sc)),
+                     lambda: meshgen.uv_sphere(name, r, u, v, meshgen.xform(sc)), mk, loc)
+    bpy.ops.mesh.primitive_uv_sphere_add(segments=u, ring_count=v, radius=r, location=loc)
     o = ao(); o.name = name; o.scale = sc
     apply_all(o); smooth(o); assign(o, mk); return o
 
 def cyl(name, mk, r, h, loc, sc=(1,1,1), rot=(0,0,0)):
-    bpy.ops.mesh.primitive_cylinder_add(vertices=16, radius=r, depth=h, location=loc)
+    n = seg(r * max(sc[0], sc[1]), 16, 6)
+    TRI_LOG.append((name, 4*16-4, 4*n-4))
+    if BACKEND == 'data':
+        return place(name, ('cyl', r, h, n, tuple(sc), tuple(rot)),
+                     lambda: meshgen.cylinder(name, r, h, n, meshgen.xform(sc, rot)), mk, loc)
+    bpy.ops.mesh.primitive_cylinder_add(vertices=n, radius=r, depth=h, location=loc)
     o = ao(); o.name = name; o.scale = sc; o.rotation_euler = rot
     apply_all(o); smooth(o); assign(o, mk); return o
 
 def cone(name, mk, r, h, loc, rot=(0,0,0)):
+    if BACKEND == 'data':
+        return place(name, ('cone', r, h, tuple(rot)),
+                     lambda: meshgen.cone(name, r, 0, h, 4, meshgen.xform(rot=rot)), mk, loc)
     bpy.ops.mesh.primitive_cone_add(vertices=4, radius1=r, radius2=0, depth=h, location=loc)
     o = ao(); o.name = name; o.rotation_euler = rot
     apply_all(o); assign(o, mk); return o
 
 def cube(name, mk, sc, loc, rot=(0,0,0)):
+    if BACKEND == 'data':
+        return place(name, ('cube', tuple(sc), tuple(rot)),
+                     lambda: meshgen.cube(name, 1.0, meshgen.xform(sc, rot)), mk, loc)
     bpy.ops.mesh.primitive_cube_add(size=1.0, location=loc)
     o = ao(); o.name = name; o.scale = sc; o.rotation_euler = rot
     apply_all(o); smooth(o); assign(o, mk); return o
 
 def torus(name, mk, R, r, loc, rot=(0,0,0)):
+    M, m = seg(R + r, 40, 12), seg(r, 10, 4)
+    TRI_LOG.append((name, 2*40*10, 2*M*m))
+    if BACKEND == 'data':
+        return place(name, ('torus', R, r, M, m, tuple(rot)),
+                     lambda: meshgen.torus(name, R, r, M, m, meshgen.xform(rot=rot)), mk, loc)
     bpy.ops.mesh.primitive_torus_add(
         major_radius=R, minor_radius=r,
-        major_segments=40, minor_segments=10, location=loc)
+        major_segments=M, minor_segments=m, location=loc)
     o = ao(); o.name = name; o.rotation_euler = rot
     apply_all(o); smooth(o); assign(o, mk); return o
 
 def empty(name, loc):
+    if BACKEND == 'data':
+        o = meshgen.link(name, None, loc)
+        o.empty_display_type = 'PLAIN_AXES'; return o
     bpy.ops.object.empty_add(type='PLAIN_AXES', location=loc)
     o = ao(); o.name = name; return o
 
 def parent(child, par):
+    # データAPI経路では matrix_world が未評価なので親チェーンから計算する
     child.parent = par
-    child.matrix_parent_inverse = par.matrix_world.inverted()
+    child.matrix_parent_inverse = meshgen.world_matrix(par).inverted()
 
 # ──────────────────────────────────────────────────────────────────────
 # 寸法定数（Blender座標: Z=上, Y=奥, X=右）
@@ -141,147 +260,130 @@ zCrest  = 1.78   # クレスト基部
 xShldr  = 0.22   # 肩関節 X
 xHip    = 0.11   # 股関節 X
 
-# ──────────────────────────────────────────────────────────────────────
-# ルート Empty（キャラクター全体の親）
-# ──────────────────────────────────────────────────────────────────────
-root = empty('CharRoot', (0, 0, 0))
-
 # ──────────────────────────────────────────────────────────────────────
 # 頭部
 # ──────────────────────────────────────────────────────────────────────
-headE = empty('Head', (0, 0, zHead))
-parent(headE, root)
-
-# ヘルメット（球体ベース）
-helm = sphere('Helm', 'armor', 0.175, (0, 0, zHead), sc=(1.0, 0.92, 1.10))
-parent(helm, headE)
-
-# ヘルメット後部補強
-helmBack = cube('HelmBack', 'armor', (0.26, 0.05, 0.09), (0, -0.168, zHead+0.04))
-parent(helmBack, headE)
-
-# ゴールドトリムバンド
-band = torus('HelmBand', 'trim', 0.170, 0.016, (0, 0, zBand), rot=(math.pi/2, 0, 0))
-parent(band, headE)
-
-# ──── クレスト（中央 縦フィン）────
-crestBase = cube('CrestBase', 'trim', (0.048, 0.038, 0.205), (0, 0.008, zCrest))
-parent(crestBase, headE)
-crestTip = cone('CrestTip', 'trim', 0.026, 0.055, (0, 0.008, zCrest + 0.13))
-parent(crestTip, headE)
-
-# ──── 上部フィン（左右 × 斜め上）────
-for sx in [-1, 1]:
-    finU = cube(f'FinUp{"L" if sx<0 else "R"}', 'armor',
-                (0.045, 0.050, 0.180),
-                (sx*0.158, 0.010, zCrest - 0.01))
-    finU.rotation_euler = (0.10, 0, sx * 0.32)
-    apply_all(finU)
-    parent(finU, headE)
-
-    finUT = cube(f'FinUpTrim{"L" if sx<0 else "R"}', 'trim',
-                 (0.016, 0.030, 0.130),
-                 (sx*0.162, 0.018, zCrest - 0.01))
-    finUT.rotation_euler = (0.10, 0, sx * 0.32)
-    apply_all(finUT)
-    parent(finUT, headE)
-
+def build_head(root):
+    headE = empty('Head', (0, 0, zHead))
+    parent(headE, root)
+
+    # ヘルメット（球体ベース）
+    helm = sphere('Helm', 'armor', 0.175, (0, 0, zHead), sc=(1.0, 0.92, 1.10))
+    parent(helm, headE)
+
+    # ヘルメット後部補強
+    helmBack = cube('HelmBack', 'armor', (0.26, 0.05, 0.09), (0, -0.168, zHead+0.04))
+    parent(helmBack, headE)
+
+    # ゴールドトリムバンド
+    band = torus('HelmBand', 'trim', 0.170, 0.016, (0, 0, zBand), rot=(math.pi/2, 0, 0))
+    parent(band, headE)
+
+    # ──── クレスト（中央 縦フィン）────
+    crestBase = cube('CrestBase', 'trim', (0.048, 0.038, 0.205), (0, 0.008, zCrest))
+    parent(crestBase, headE)
+    crestTip = cone('CrestTip', 'trim', 0.026, 0.055, (0, 0.008, zCrest + 0.13))
+    parent(crestTip, headE)
+
+    # ──── 上部フィン（左右 × 斜め上）────
+    # 左側を作り、右側は同じメッシュを X 反転で参照する
+    finU = cube('FinUpL', 'armor', (0.045, 0.050, 0.180),
+                (-0.158, 0.010, zCrest - 0.01), rot=(0.10, 0, -0.32))
+    finUT = cube('FinUpTrimL', 'trim', (0.016, 0.030, 0.130),
+                 (-0.162, 0.018, zCrest - 0.01), rot=(0.10, 0, -0.32))
     # ──── サイドフィン（後ろ向き）────
-    finS = cube(f'FinSide{"L" if sx<0 else "R"}', 'armor',
-                (0.036, 0.165, 0.110),
-                (sx*0.205, -0.045, zHead + 0.06))
-    finS.rotation_euler = (0, sx * -0.20, sx * 0.12)
-    apply_all(finS)
-    parent(finS, headE)
-
-# ──── フェイスプレート（肌色）────
-face = cyl('Face', 'skin', 0.106, 0.035, (0, 0.165, zEye - 0.02),
-           sc=(1.0, 1.0, 1.28), rot=(math.pi/2, 0, 0))
-parent(face, headE)
-
-# ──── 目（左右）────
-for sx in [-1, 1]:
-    eye = sphere(f'Eye{"L" if sx<0 else "R"}', 'eye', 0.022,
-                 (sx*0.050, 0.183, zEye), sc=(1.35, 1.0, 1.0))
-    parent(eye, headE)
-
-# ──── バイザーバー ────
-visor = cube('VisorBar', 'visor', (0.145, 0.018, 0.048), (0, 0.180, zEye + 0.02))
-parent(visor, headE)
-
-# ──── 口 ────
-mouth = cube('Mouth', 'dark', (0.044, 0.012, 0.010), (0, 0.182, zEye - 0.054))
-parent(mouth, headE)
-
-# ──── 髪 ────
-hairB = cube('HairBack', 'hair', (0.250, 0.095, 0.100), (0, -0.162, zHead - 0.05))
-parent(hairB, headE)
-for sx in [-1, 1]:
-    hairS = cube(f'HairSide{"L" if sx<0 else "R"}', 'hair',
-                 (0.052, 0.080, 0.048), (sx*0.170, 0.050, zHead - 0.065))
-    parent(hairS, headE)
-
-# ──────────────────────────────────────────────────────────────────────
-# 首
-# ──────────────────────────────────────────────────────────────────────
-neck = cyl('Neck', 'suit', 0.062, 0.09, (0, 0, zNeck + 0.045),
-           sc=(1.0, 0.88, 1.0))
-parent(neck, root)
+    finS = cube('FinSideL', 'armor', (0.036, 0.165, 0.110),
+                (-0.205, -0.045, zHead + 0.06), rot=(0, 0.20, -0.12))
+    for o in (finU, finUT, finS):
+        r = mirror(o, o.name[:-1] + 'R')
+        parent(o, headE)
+        parent(r, headE)
+
+    # ──── フェイスプレート（肌色）────
+    face = cyl('Face', 'skin', 0.106, 0.035, (0, 0.165, zEye - 0.02),
+               sc=(1.0, 1.0, 1.28), rot=(math.pi/2, 0, 0))
+    parent(face, headE)
+
+    # ──── 目（左右）────
+    for sx in [-1, 1]:
+        eye = sphere(f'Eye{"L" if sx<0 else "R"}', 'eye', 0.022,
+                     (sx*0.050, 0.183, zEye), sc=(1.35, 1.0, 1.0))
+        parent(eye, headE)
+
+    # ──── バイザーバー ────
+    visor = cube('VisorBar', 'visor', (0.145, 0.018, 0.048), (0, 0.180, zEye + 0.02))
+    parent(visor, headE)
+
+    # ──── 口 ────
+    mouth = cube('Mouth', 'dark', (0.044, 0.012, 0.010), (0, 0.182, zEye - 0.054))
+    parent(mouth, headE)
+
+    # ──── 髪 ────
+    hairB = cube('HairBack', 'hair', (0.250, 0.095, 0.100), (0, -0.162, zHead - 0.05))
+    parent(hairB, headE)
+    for sx in [-1, 1]:
+        hairS = cube(f'HairSide{"L" if sx<0 else "R"}', 'hair',
+                     (0.052, 0.080, 0.048), (sx*0.170, 0.050, zHead - 0.065))
+        parent(hairS, headE)
 
 # ──────────────────────────────────────────────────────────────────────
-# カラー（金えり）
+# 首・カラー・胴体
 # ──────────────────────────────────────────────────────────────────────
-for sx in [-1, 1]:
-    col = cube(f'Collar{"L" if sx<0 else "R"}', 'trim',
-               (0.115, 0.058, 0.068), (sx*0.082, 0.052, zNeck))
-    col.rotation_euler = (0, 0, -sx * 0.28)
-    apply_all(col)
+def build_torso(root):
+    # ──── 首 ────
+    neck = cyl('Neck', 'suit', 0.062, 0.09, (0, 0, zNeck + 0.045),
+               sc=(1.0, 0.88, 1.0))
+    parent(neck, root)
+
+    # ──── カラー（金えり）────
+    col = cube('CollarL', 'trim', (0.115, 0.058, 0.068), (-0.082, 0.052, zNeck),
+               rot=(0, 0, 0.28))
+    colR = mirror(col, 'CollarR')
     parent(col, root)
-
-# ──────────────────────────────────────────────────────────────────────
-# 胴体
-# ──────────────────────────────────────────────────────────────────────
-torsoE = empty('Spine', (0, 0, zWaist))
-parent(torsoE, root)
-
-# 胴体メッシュ（腰〜胸）
-torsoH = zChest - zWaist + 0.05
-torso = cyl('Torso', 'suit', 0.158, torsoH,
-            (0, 0, zWaist + torsoH/2 - 0.02),
-            sc=(1.15, 0.88, 1.0))
-parent(torso, torsoE)
-
-# 腰ブロック
-waist = cyl('Pelvis', 'suit', 0.150, 0.10, (0, 0, zHip + 0.02), sc=(1.12, 0.88, 1.0))
-parent(waist, torsoE)
-
-# ベルト
-belt = cube('Belt', 'trim', (0.325, 0.060, 0.185), (0, 0, zWaist - 0.02))
-parent(belt, torsoE)
-
-# チェストプレート
-cpH = 0.185; cpZ = zChest - 0.02
-cp = cube('ChestPlate', 'armor', (0.272, 0.058, cpH), (0, 0.082, cpZ))
-parent(cp, torsoE)
-
-# エンブレムリング
-embR = torus('EmblemRing', 'trim', 0.060, 0.013, (0, 0.130, zChest - 0.05),
-             rot=(math.pi/2, 0, 0))
-parent(embR, torsoE)
-
-# エンブレム（赤・青 半球）
-for sx, mk in [(-1, 'embA'), (1, 'embB')]:
-    em = sphere(f'Emb{"A" if sx<0 else "B"}', mk, 0.038,
-                (sx*0.019, 0.134, zChest - 0.05), sc=(1.0, 0.5, 1.0))
-    if sx > 0:
-        em.rotation_euler = (0, math.pi, 0)
-        apply_all(em)
-    parent(em, torsoE)
+    parent(colR, root)
+
+    # ──── 胴体 ────
+    torsoE = empty('Spine', (0, 0, zWaist))
+    parent(torsoE, root)
+
+    # 胴体メッシュ（腰〜胸）
+    torsoH = zChest - zWaist + 0.05
+    torso = cyl('Torso', 'suit', 0.158, torsoH,
+                (0, 0, zWaist + torsoH/2 - 0.02),
+                sc=(1.15, 0.88, 1.0))
+    parent(torso, torsoE)
+
+    # 腰ブロック
+    waist = cyl('Pelvis', 'suit', 0.150, 0.10, (0, 0, zHip + 0.02), sc=(1.12, 0.88, 1.0))
+    parent(waist, torsoE)
+
+    # ベルト
+    belt = cube('Belt', 'trim', (0.325, 0.060, 0.185), (0, 0, zWaist - 0.02))
+    parent(belt, torsoE)
+
+    # チェストプレート
+    cpH = 0.185; cpZ = zChest - 0.02
+    cp = cube('ChestPlate', 'armor', (0.272, 0.058, cpH), (0, 0.082, cpZ))
+    parent(cp, torsoE)
+
+    # エンブレムリング
+    embR = torus('EmblemRing', 'trim', 0.060, 0.013, (0, 0.130, zChest - 0.05),
+                 rot=(math.pi/2, 0, 0))
+    parent(embR, torsoE)
+
+    # エンブレム（赤・青 半球）
+    for sx, mk in [(-1, 'embA'), (1, 'embB')]:
+        em = sphere(f'Emb{"A" if sx<0 else "B"}', mk, 0.038,
+                    (sx*0.019, 0.134, zChest - 0.05), sc=(1.0, 0.5, 1.0))
+        if sx > 0:
+            em.rotation_euler = (0, math.pi, 0)
+            apply_all(em)
+        parent(em, torsoE)
 
 # ──────────────────────────────────────────────────────────────────────
 # 腕（左右対称）
 # ──────────────────────────────────────────────────────────────────────
-def build_arm(side):
+def build_arm(side, root):
     sx = -1 if side == 'L' else 1
 
     # 肩アーマー
@@ -325,13 +427,10 @@ def build_arm(side):
                  (0, 0, -0.04), sc=(1.0, 0.85, 0.88))
     parent(hnd, hE)
 
-build_arm('L')
-build_arm('R')
-
 # ──────────────────────────────────────────────────────────────────────
 # 脚（左右対称）
 # ──────────────────────────────────────────────────────────────────────
-def build_leg(side):
+def build_leg(side, root):
     sx = -1 if side == 'L' else 1
 
     # 大腿 Empty（股関節 pivot）
@@ -389,28 +488,162 @@ def build_leg(side):
                    (0.022, 0.075, 0.055), (fsx*0.093, 0.020, 0.012))
         parent(fin, ftE)
 
-build_leg('L')
-build_leg('R')
+# ──────────────────────────────────────────────────────────────────────
+# 組み立て
+# ──────────────────────────────────────────────────────────────────────
+def build_character():
+    """全パーツを生成して CharRoot 以下にまとめる"""
+    # ルート Empty（キャラクター全体の親）
+    root = empty('CharRoot', (0, 0, 0))
+    build_head(root)
+    build_torso(root)
+    build_arm('L', root)
+    build_arm('R', root)
+    build_leg('L', root)
+    build_leg('R', root)
+
+    # 全オブジェクトを root の子にする（未親付けを防ぐ）
+    for obj in bpy.data.objects:
+        if obj.name != 'CharRoot' and obj.parent is None and obj.type in ('MESH', 'EMPTY'):
+            parent(obj, root)
+    return root
 
 # ──────────────────────────────────────────────────────────────────────
-# 全オブジェクトを root の子にする（未親付けを防ぐ）
+# スキンメッシュ化（--skinned）
+#   Empty → 同名ボーン（KYUROKU_JOINTS の名前はそのまま）
+#   パーツ → マテリアルごとに結合、持ち主ボーンへウェイト 1.0
 # ──────────────────────────────────────────────────────────────────────
-for obj in bpy.data.objects:
-    if obj.name != 'CharRoot' and obj.parent is None and obj.type in ('MESH', 'EMPTY'):
-        parent(obj, root)
+# scene.js の KYUROKU_JOINTS（GLB の extras.joints にノード番号を書く）
+KYUROKU_JOINTS = ('Head', 'Spine',
+                  'UpperArmL', 'UpperArmR', 'LowerArmL', 'LowerArmR', 'HandL', 'HandR',
+                  'ThighL', 'ThighR', 'ShinL', 'ShinR', 'FootL', 'FootR')
+
+# scene.js が名前で参照するパーツ（表示切替・まばたき）は専用ボーンを持たせる
+NAMED_PARTS = ('Face', 'EyeL', 'EyeR', 'Mouth', 'VisorBar',
+               'HairBack', 'HairSideL', 'HairSideR')
+
+def skin_character(root):
+    parts   = [o for o in bpy.data.objects if o.type == 'MESH']
+    empties = [o for o in bpy.data.objects if o.type == 'EMPTY']
+    arm_obj = rigging.armature_from_empties(
+        root, 'Kyuroku', [bpy.data.objects[n] for n in NAMED_PARTS])
+    rigging.merge_by_material(parts, arm_obj, 'Kyuroku_')
+
+    # 元のパーツと Empty は不要になるので削除
+    for o in parts + empties:
+        me = o.data
+        bpy.data.objects.remove(o)
+        if me is not None and me.users == 0:
+            bpy.data.meshes.remove(me)
+    return arm_obj
+
+def build(backend, detail=1.0):
+    """シーンをクリアして指定経路・分割係数でビルド。構築にかかった秒数を返す"""
+    global BACKEND, DETAIL
+    BACKEND, DETAIL = backend, detail
+    TRI_LOG.clear()
+    SHARED.clear()
+    # 空の factory 状態から（再ビルド時に Suit.001 等の連番が付かないよう前回のデータも消す）
+    scene_reset.reset()
+    t0 = time.perf_counter()
+    create_materials()
+    build_character()
+    return time.perf_counter() - t0
 
 # ──────────────────────────────────────────────────────────────────────
 # GLB エクスポート
 # ──────────────────────────────────────────────────────────────────────
-bpy.ops.export_scene.gltf(
-    filepath        = OUT_PATH,
-    export_format   = 'GLB',
-    use_selection   = False,
-    export_apply    = True,
-    export_materials= 'EXPORT',
-    export_cameras  = False,
-    export_lights   = False,
-    export_yup      = True,
-)
-
-print(f"\n✅  Exported: {OUT_PATH}\n")
+def export_glb(path):
+    bpy.ops.export_scene.gltf(
+        filepath        = path,
+        export_format   = 'GLB',
+        use_selection   = False,
+        export_apply    = True,
+        export_materials= 'EXPORT',
+        export_cameras  = False,
+        export_lights   = False,
+        export_yup      = True,
+    )
+    # 全フォームの配色を KHR_materials_variants として追加（1 GLB で全フォーム）
+    form_variants.add_variants_file(path)
+    # 全マテリアル × フォームをパレットテクスチャ 1 枚にまとめ、静的なパーツを親ごとに結合
+    palette.optimize_file(path, keep_nodes=NAMED_PARTS)
+    # 目と口のモーフターゲット（まばたき・口の開き・母音の口形）
+    face_morphs.add_morphs_file(path)
+    # scene.js の手続きアニメーション（待機・走り・会話・まばたき…）をクリップとして焼き込む
+    kyuroku_clips.add_clips_file(path)
+
+# ──────────────────────────────────────────────────────────────────────
+# 経路比較（ops vs data）
+# ──────────────────────────────────────────────────────────────────────
+def compare(n):
+    res = {b: sorted(build(b) for _ in range(n)) for b in ('ops', 'data')}
+    parts = sum(1 for o in bpy.data.objects if o.type == 'MESH')
+    mid = n // 2
+    print(f"\n[kyuroku] build time  ({parts} mesh parts, {n} runs each)")
+    for b, ts in res.items():
+        print(f"  {b:<5} best {ts[0]*1000:8.1f} ms   median {ts[mid]*1000:8.1f} ms")
+    print(f"  speedup x{res['ops'][mid] / res['data'][mid]:.1f} (median)\n")
+
+def tess_report():
+    """曲面パーツごとの三角形数（固定分割 → 適応分割）を表示"""
+    print(f"\n[kyuroku] tessellation  DETAIL={DETAIL}  CHORD_ERR={CHORD_ERR*1000:.2f} mm")
+    for name, before, after in TRI_LOG:
+        print(f"  {name:<18}{before:>6} → {after:<6}")
+    b = sum(r[1] for r in TRI_LOG); a = sum(r[2] for r in TRI_LOG)
+    print(f"  {'total':<18}{b:>6} → {a:<6} ({100*(b-a)/b:.0f}% fewer)\n")
+
+def script_args():
+    """Blender の "--" 以降の引数だけを返す"""
+    return sys.argv[sys.argv.index('--') + 1:] if '--' in sys.argv else []
+
+def main():
+    ap = argparse.ArgumentParser(prog='build_kyuroku.py')
+    ap.add_argument('--backend', choices=('data', 'ops'), default=BACKEND)
+    ap.add_argument('--compare', type=int, default=0, metavar='N')
+    ap.add_argument('--skinned', action='store_true')
+    ap.add_argument('--detail', type=float, default=DETAIL)
+    ap.add_argument('--tess-report', action='store_true')
+    ap.add_argument('--meshopt', action='store_true')
+    ap.add_argument('--out', default=OUT_PATH)
+    ap.add_argument('--stage', choices=('all', 'mesh', 'glb'), default='all')
+    ap.add_argument('--load', metavar='BLEND')
+    ap.add_argument('--save', metavar='BLEND')
+    instrument.add_args(ap)
+    args = ap.parse_args(script_args())
+
+    if args.compare:
+        compare(args.compare)
+        return
+    prof = instrument.from_args(f'kyuroku-{args.stage}', args)
+    if args.stage == 'glb':
+        with prof.phase('load'):
+            bpy.ops.wm.open_mainfile(filepath=args.load)
+            apply_palette()
+    else:
+        with prof.phase('build'):
+            build(args.backend, args.detail)
+        if args.tess_report:
+            tess_report()
+    if args.stage == 'mesh':
+        with prof.phase('save'):
+            bpy.ops.wm.save_as_mainfile(filepath=args.save, check_existing=False)
+        prof.finish()
+        return
+    if args.skinned:
+        with prof.phase('skin'):
+            skin_character(bpy.data.objects['CharRoot'])
+    with prof.phase('export'):
+        export_glb(args.out)
+    # キー削減 → 量子化・重複除去（+ meshopt 圧縮）
+    with prof.phase('optimize'):
+        anim_optimize.optimize_file(args.out)
+        glb_optimize.optimize_file(args.out, meshopt=args.meshopt)
+        # scene.js が読み込み時に辿っていた値（身長・床・関節・マテリアル）
+        glb_meta.add_metadata_file(args.out, joints=KYUROKU_JOINTS, bounds='mesh',
+                                   clip_info=anim_library.clip_info)
+    prof.finish()
+    print(f"\n✅  Exported: {args.out}\n")
+
+if __name__ == "__main__":
+    main()
@@ -8,14 +8,35 @@ Base Form : キャストオフ (blue bodysuit, gold trim, X-emblem chest)
 Usage:
   /Applications/Blender.app/Contents/MacOS/Blender --background --python create_r4_character.py
 
-Output: /tmp/R4_Character.fbx
+Output: <tempdir>/R4_Character.fbx（--out で変更可）
+
+Options (after "--"):
+  --out PATH                 出力 FBX（既定: OUT_PATH）
+  --stage all|rig|anim|fbx   ステージ単位で実行（build.py のインクリメンタルビルド用）
+                               rig : マテリアル + メッシュ + アーマチュア + ウェイト → --save
+                               anim: --load の .blend にアクションを追加 → --save
+                               fbx : --load の .blend に COLORS を反映して FBX 出力
+  --profile DIR              フェーズごとの計測を DIR に書く（instrument.py、--cprofile 併用可）
 """
 
 import bpy
 import bmesh
 import math
+import os
+import sys
+import argparse
+import tempfile
 from mathutils import Vector, Matrix, Euler
 
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import rigging
+import scene_reset
+import instrument
+import anim_library
+from keyframes import KeyLayer, write_clip
+
+OUT_PATH = os.path.join(tempfile.gettempdir(), "R4_Character.fbx")
+
 # ────────────────────────────────────────────────
 # 定数 / 比率定義 (Mega Man X DiVE スタイル)
 # ────────────────────────────────────────────────
@@ -48,15 +69,7 @@ COLORS = {
 # ────────────────────────────────────────────────
 # ユーティリティ
 # ────────────────────────────────────────────────
-def clear_scene():
-    bpy.ops.object.select_all(action='SELECT')
-    bpy.ops.object.delete()
-    for m in list(bpy.data.materials):
-        bpy.data.materials.remove(m)
-
-def make_material(name, color, metallic=0.2, roughness=0.4, alpha=1.0):
-    mat = bpy.data.materials.new(name)
-    mat.use_nodes = True
+def set_bsdf(mat, color, metallic=0.2, roughness=0.4, alpha=1.0):
     bsdf = mat.node_tree.nodes["Principled BSDF"]
     bsdf.inputs["Base Color"].default_value   = color
     bsdf.inputs["Metallic"].default_value     = metallic
@@ -64,6 +77,11 @@ def make_material(name, color, metallic=0.2, roughness=0.4, alpha=1.0):
     if alpha < 1.0:
         mat.blend_method = 'BLEND'
         bsdf.inputs["Alpha"].default_value = alpha
+
+def make_material(name, color, metallic=0.2, roughness=0.4, alpha=1.0):
+    mat = bpy.data.materials.new(name)
+    mat.use_nodes = True
+    set_bsdf(mat, color, metallic, roughness, alpha)
     return mat
 
 def add_to_collection(obj, col_name):
@@ -105,6 +123,28 @@ def add_cylinder(name, radius, depth, location, rotation=(0,0,0), verts=16):
     obj.name = name
     return obj
 
+def add_mirrored(src, name):
+    """src のメッシュを複製し、X=0 面で鏡映した位置に置くオブジェクト
+
+    パーツは自身のローカル X について対称（カプセル・箱・円柱）なので
+    位置と回転だけ鏡映すれば負スケール無しで R 側になる。
+    メッシュは共有しない: 頂点グループの名前はメッシュ側にあるので、共有すると
+    rigid_weight が *_L と *_R の両方のボーンに 1.0 を書き、左右が平均で動く。
+    """
+    obj = bpy.data.objects.new(name, src.data.copy())
+    x, y, z = src.location
+    rx, ry, rz = src.rotation_euler
+    obj.location = (-x, y, z)
+    obj.rotation_euler = (rx, -ry, -rz)
+    for c in src.users_collection:
+        c.objects.link(obj)
+    return obj
+
+def mirror_parts():
+    """*_L のメッシュパーツから対応する *_R を鏡映位置に作る"""
+    for obj in [o for o in bpy.data.objects if o.type == 'MESH' and o.name.endswith("_L")]:
+        add_mirrored(obj, obj.name[:-2] + "_R")
+
 def assign_mat(obj, mat_name):
     mat = bpy.data.materials.get(mat_name)
     if mat is None:
@@ -117,15 +157,32 @@ def assign_mat(obj, mat_name):
 # ────────────────────────────────────────────────
 # Phase 1 : マテリアル生成
 # ────────────────────────────────────────────────
+# マテリアル名 → (COLORS キー, metallic, roughness, alpha)
+MATERIALS = {
+    "MAT_BodyBlue"  : ("body_blue",    0.5, 0.3, 1.0),
+    "MAT_BodyDark"  : ("body_dark",    0.5, 0.3, 1.0),
+    "MAT_GoldTrim"  : ("gold_trim",    0.9, 0.1, 1.0),
+    "MAT_Visor"     : ("visor",        0.0, 0.0, 0.6),
+    "MAT_EmblemOut" : ("emblem_outer", 0.6, 0.2, 1.0),
+    "MAT_EmblemIn"  : ("emblem_inner", 0.3, 0.4, 1.0),
+    "MAT_Skin"      : ("skin",         0.0, 0.8, 1.0),
+    "MAT_White"     : ("white",        0.1, 0.5, 1.0),
+}
+
 def create_materials():
-    make_material("MAT_BodyBlue",   COLORS["body_blue"],   metallic=0.5, roughness=0.3)
-    make_material("MAT_BodyDark",   COLORS["body_dark"],   metallic=0.5, roughness=0.3)
-    make_material("MAT_GoldTrim",   COLORS["gold_trim"],   metallic=0.9, roughness=0.1)
-    make_material("MAT_Visor",      (*COLORS["visor"][:3], 0.6), metallic=0.0, roughness=0.0, alpha=0.6)
-    make_material("MAT_EmblemOut",  COLORS["emblem_outer"],metallic=0.6, roughness=0.2)
-    make_material("MAT_EmblemIn",   COLORS["emblem_inner"],metallic=0.3, roughness=0.4)
-    make_material("MAT_Skin",       COLORS["skin"],        metallic=0.0, roughness=0.8)
-    make_material("MAT_White",      COLORS["white"],       metallic=0.1, roughness=0.5)
+    for name, (key, metallic, roughness, alpha) in MATERIALS.items():
+        make_material(name, (*COLORS[key][:3], alpha), metallic, roughness, alpha)
+
+def apply_palette():
+    """保存済み .blend のマテリアルに COLORS の値を書き戻す（fbx ステージ用）
+
+    どのパーツにも割り当てていないマテリアル（MAT_Skin など）はユーザー 0 で
+    .blend に保存されないので飛ばす（FBX にも出ない）
+    """
+    for name, (key, metallic, roughness, alpha) in MATERIALS.items():
+        mat = bpy.data.materials.get(name)
+        if mat is not None:
+            set_bsdf(mat, (*COLORS[key][:3], alpha), metallic, roughness, alpha)
 
 # ────────────────────────────────────────────────
 # Phase 2 : メッシュ生成 (分離メッシュ方式)
@@ -147,11 +204,9 @@ def build_head(y_base):
                          rotation=(0, 0.3, 0))
     assign_mat(crest, "MAT_BodyBlue")
 
-    # 左右サイドフィン
-    for side, sx in [("L", -0.10), ("R", 0.10)]:
-        fin = add_box(f"HelmFin_{side}", (0.04, 0.04, 0.12),
-                      (sx, 0.02, z + 0.06))
-        assign_mat(fin, "MAT_BodyDark")
+    # 左右サイドフィン（R 側は mirror_parts で作る）
+    fin = add_box("HelmFin_L", (0.04, 0.04, 0.12), (-0.10, 0.02, z + 0.06))
+    assign_mat(fin, "MAT_BodyDark")
 
     # ゴールドのヘルムライン
     line = add_box("HelmLine", (0.20, 0.02, 0.02), (0, 0.10, z + 0.05))
@@ -267,10 +322,10 @@ def build_character():
 
     build_head(torso_bot_z + TORSO_H + PELVIS_H - 0.02)
     build_torso(torso_bot_z)
+    # 左側だけ生成し、右側は同じメッシュを鏡映位置で参照する
     build_arm("L", shoulder_z)
-    build_arm("R", shoulder_z)
     build_leg("L", leg_top_z)
-    build_leg("R", leg_top_z)
+    mirror_parts()
 
 # ────────────────────────────────────────────────
 # Phase 3 : アーマチュア (ボーン + IK/FK)
@@ -406,196 +461,79 @@ def build_armature():
 # ────────────────────────────────────────────────
 def create_animations(arm_obj):
     """
-    5種類のActionを生成:
+    anim_library の共通クリップをこのリグにリターゲットして Action を生成:
       - Idle     : 待機 (軽い上下揺れ)
       - Run      : 走り
       - Turn     : 振り向き
       - Talking  : 話しているポーズ (音声出力中 / TTS再生中)
       - Listening: 聴いているポーズ (音声入力中 / STT録音中)
+      - Think    : 考え中
+    ボーン名・軸の対応と Unity 向けのクリップ名は anim_library.R4。
     """
     bpy.context.view_layer.objects.active = arm_obj
     bpy.ops.object.mode_set(mode='POSE')
-
-    def set_pose_bone_loc(bone_name, frame, loc):
-        pb = arm_obj.pose.bones.get(bone_name)
-        if pb is None:
-            return
-        pb.location = loc
-        pb.keyframe_insert("location", frame=frame)
-
-    def set_pose_bone_rot(bone_name, frame, euler_deg):
-        pb = arm_obj.pose.bones.get(bone_name)
-        if pb is None:
-            return
-        pb.rotation_mode = 'XYZ'
-        pb.rotation_euler = Euler(
-            (math.radians(euler_deg[0]),
-             math.radians(euler_deg[1]),
-             math.radians(euler_deg[2])), 'XYZ')
-        pb.keyframe_insert("rotation_euler", frame=frame)
-
-    # ── IDLE ────────────────────────────
-    action_idle = bpy.data.actions.new("Idle")
     arm_obj.animation_data_create()
-    arm_obj.animation_data.action = action_idle
-    for f in [0, 15, 30]:
-        offset = 0.02 if f == 15 else 0.0
-        set_pose_bone_loc("Hips", f, (0, 0, offset))
-    action_idle.use_fake_user = True
-
-    # ── RUN ─────────────────────────────
-    action_run = bpy.data.actions.new("Run")
-    arm_obj.animation_data.action = action_run
-    run_keys = [
-        # frame, bone,          rotation XYZ (degrees)
-        (0,  "UpperLeg_L",  (-30,  0, 0)),
-        (0,  "LowerLeg_L",  ( 20,  0, 0)),
-        (0,  "UpperLeg_R",  ( 30,  0, 0)),
-        (0,  "LowerLeg_R",  (-10,  0, 0)),
-        (0,  "UpperArm_L",  ( 20,  0, 0)),
-        (0,  "LowerArm_L",  (-15,  0, 0)),
-        (0,  "UpperArm_R",  (-20,  0, 0)),
-        (0,  "LowerArm_R",  ( 15,  0, 0)),
-        (0,  "Spine",       (-10,  0, 5)),
-        (12, "UpperLeg_L",  ( 30,  0, 0)),
-        (12, "LowerLeg_L",  (-10,  0, 0)),
-        (12, "UpperLeg_R",  (-30,  0, 0)),
-        (12, "LowerLeg_R",  ( 20,  0, 0)),
-        (12, "UpperArm_L",  (-20,  0, 0)),
-        (12, "LowerArm_L",  ( 15,  0, 0)),
-        (12, "UpperArm_R",  ( 20,  0, 0)),
-        (12, "LowerArm_R",  (-15,  0, 0)),
-        (12, "Spine",       (-10,  0,-5)),
-        (24, "UpperLeg_L",  (-30,  0, 0)),
-        (24, "LowerLeg_L",  ( 20,  0, 0)),
-        (24, "UpperLeg_R",  ( 30,  0, 0)),
-        (24, "LowerLeg_R",  (-10,  0, 0)),
-        (24, "UpperArm_L",  ( 20,  0, 0)),
-        (24, "LowerArm_L",  (-15,  0, 0)),
-        (24, "UpperArm_R",  (-20,  0, 0)),
-        (24, "LowerArm_R",  ( 15,  0, 0)),
-        (24, "Spine",       (-10,  0, 5)),
-    ]
-    for frame, bone, rot in run_keys:
-        set_pose_bone_rot(bone, frame, rot)
-    action_run.use_fake_user = True
-
-    # ── TURN ────────────────────────────
-    action_turn = bpy.data.actions.new("Turn")
-    arm_obj.animation_data.action = action_turn
-    turn_keys = [
-        (0,  "Hips",   (0,  0,   0)),
-        (0,  "Chest",  (0,  0,   0)),
-        (10, "Hips",   (0,  0, -45)),
-        (10, "Chest",  (0,  0, -30)),
-        (20, "Hips",   (0,  0, -90)),
-        (20, "Chest",  (0,  0, -90)),
-        (30, "Hips",   (0,  0,-180)),
-        (30, "Chest",  (0,  0,-180)),
-    ]
-    for frame, bone, rot in turn_keys:
-        set_pose_bone_rot(bone, frame, rot)
-    action_turn.use_fake_user = True
-
-    # ── TALKING (TTS再生中：しゃべっているポーズ) ────────────────
-    # キュロクらしい「ちょっと前のめりで元気よく話す」アクション
-    #   - Spine を少し前傾 + 左右に小刻みに揺れる
-    #   - 右手(R)を顔の前に上げてジェスチャー
-    #   - 左手(L)は腰に当てる
-    #   - 頭が小さく頷く (Head の X 軸揺れ)
-    #   - 24 fpsループ (0→24)
-    action_talk = bpy.data.actions.new("Talking")
-    arm_obj.animation_data.action = action_talk
-    talk_keys = [
-        # ── Spine: 前傾 + 左右揺れ ──
-        (0,  "Spine", (-12,  0,  4)),
-        (6,  "Spine", (-10,  0,  2)),
-        (12, "Spine", (-12,  0, -4)),
-        (18, "Spine", (-10,  0, -2)),
-        (24, "Spine", (-12,  0,  4)),
-        # ── 右腕: 顔の前に上げてジェスチャー ──
-        (0,  "UpperArm_R", (-60,  0,  20)),
-        (0,  "LowerArm_R", ( 80,  0,   0)),
-        (6,  "UpperArm_R", (-55,  0,  15)),
-        (6,  "LowerArm_R", ( 70,  0,   0)),
-        (12, "UpperArm_R", (-65,  0,  20)),
-        (12, "LowerArm_R", ( 85,  0,   0)),
-        (18, "UpperArm_R", (-55,  0,  15)),
-        (18, "LowerArm_R", ( 70,  0,   0)),
-        (24, "UpperArm_R", (-60,  0,  20)),
-        (24, "LowerArm_R", ( 80,  0,   0)),
-        # ── 左腕: 腰に当てる ──
-        (0,  "UpperArm_L", ( 10,  0, -30)),
-        (0,  "LowerArm_L", ( 45,  0,   0)),
-        (24, "UpperArm_L", ( 10,  0, -30)),
-        (24, "LowerArm_L", ( 45,  0,   0)),
-        # ── Head: 小さく頷く ──
-        (0,  "Head", ( 5,  0,  0)),
-        (8,  "Head", (-5,  0,  0)),
-        (16, "Head", ( 5,  0,  0)),
-        (24, "Head", ( 5,  0,  0)),
-    ]
-    for frame, bone, rot in talk_keys:
-        set_pose_bone_rot(bone, frame, rot)
-    action_talk.use_fake_user = True
-
-    # ── LISTENING (STT録音中：耳を傾けるポーズ) ──────────────────
-    # キュロクらしい「ちょっと首を傾げて、目を輝かせて聴く」アクション
-    #   - 胴体を少し前傾して相手に向ける
-    #   - 頭を右に 10° 傾ける + ゆっくり揺れる
-    #   - 両腕を少し前に出して「聴いてるよ」姿勢
-    #   - Hips に小さな重心移動
-    #   - 36 fpsループ (0→36) ゆったり
-    action_listen = bpy.data.actions.new("Listening")
-    arm_obj.animation_data.action = action_listen
-    listen_keys = [
-        # ── Spine: 少し前傾・じっとしてる ──
-        (0,  "Spine", (-8,  0,  2)),
-        (18, "Spine", (-8,  0, -2)),
-        (36, "Spine", (-8,  0,  2)),
-        # ── Head: 少し右に傾げてゆらゆら ──
-        (0,  "Head",  ( 5,  0,  10)),
-        (12, "Head",  ( 3,  0,   8)),
-        (24, "Head",  ( 5,  0,  12)),
-        (36, "Head",  ( 5,  0,  10)),
-        # ── 右腕: 自然に前方へ ──
-        (0,  "UpperArm_R", (-15,  0,  10)),
-        (0,  "LowerArm_R", ( 20,  0,   0)),
-        (36, "UpperArm_R", (-15,  0,  10)),
-        (36, "LowerArm_R", ( 20,  0,   0)),
-        # ── 左腕: 斜め前に軽く伸ばす ──
-        (0,  "UpperArm_L", (-10,  0, -10)),
-        (0,  "LowerArm_L", ( 15,  0,   0)),
-        (36, "UpperArm_L", (-10,  0, -10)),
-        (36, "LowerArm_L", ( 15,  0,   0)),
-        # ── Hips: ゆっくり重心移動 ──
-        (0,  "Hips", ( 0,  0,  0)),
-        (18, "Hips", ( 0,  0,  3)),
-        (36, "Hips", ( 0,  0,  0)),
-    ]
-    for frame, bone, rot in listen_keys:
-        set_pose_bone_rot(bone, frame, rot)
-    action_listen.use_fake_user = True
+    for clip in anim_library.retarget_all('r4'):
+        act = bpy.data.actions.new(clip[0])
+        arm_obj.animation_data.action = act
+        k = KeyLayer(arm_obj)
+        write_clip(k, clip)
+        k.flush(act)
+        act.use_fake_user = True
 
     bpy.ops.object.mode_set(mode='OBJECT')
 
 # ────────────────────────────────────────────────
-# Phase 5 : スキンウェイト (自動)
+# Phase 5 : スキンウェイト (剛体 / パーツ→ボーン対応表)
 # ────────────────────────────────────────────────
-def auto_weight(arm_obj):
-    """全メッシュを Armature に親子付けして自動ウェイトを適用"""
+# 分離メッシュ方式なので各パーツの持ち主ボーンは一意に決まる。
+# ヒートマップ (ARMATURE_AUTO) は使わず、頂点グループを直接書き込む。
+PART_BONES = {
+    # 頭
+    "Head"        : "Head",
+    "Visor"       : "Head",
+    "HelmCrest"   : "Head",
+    "HelmFin_L"   : "Head",
+    "HelmFin_R"   : "Head",
+    "HelmLine"    : "Head",
+    # 胴
+    "Chest"       : "Chest",
+    "Collar"      : "Chest",
+    "EmblemOuter" : "Chest",
+    "EmblemInner" : "Chest",
+    "Pelvis"      : "Hips",
+    "Belt"        : "Hips",
+}
+for _s in ("L", "R"):
+    PART_BONES.update({
+        # 腕
+        f"ShoulderPad_{_s}" : f"Shoulder_{_s}",
+        f"UpperArm_{_s}"    : f"UpperArm_{_s}",
+        f"LowerArm_{_s}"    : f"LowerArm_{_s}",
+        f"Gauntlet_{_s}"    : f"LowerArm_{_s}",
+        f"Hand_{_s}"        : f"Hand_{_s}",
+        # 脚
+        f"Thigh_{_s}"       : f"UpperLeg_{_s}",
+        f"KneePad_{_s}"     : f"LowerLeg_{_s}",
+        f"Shin_{_s}"        : f"LowerLeg_{_s}",
+        f"Boot_{_s}"        : f"Foot_{_s}",
+        f"Sole_{_s}"        : f"Foot_{_s}",
+    })
+
+def rigid_weight(arm_obj):
+    """全メッシュを PART_BONES のボーンにウェイト 1.0 で束縛（1頂点1ボーン）"""
     meshes = [o for o in bpy.data.objects if o.type == 'MESH']
+    missing = [m.name for m in meshes if PART_BONES.get(m.name) not in arm_obj.data.bones]
+    if missing:
+        raise RuntimeError(f"PART_BONES に持ち主ボーンが無いパーツ: {missing}")
     for m in meshes:
-        m.select_set(True)
-    arm_obj.select_set(True)
-    bpy.context.view_layer.objects.active = arm_obj
-    bpy.ops.object.parent_set(type='ARMATURE_AUTO')
-    bpy.ops.object.select_all(action='DESELECT')
+        rigging.set_rigid_weights(m, PART_BONES[m.name])
+        rigging.bind(m, arm_obj)
 
 # ────────────────────────────────────────────────
 # Phase 6 : FBX エクスポート
 # ────────────────────────────────────────────────
-def export_fbx(path="/tmp/R4_Character.fbx"):
+def export_fbx(path=OUT_PATH):
     bpy.ops.export_scene.fbx(
         filepath          = path,
         use_selection     = False,
@@ -607,9 +545,9 @@ def export_fbx(path="/tmp/R4_Character.fbx"):
         add_leaf_bones    = False,
         primary_bone_axis = 'Y',
         secondary_bone_axis = 'X',
-        use_anim          = True,
-        anim_step         = 1,
-        simplify_fac      = 0.0,
+        bake_anim         = True,
+        bake_anim_step    = 1,
+        bake_anim_simplify_factor = 0.0,
         path_mode         = 'AUTO',
     )
     print(f"[R4] FBX exported → {path}")
@@ -617,19 +555,62 @@ def export_fbx(path="/tmp/R4_Character.fbx"):
 # ────────────────────────────────────────────────
 # メイン
 # ────────────────────────────────────────────────
-if __name__ == "__main__":
-    print("[R4] Clearing scene...")
-    clear_scene()
-    print("[R4] Creating materials...")
-    create_materials()
-    print("[R4] Building character mesh...")
-    build_character()
-    print("[R4] Building armature (IK/FK rig)...")
-    arm_obj = build_armature()
-    print("[R4] Creating animations (Idle / Run / Turn)...")
-    create_animations(arm_obj)
-    print("[R4] Auto-weighting meshes...")
-    auto_weight(arm_obj)
+def script_args():
+    """Blender の "--" 以降の引数だけを返す"""
+    return sys.argv[sys.argv.index('--') + 1:] if '--' in sys.argv else []
+
+def main():
+    ap = argparse.ArgumentParser(prog='create_r4_character.py')
+    ap.add_argument('--out', default=OUT_PATH)
+    ap.add_argument('--stage', choices=('all', 'rig', 'anim', 'fbx'), default='all')
+    ap.add_argument('--load', metavar='BLEND')
+    ap.add_argument('--save', metavar='BLEND')
+    instrument.add_args(ap)
+    args = ap.parse_args(script_args())
+    prof = instrument.from_args(f'r4-{args.stage}', args)
+
+    if args.stage in ('all', 'rig'):
+        print("[R4] Clearing scene...")
+        with prof.phase('clear'):
+            scene_reset.reset()
+            # anim_library は FPS でキーを打つ。factory の 24fps のままだと 0.8 倍速になる
+            #（設定は rig ステージの .blend に入り、anim / fbx ステージに引き継がれる）
+            bpy.context.scene.render.fps = anim_library.FPS
+            bpy.context.scene.render.fps_base = 1
+        print("[R4] Creating materials...")
+        with prof.phase('materials'):
+            create_materials()
+        print("[R4] Building character mesh...")
+        with prof.phase('mesh'):
+            build_character()
+        print("[R4] Building armature (IK/FK rig)...")
+        with prof.phase('armature'):
+            arm_obj = build_armature()
+    else:
+        with prof.phase('load'):
+            bpy.ops.wm.open_mainfile(filepath=args.load)
+            arm_obj = bpy.data.objects["Armature_R4"]
+    if args.stage in ('all', 'anim'):
+        print("[R4] Creating animations (anim_library → Idle / Run / Turn / Talking / Listening / Think)...")
+        with prof.phase('animations'):
+            create_animations(arm_obj)
+    if args.stage in ('all', 'rig'):
+        print("[R4] Rigid-weighting meshes...")
+        with prof.phase('weights'):
+            rigid_weight(arm_obj)
+    if args.stage in ('rig', 'anim'):
+        with prof.phase('save'):
+            bpy.ops.wm.save_as_mainfile(filepath=args.save, check_existing=False)
+        prof.finish()
+        print(f"[R4] Saved stage '{args.stage}' → {args.save}")
+        return
+    if args.stage == 'fbx':
+        apply_palette()
     print("[R4] Exporting FBX...")
-    export_fbx("/tmp/R4_Character.fbx")
-    print("[R4] Done! → /tmp/R4_Character.fbx")
+    with prof.phase('export'):
+        export_fbx(args.out)
+    prof.finish()
+    print(f"[R4] Done! → {args.out}")
+
+if __name__ == "__main__":
+    main()
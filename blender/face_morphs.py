@@ -0,0 +1,139 @@
+"""
+face_morphs.py — 目と口のモーフターゲット（まばたき・口の開き・母音の口形）を GLB に書く
+
+kyuroku の目（EyeL / EyeR）と口（Mouth）は独立したメッシュなので、頂点位置から
+形を計算して POSITION のモーフターゲットとして追加する。まばたきはボーン/ノードの
+スケールではなく重み 1 本、リップシンクは口の重みを毎フレーム 1 つ書くだけになり、
+混ぜ合わせは GPU が行う。
+
+  - どのノードにどのターゲットを持たせるかは anim_library.KYUROKU['morphs']
+  - 形はメッシュのローカル座標（glTF の Y 上, -Z 前）で SHAPES の関数が決める
+  - 差分は動く頂点だけの sparse アクセサで書く（その方が大きくなるなら通常のアクセサ）
+  - ターゲット名は mesh.extras.targetNames（three.js の morphTargetDictionary）
+
+メッシュにターゲットがあると glb_optimize は POSITION を量子化しない（ノードの
+TRS を変えないため）。目と口は頂点数が少ないのでサイズへの影響は小さい。
+
+使い方:
+  python face_morphs.py kyuroku.glb [-o out.glb]
+"""
+import argparse
+import sys
+
+import anim_library
+import glb
+
+EPS = 1e-7          # これ以下の移動は 0 とみなす（sparse から外す）
+
+LID = 0.35          # まぶたが閉じる高さ（目の下端 0 〜 上端 1）
+JAW = 2.5           # Open の下あごの開き（口の高さの倍数）
+# 母音の口形: (横幅の倍率, 下あごの開き = 口の高さの倍数)
+VISEMES = {'A': (1.0, 3.0), 'I': (1.3, 0.8), 'U': (0.6, 1.2),
+           'E': (1.2, 1.8), 'O': (0.75, 2.6)}
+
+
+# ──────────────────────────────────────────────────────────────────────
+# 形（頂点, メッシュの境界 lo / hi → 変形後の頂点）
+# ──────────────────────────────────────────────────────────────────────
+def blink(p, lo, hi):
+    """まぶたの線より上を線に向かって潰す（下半分は動かない）"""
+    c = lo[1] + (hi[1] - lo[1]) * LID
+    if p[1] <= c:
+        return p
+    return (p[0], c + (p[1] - c) * 0.05, p[2])
+
+
+def mouth(sx, drop):
+    """横幅を sx 倍、口の下半分を drop × 高さだけ下げる（上唇は動かない）"""
+    def shape(p, lo, hi):
+        h, cy = hi[1] - lo[1], (lo[1] + hi[1]) / 2
+        cx = (lo[0] + hi[0]) / 2
+        y = p[1] - drop * h if p[1] < cy else p[1]
+        return (cx + (p[0] - cx) * sx, y, p[2])
+    return shape
+
+
+SHAPES = {'Blink': blink, 'Open': mouth(1.0, JAW),
+          **{v: mouth(*s) for v, s in VISEMES.items()}}
+
+
+# ──────────────────────────────────────────────────────────────────────
+def _target(asset, rows, lo, hi, shape):
+    """1 ターゲット分の POSITION 差分アクセサ。(アクセサ, 動いた頂点数)"""
+    deltas = [tuple(b - a for a, b in zip(p, shape(p, lo, hi))) for p in rows]
+    ids = [i for i, d in enumerate(deltas) if max(abs(c) for c in d) > EPS]
+    moved = len(ids)
+    ids = ids or [0]                # sparse.count は 1 以上
+    # sparse は 1 頂点あたり インデックス + 値。通常のアクセサ（値のみ）より小さいときだけ
+    isize = 1 if len(rows) <= 0xff else 2 if len(rows) <= 0xffff else 4
+    if len(ids) * (isize + 12) < len(rows) * 12:
+        return asset.add_sparse_accessor(len(rows), ids, [deltas[i] for i in ids],
+                                         minmax=True), moved
+    return asset.add_accessor(deltas, target=glb.ARRAY_BUFFER, minmax=True), moved
+
+
+def add_morphs(asset, morphs=None):
+    """asset のノード名 → ターゲット名の対応 morphs に従ってモーフターゲットを追加
+
+    メッシュを持たないノード（--skinned でボーンになったパーツ）は飛ばす。
+    戻り値: {ノード名: (ターゲット数, 動く頂点数の合計, 頂点数)}
+    """
+    morphs = anim_library.KYUROKU['morphs'] if morphs is None else morphs
+    g = asset.gltf
+    report, done = {}, {}           # done: メッシュ番号 → 最初に処理したノード名
+    for node in g.get('nodes', []):
+        name = node.get('name')
+        if name not in morphs or 'mesh' not in node:
+            continue
+        names = list(morphs[name])
+        unknown = [t for t in names if t not in SHAPES]
+        if unknown:
+            raise ValueError(f'unknown morph shape: {unknown}')
+        mi = node['mesh']
+        if mi in done:              # L/R で共有しているメッシュ
+            if list(morphs[done[mi]]) != names:
+                raise ValueError(f'mesh of {name!r} shared with different morph targets')
+            report[name] = report[done[mi]]
+            continue
+        mesh = g['meshes'][mi]
+        if any(p.get('targets') for p in mesh['primitives']):
+            raise ValueError(f'mesh of {name!r} already has morph targets')
+        pos = [asset.read(p['attributes']['POSITION']) for p in mesh['primitives']]
+        pts = [r for rows in pos for r in rows]
+        lo = [min(r[k] for r in pts) for k in range(3)]
+        hi = [max(r[k] for r in pts) for k in range(3)]
+        moved = 0
+        for p, rows in zip(mesh['primitives'], pos):
+            p['targets'] = []
+            for t in names:
+                acc, n = _target(asset, rows, lo, hi, SHAPES[t])
+                p['targets'].append({'POSITION': acc})
+                moved += n
+        mesh['weights'] = [0.0] * len(names)
+        mesh.setdefault('extras', {})['targetNames'] = names
+        done[mi] = name
+        report[name] = (len(names), moved, len(pts))
+    return report
+
+
+def add_morphs_file(src, dst=None, morphs=None, verbose=True):
+    asset = glb.Asset.load(src)
+    report = add_morphs(asset, morphs)
+    size = asset.save(dst or src)
+    if verbose:
+        print('[face_morphs] ' + '  '.join(
+            f'{n} {k} targets ({moved}/{k * total} verts moved)'
+            for n, (k, moved, total) in report.items()) + f' → {size} bytes')
+    return report
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(prog='face_morphs.py')
+    ap.add_argument('src')
+    ap.add_argument('-o', '--out')
+    args = ap.parse_args(argv)
+    add_morphs_file(args.src, args.out)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,175 @@
+"""
+form_variants.py — フォームごとの配色を KHR_materials_variants として GLB に書き込む
+
+kyuroku.glb 1 つに全フォーム（キャストオフ〜サイト）のマテリアルを持たせ、
+ランタイムはプリミティブのマテリアルを差し替えるだけでフォームを切り替える。
+（同じ MeshStandardMaterial 構成なのでシェーダーの再コンパイルは起きない）
+バグフォームは別 GLB（bug_animated.glb）なのでここには含めない。
+
+  - 先頭フォーム（castoff）は既存マテリアルをその値で上書きして既定にする
+  - 他のフォームはマテリアルを複製して値を差し替え、mappings で紐付ける
+  - ライト・フォグなどのシーン側の色は variant の extras に入れる
+
+使い方:
+  python form_variants.py kyuroku.glb [-o out.glb]
+"""
+import argparse
+import copy
+import sys
+
+import glb
+
+EXT = 'KHR_materials_variants'
+EXT_EMIT = 'KHR_materials_emissive_strength'
+
+# 発光の強さ（Emb はベース色そのものを発光色にする）
+EMIT_STRENGTH = {'Visor': 0.8, 'Eye': 1.6, 'EmbA': 1.0, 'EmbB': 1.0}
+
+# マテリアル名: 'ベース色' または (ベース色, 発光色[, metallic, roughness])
+# metallic / roughness を省略したものは GLB に書き出された値を引き継ぐ
+FORMS = {
+    'castoff': {
+        'Suit': '0c1828', 'Armor': '1e4e96', 'Trim': 'c8a030',
+        'Visor': ('88ccff', '2266bb'), 'Eye': ('44aaff', '2288ff'),
+        'EmbA': 'dd2222', 'EmbB': '2244cc',
+    },
+    'caston': {
+        'Suit': '182840', 'Armor': '2a5a9e', 'Trim': '4a8ae0',
+        'Visor': ('e8851a', 'cc5500'), 'Eye': ('e8851a', 'cc5500'),
+        'EmbA': '2255bb', 'EmbB': '4488ff',
+    },
+    'aqua': {
+        'Suit': '0a1e38', 'Armor': '38b0cc', 'Trim': 'eecc00',
+        'Visor': ('aaeeff', '44ccee'), 'Eye': ('66eeff', '33ccee'),
+        'EmbA': 'dd2222', 'EmbB': '2244aa',
+    },
+    'heat': {
+        'Suit': '180808', 'Armor': 'cc2200', 'Trim': 'd4a820',
+        'Visor': ('88ccff', '2266aa'), 'Eye': ('4499ff', '2266ee'),
+        'EmbA': '4488ff', 'EmbB': '2255dd',
+    },
+    'marine': {
+        'Suit': '0a1020', 'Armor': 'e05020', 'Trim': '20ff40',
+        'Visor': ('88ccff', '2266aa'), 'Eye': ('20ff40', '10cc30'),
+        'EmbA': 'ee6600', 'EmbB': 'cc4400',
+    },
+    'sight': {
+        'Suit': '081808', 'Armor': '22aa44', 'Trim': 'ddeedd',
+        'Visor': ('aaffaa', '44cc66'), 'Eye': ('44ff66', '22cc44'),
+        'EmbA': 'dd2222', 'EmbB': '2244aa',
+    },
+}
+
+# シーン側の色（ランタイムが variant.extras から読む）
+ENV = {
+    'castoff': dict(ambient='1a3060', fog='060e1e', embPt='dd2222', eyePt='2288ff', showFace=True),
+    'caston':  dict(ambient='101840', fog='060e18', embPt='4488ff', eyePt='cc5500', showFace=False),
+    'aqua':    dict(ambient='004050', fog='02080c', embPt='dd2222', eyePt='33ccee', showFace=True),
+    'heat':    dict(ambient='401010', fog='120404', embPt='4488ff', eyePt='2266ee', showFace=True),
+    'marine':  dict(ambient='402010', fog='120804', embPt='ee6600', eyePt='10cc30', showFace=True),
+    'sight':   dict(ambient='104010', fog='040c04', embPt='dd2222', eyePt='22cc44', showFace=True),
+}
+
+
+def linear(h):
+    """#RRGGBB → glTF の線形 RGB（build_kyuroku.srgb と同じ γ2.2）"""
+    return [round((int(h[i:i + 2], 16) / 255) ** 2.2, 6) for i in (0, 2, 4)]
+
+
+def _entry(name, v):
+    """FORMS の 1 項目を (base, emit, metal, rough) に揃える"""
+    v = (v,) if isinstance(v, str) else tuple(v)
+    base = v[0]
+    emit = v[1] if len(v) > 1 else (base if name in EMIT_STRENGTH else None)
+    metal = v[2] if len(v) > 2 else None
+    rough = v[3] if len(v) > 3 else None
+    return base, emit, metal, rough
+
+
+def set_material(m, name, v):
+    """glTF マテリアル dict に 1 フォーム分の値を書き込む"""
+    base, emit, metal, rough = _entry(name, v)
+    pbr = m.setdefault('pbrMetallicRoughness', {})
+    pbr['baseColorFactor'] = linear(base) + [1.0]
+    if metal is not None:
+        pbr['metallicFactor'] = metal
+    if rough is not None:
+        pbr['roughnessFactor'] = rough
+    ext = m.setdefault('extensions', {})
+    ext.pop(EXT_EMIT, None)
+    if emit:
+        m['emissiveFactor'] = linear(emit)
+        s = EMIT_STRENGTH.get(name, 1.0)
+        if s != 1.0:
+            ext[EXT_EMIT] = {'emissiveStrength': s}
+    else:
+        m.pop('emissiveFactor', None)
+    if not ext:
+        m.pop('extensions')
+
+
+def add_variants(asset, forms=FORMS, env=ENV):
+    """asset (glb.Asset) に variants を追加。戻り値: 追加したマテリアル数"""
+    g = asset.gltf
+    if EXT in g.get('extensions', {}):
+        raise ValueError(f'{EXT} already present')
+    mats = g.get('materials', [])
+    by_name = {m.get('name'): i for i, m in enumerate(mats)}
+    names = list(forms)
+
+    # table[マテリアル名][variant] = マテリアルインデックス
+    table = {}
+    for vi, form in enumerate(names):
+        for name, v in forms[form].items():
+            if name not in by_name:
+                continue
+            src = by_name[name]
+            if vi == 0:
+                idx = src
+            else:
+                mats.append(copy.deepcopy(mats[src]))
+                idx = len(mats) - 1
+            set_material(mats[idx], name, v)
+            table.setdefault(name, {})[vi] = idx
+    added = len(mats) - len(by_name)
+
+    for mesh in g.get('meshes', []):
+        for p in mesh['primitives']:
+            name = mats[p['material']].get('name') if 'material' in p else None
+            if name not in table:
+                continue
+            groups = {}
+            for vi, idx in table[name].items():
+                groups.setdefault(idx, []).append(vi)
+            p.setdefault('extensions', {})[EXT] = {
+                'mappings': [{'material': idx, 'variants': vs}
+                             for idx, vs in sorted(groups.items())]}
+
+    g.setdefault('extensions', {})[EXT] = {
+        'variants': [{'name': f, 'extras': env.get(f, {})} for f in names]}
+    for key in (EXT, EXT_EMIT):
+        used = g.setdefault('extensionsUsed', [])
+        if key not in used:
+            used.append(key)
+    return added
+
+
+def add_variants_file(src, dst=None, verbose=True):
+    asset = glb.Asset.load(src)
+    added = add_variants(asset)
+    size = asset.save(dst or src)
+    if verbose:
+        print(f"[form_variants] {len(FORMS)} variants, +{added} materials → {size} bytes")
+    return added
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(prog='form_variants.py')
+    ap.add_argument('src')
+    ap.add_argument('-o', '--out')
+    args = ap.parse_args(argv)
+    add_variants_file(args.src, args.out)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
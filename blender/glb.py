@@ -0,0 +1,295 @@
+"""
+glb.py — GLB (glTF 2.0 バイナリ) の読み書きユーティリティ
+
+bpy 非依存。Blender 内からでも素の Python からでも使える。
+JSON チャンクと BIN チャンクを直接扱い、アクセサの読み出し・追加、
+未使用アクセサ/バッファビューの除去とバッファの詰め直しを行う。
+"""
+import json
+import struct
+
+MAGIC = 0x46546C67          # b'glTF'
+CHUNK_JSON = 0x4E4F534A
+CHUNK_BIN = 0x004E4942
+
+FLOAT, UBYTE, USHORT, UINT, BYTE, SHORT = 5126, 5121, 5123, 5125, 5120, 5122
+FMT = {BYTE: 'b', UBYTE: 'B', SHORT: 'h', USHORT: 'H', UINT: 'I', FLOAT: 'f'}
+NCOMP = {'SCALAR': 1, 'VEC2': 2, 'VEC3': 3, 'VEC4': 4, 'MAT2': 4, 'MAT3': 9, 'MAT4': 16}
+TYPE_OF = {1: 'SCALAR', 2: 'VEC2', 3: 'VEC3', 4: 'VEC4', 16: 'MAT4'}
+# normalized 整数の最大値（float への復元用）
+NORM = {BYTE: 127.0, UBYTE: 255.0, SHORT: 32767.0, USHORT: 65535.0}
+
+ARRAY_BUFFER, ELEMENT_ARRAY_BUFFER = 34962, 34963
+EXT_MESHOPT = 'EXT_meshopt_compression'
+
+
+def _pad4(n):
+    return (4 - n % 4) % 4
+
+
+class Asset:
+    """GLB 1 ファイル分。gltf は JSON dict、bin は BIN チャンクの bytes"""
+
+    def __init__(self, gltf, bin=b''):
+        self.gltf = gltf
+        self.bin = bytearray(bin)
+
+    # ── 入出力 ────────────────────────────────────────────────────────
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            return cls.from_bytes(f.read())
+
+    @classmethod
+    def from_bytes(cls, data):
+        magic, version, length = struct.unpack_from('<III', data, 0)
+        if magic != MAGIC or version != 2:
+            raise ValueError('not a glTF 2.0 binary')
+        off, gltf, bin = 12, None, b''
+        while off < length:
+            clen, ctype = struct.unpack_from('<II', data, off)
+            chunk = data[off + 8:off + 8 + clen]
+            if ctype == CHUNK_JSON:
+                gltf = json.loads(chunk.decode('utf-8'))
+            elif ctype == CHUNK_BIN and not bin:
+                bin = chunk
+            off += 8 + clen
+        return cls(gltf, bin)
+
+    def to_bytes(self):
+        if self.gltf.get('buffers'):
+            self.gltf['buffers'][0]['byteLength'] = len(self.bin)
+        js = json.dumps(self.gltf, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+        js += b' ' * _pad4(len(js))
+        bin = bytes(self.bin) + b'\0' * _pad4(len(self.bin))
+        out = bytearray(struct.pack('<III', MAGIC, 2, 0))
+        out += struct.pack('<II', len(js), CHUNK_JSON) + js
+        if bin:
+            out += struct.pack('<II', len(bin), CHUNK_BIN) + bin
+        struct.pack_into('<I', out, 8, len(out))
+        return bytes(out)
+
+    def save(self, path):
+        data = self.to_bytes()
+        with open(path, 'wb') as f:
+            f.write(data)
+        return len(data)
+
+    # ── アクセサ ──────────────────────────────────────────────────────
+    def accessor_nbytes(self, i):
+        a = self.gltf['accessors'][i]
+        return a['count'] * NCOMP[a['type']] * struct.calcsize(FMT[a['componentType']])
+
+    def check_view(self, vi):
+        """圧縮済みのビューは BIN の中身が別物なので読めない。ValueError にする"""
+        v = self.gltf['bufferViews'][vi]
+        if EXT_MESHOPT in v.get('extensions', {}) or v.get('buffer', 0) != 0:
+            raise ValueError(f'bufferView {vi} is already meshopt-compressed; run on the '
+                             'uncompressed export (or glb_optimize.py --decompress first)')
+
+    def view_bytes(self, vi):
+        self.check_view(vi)
+        v = self.gltf['bufferViews'][vi]
+        off = v.get('byteOffset', 0)
+        return bytes(self.bin[off:off + v['byteLength']])
+
+    def read(self, i, normalize=True):
+        """アクセサ i の値を [(c0, c1, ...), ...] で返す（sparse 対応）"""
+        a = self.gltf['accessors'][i]
+        n, ct = NCOMP[a['type']], a['componentType']
+        fmt = FMT[ct]
+        size = struct.calcsize(fmt)
+        count = a['count']
+        if 'bufferView' in a:
+            self.check_view(a['bufferView'])
+            v = self.gltf['bufferViews'][a['bufferView']]
+            base = v.get('byteOffset', 0) + a.get('byteOffset', 0)
+            stride = v.get('byteStride', n * size)
+            rows = [struct.unpack_from('<' + fmt * n, self.bin, base + k * stride)
+                    for k in range(count)]
+        else:
+            rows = [(0,) * n] * count
+        sp = a.get('sparse')
+        if sp:
+            idx = sp['indices']
+            self.check_view(idx['bufferView'])
+            self.check_view(sp['values']['bufferView'])
+            iv = self.gltf['bufferViews'][idx['bufferView']]
+            ifmt = FMT[idx['componentType']]
+            ioff = iv.get('byteOffset', 0) + idx.get('byteOffset', 0)
+            ids = struct.unpack_from('<%d%s' % (sp['count'], ifmt), self.bin, ioff)
+            vv = self.gltf['bufferViews'][sp['values']['bufferView']]
+            voff = vv.get('byteOffset', 0) + sp['values'].get('byteOffset', 0)
+            rows = list(rows)
+            for k, j in enumerate(ids):
+                rows[j] = struct.unpack_from('<' + fmt * n, self.bin, voff + k * n * size)
+        if normalize and a.get('normalized') and ct in NORM:
+            s = NORM[ct]
+            rows = [tuple(max(c / s, -1.0) for c in r) for r in rows]
+        return rows
+
+    def add_view(self, data, target=None, stride=None):
+        """BIN 末尾にデータを追記してバッファビューを作る"""
+        self.bin += b'\0' * _pad4(len(self.bin))
+        v = {'buffer': 0, 'byteOffset': len(self.bin), 'byteLength': len(data)}
+        if target:
+            v['target'] = target
+        if stride:
+            v['byteStride'] = stride
+        self.bin += data
+        self.gltf.setdefault('buffers', [{'byteLength': 0}])
+        self.gltf.setdefault('bufferViews', []).append(v)
+        return len(self.gltf['bufferViews']) - 1
+
+    def add_accessor(self, rows, ctype=FLOAT, normalized=False, target=None, minmax=False,
+                     stride=None):
+        """rows = [(c0, c1, ...), ...] から新しいアクセサを作ってインデックスを返す
+
+        stride: 要素ごとのバイト数（頂点属性の 4 バイト境界用に 0 で埋める）
+        """
+        n = len(rows[0])
+        fmt = '<' + FMT[ctype] * n
+        pad = b''
+        if stride:
+            pad = b'\0' * (stride - struct.calcsize(fmt))
+        data = b''.join(struct.pack(fmt, *r) + pad for r in rows)
+        a = {'bufferView': self.add_view(data, target, stride if pad else None),
+             'componentType': ctype, 'count': len(rows), 'type': TYPE_OF[n]}
+        if normalized:
+            a['normalized'] = True
+        if minmax:
+            a['min'] = [min(r[k] for r in rows) for k in range(n)]
+            a['max'] = [max(r[k] for r in rows) for k in range(n)]
+        self.gltf.setdefault('accessors', []).append(a)
+        return len(self.gltf['accessors']) - 1
+
+    def add_sparse_accessor(self, count, ids, rows, ctype=FLOAT, minmax=False):
+        """bufferView を持たない（= 全要素 0 の）sparse アクセサ。ids の要素だけ rows の値
+
+        ids は昇順。モーフターゲットのように一部の頂点しか動かない差分に使う。
+        """
+        n = len(rows[0])
+        ictype = UBYTE if count <= 0xff else USHORT if count <= 0xffff else UINT
+        a = {'componentType': ctype, 'count': count, 'type': TYPE_OF[n],
+             'sparse': {'count': len(ids),
+                        'indices': {'bufferView': self.add_view(
+                            struct.pack('<%d%s' % (len(ids), FMT[ictype]), *ids)),
+                                    'componentType': ictype},
+                        'values': {'bufferView': self.add_view(
+                            b''.join(struct.pack('<' + FMT[ctype] * n, *r) for r in rows))}}}
+        if minmax:
+            # sparse に無い要素は 0 なので、全要素が埋まっていなければ 0 も範囲に入れる
+            full = len(ids) == count
+            a['min'] = [min([r[k] for r in rows] + ([] if full else [0.0])) for k in range(n)]
+            a['max'] = [max([r[k] for r in rows] + ([] if full else [0.0])) for k in range(n)]
+        self.gltf.setdefault('accessors', []).append(a)
+        return len(self.gltf['accessors']) - 1
+
+    # ── 掃除 ──────────────────────────────────────────────────────────
+    def used_accessors(self):
+        g = self.gltf
+        used = set()
+        for m in g.get('meshes', []):
+            for p in m['primitives']:
+                used.update(p['attributes'].values())
+                if 'indices' in p:
+                    used.add(p['indices'])
+                for t in p.get('targets', []):
+                    used.update(t.values())
+        for s in g.get('skins', []):
+            if 'inverseBindMatrices' in s:
+                used.add(s['inverseBindMatrices'])
+        for an in g.get('animations', []):
+            for s in an['samplers']:
+                used.update((s['input'], s['output']))
+        return used
+
+    def compact(self):
+        """未使用のアクセサ・バッファビューを消して BIN を詰め直す"""
+        g = self.gltf
+        accs = g.get('accessors', [])
+        used = sorted(self.used_accessors())
+        amap = {old: new for new, old in enumerate(used)}
+        g['accessors'] = [accs[i] for i in used]
+        self._remap_accessors(amap)
+
+        views = g.get('bufferViews', [])
+        vused = set()
+        for a in g['accessors']:
+            if 'bufferView' in a:
+                vused.add(a['bufferView'])
+            sp = a.get('sparse')
+            if sp:
+                vused.update((sp['indices']['bufferView'], sp['values']['bufferView']))
+        for im in g.get('images', []):
+            if 'bufferView' in im:
+                vused.add(im['bufferView'])
+        for m in g.get('meshes', []):
+            for p in m['primitives']:
+                for ext in p.get('extensions', {}).values():
+                    if 'bufferView' in ext:
+                        vused.add(ext['bufferView'])
+
+        order = sorted(vused)
+        vmap = {old: new for new, old in enumerate(order)}
+        out = bytearray()
+        new_views = []
+        for old in order:
+            v = dict(views[old])
+            out += b'\0' * _pad4(len(out))
+            data = self.view_bytes(old)
+            v['byteOffset'] = len(out)
+            out += data
+            new_views.append(v)
+        g['bufferViews'] = new_views
+        self.bin = out
+        self._remap_views(vmap)
+        if g.get('buffers'):
+            g['buffers'][0]['byteLength'] = len(out)
+
+    def _remap_accessors(self, amap):
+        g = self.gltf
+        for m in g.get('meshes', []):
+            for p in m['primitives']:
+                p['attributes'] = {k: amap[v] for k, v in p['attributes'].items()}
+                if 'indices' in p:
+                    p['indices'] = amap[p['indices']]
+                if 'targets' in p:
+                    p['targets'] = [{k: amap[v] for k, v in t.items()} for t in p['targets']]
+        for s in g.get('skins', []):
+            if 'inverseBindMatrices' in s:
+                s['inverseBindMatrices'] = amap[s['inverseBindMatrices']]
+        for an in g.get('animations', []):
+            for s in an['samplers']:
+                s['input'], s['output'] = amap[s['input']], amap[s['output']]
+
+    def _remap_views(self, vmap):
+        g = self.gltf
+        for a in g.get('accessors', []):
+            if 'bufferView' in a:
+                a['bufferView'] = vmap[a['bufferView']]
+            sp = a.get('sparse')
+            if sp:
+                sp['indices']['bufferView'] = vmap[sp['indices']['bufferView']]
+                sp['values']['bufferView'] = vmap[sp['values']['bufferView']]
+        for im in g.get('images', []):
+            if 'bufferView' in im:
+                im['bufferView'] = vmap[im['bufferView']]
+        for m in g.get('meshes', []):
+            for p in m['primitives']:
+                for ext in p.get('extensions', {}).values():
+                    if 'bufferView' in ext:
+                        ext['bufferView'] = vmap[ext['bufferView']]
+
+
+def chunk_sizes(path):
+    """{'total': ファイルサイズ, 'json': JSON チャンク, 'bin': BIN チャンク}"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    sizes = {'total': len(data), 'json': 0, 'bin': 0}
+    off = 12
+    while off < len(data):
+        clen, ctype = struct.unpack_from('<II', data, off)
+        sizes['json' if ctype == CHUNK_JSON else 'bin'] += clen
+        off += 8 + clen
+    return sizes
@@ -0,0 +1,181 @@
+"""
+glb_meta.py — ランタイムが読み込み時に調べていた値を GLB のシーン extras に書く
+
+scene.js は読み込み直後にシーン全体を辿って、ボーンのワールド位置から身長と
+床の高さを測り、マテリアルと関節を名前で探していた。これらは GLB が決まれば
+決まる値なので、書き出し時に計算して scenes[0].extras に入れておく
+（three.js の GLTFLoader は gltf.scene.userData に展開する）。
+
+  height        身長（glTF の Y 方向, m）。既定ではスキン付きはジョイントノードの位置、
+                それ以外はメッシュの境界ボックスから測る（bounds で指定可）
+  groundOffset  最下点を Y=0 に置くためのルートの Y（= -最下点）
+  joints        {関節名: ノード番号}（joints 引数で指定した名前）
+  materials     {マテリアル名: 番号}（プリミティブの既定マテリアル）
+  clips         [{name, duration}]（アニメーションの名前と長さ, 秒）。clip_info を渡すと
+                その戻り値（移動クリップの speed / stride / cadence / contacts など）も足す
+
+JSON だけから求める（バッファを読まない）ので、量子化・meshopt 圧縮の後でも
+掛けられる。ノード番号が変わらないよう glb_optimize の後に実行すること。
+
+使い方:
+  python glb_meta.py model.glb [-o out.glb] [--joints Head,Spine,...] [--bounds mesh]
+                                [--clip-info]   # anim_library.clip_info を clips に足す
+"""
+import argparse
+import sys
+
+import glb
+
+IDENTITY = [[1.0 if i == j else 0.0 for j in range(4)] for i in range(4)]
+
+
+# ──────────────────────────────────────────────────────────────────────
+# ノード変換
+# ──────────────────────────────────────────────────────────────────────
+def _mul(a, b):
+    return [[sum(a[i][k] * b[k][j] for k in range(4)) for j in range(4)] for i in range(4)]
+
+
+def local_matrix(node):
+    """ノードの matrix / TRS → 4x4（行優先）"""
+    if 'matrix' in node:
+        m = node['matrix']                  # glTF は列優先
+        return [[m[c * 4 + r] for c in range(4)] for r in range(4)]
+    x, y, z, w = node.get('rotation', (0.0, 0.0, 0.0, 1.0))
+    sx, sy, sz = node.get('scale', (1.0, 1.0, 1.0))
+    tx, ty, tz = node.get('translation', (0.0, 0.0, 0.0))
+    r = [[1 - 2 * (y * y + z * z), 2 * (x * y - z * w), 2 * (x * z + y * w)],
+         [2 * (x * y + z * w), 1 - 2 * (x * x + z * z), 2 * (y * z - x * w)],
+         [2 * (x * z - y * w), 2 * (y * z + x * w), 1 - 2 * (x * x + y * y)]]
+    return [[r[0][0] * sx, r[0][1] * sy, r[0][2] * sz, tx],
+            [r[1][0] * sx, r[1][1] * sy, r[1][2] * sz, ty],
+            [r[2][0] * sx, r[2][1] * sy, r[2][2] * sz, tz],
+            [0.0, 0.0, 0.0, 1.0]]
+
+
+def world_matrices(g, scene=0):
+    """{ノード番号: ワールド行列}（シーンから辿れるノードのみ）"""
+    out = {}
+    stack = [(n, IDENTITY) for n in g['scenes'][scene].get('nodes', [])]
+    while stack:
+        ni, parent = stack.pop()
+        m = _mul(parent, local_matrix(g['nodes'][ni]))
+        out[ni] = m
+        stack += [(c, m) for c in g['nodes'][ni].get('children', [])]
+    return out
+
+
+def _apply(m, p):
+    return [sum(m[i][k] * p[k] for k in range(3)) + m[i][3] for i in range(3)]
+
+
+def _denorm(a, vals):
+    """正規化整数アクセサの min/max を float に戻す"""
+    if a.get('normalized') and a['componentType'] in glb.NORM:
+        s = glb.NORM[a['componentType']]
+        return [max(v / s, -1.0) for v in vals]
+    return vals
+
+
+def y_range(g, world, bounds='auto'):
+    """(最下点, 最上点) の Y
+
+    bounds: 'joints' = スキンのジョイント位置、'mesh' = メッシュの境界ボックス、
+            'auto' = スキンがあれば joints、無ければ mesh
+    """
+    joints = {j for s in g.get('skins', []) for j in s['joints']}
+    if joints and bounds != 'mesh':
+        ys = [world[j][1][3] for j in joints if j in world]
+    else:
+        ys = []
+        for ni, m in world.items():
+            node = g['nodes'][ni]
+            if 'mesh' not in node:
+                continue
+            for p in g['meshes'][node['mesh']]['primitives']:
+                a = g['accessors'][p['attributes']['POSITION']]
+                lo, hi = _denorm(a, a['min']), _denorm(a, a['max'])
+                for c in range(8):
+                    corner = [hi[k] if c >> k & 1 else lo[k] for k in range(3)]
+                    ys.append(_apply(m, corner)[1])
+    return (min(ys), max(ys)) if ys else (0.0, 0.0)
+
+
+# ──────────────────────────────────────────────────────────────────────
+# メタデータ
+# ──────────────────────────────────────────────────────────────────────
+def metadata(g, joints=(), bounds='auto', clip_info=None):
+    world = world_matrices(g, g.get('scene', 0))
+    lo, hi = y_range(g, world, bounds)
+
+    names = {}
+    for ni in sorted(world):
+        names.setdefault(g['nodes'][ni].get('name'), ni)
+    materials = {}
+    for m in g.get('meshes', []):
+        for p in m['primitives']:
+            if 'material' in p:
+                name = g['materials'][p['material']].get('name')
+                if name:
+                    materials.setdefault(name, p['material'])
+    clips = []
+    for an in g.get('animations', []):
+        t = max(g['accessors'][s['input']]['max'][0] for s in an['samplers'])
+        clip = {'name': an.get('name', ''), 'duration': round(t, 6)}
+        if clip_info:
+            clip.update(clip_info(clip['name'], clip['duration']))
+        clips.append(clip)
+
+    return {
+        'height': round(hi - lo, 6),
+        'groundOffset': round(-lo, 6),
+        'joints': {j: names[j] for j in joints if j in names},
+        'materials': materials,
+        'clips': clips,
+    }
+
+
+def add_metadata(asset, joints=(), bounds='auto', clip_info=None):
+    """asset のシーン extras にメタデータを書く（既存の extras は残す）。戻り値: 書いた dict
+
+    clip_info: (クリップ名, 長さ) → 追加のキーの dict（例: anim_library.clip_info）
+    """
+    g = asset.gltf
+    meta = metadata(g, joints, bounds, clip_info)
+    missing = [j for j in joints if j not in meta['joints']]
+    if missing:
+        raise ValueError(f'joint node not found: {missing}')
+    g['scenes'][g.get('scene', 0)].setdefault('extras', {}).update(meta)
+    return meta
+
+
+def add_metadata_file(src, dst=None, joints=(), bounds='auto', clip_info=None, verbose=True):
+    asset = glb.Asset.load(src)
+    meta = add_metadata(asset, joints, bounds, clip_info)
+    size = asset.save(dst or src)
+    if verbose:
+        print(f"[glb_meta] height {meta['height']:.3f}  ground {meta['groundOffset']:+.3f}  "
+              f"{len(meta['joints'])} joints, {len(meta['materials'])} materials, "
+              f"{len(meta['clips'])} clips → {size} bytes")
+    return meta
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(prog='glb_meta.py')
+    ap.add_argument('src')
+    ap.add_argument('-o', '--out')
+    ap.add_argument('--joints', default='', help='カンマ区切りの関節ノード名')
+    ap.add_argument('--bounds', choices=('auto', 'joints', 'mesh'), default='auto')
+    ap.add_argument('--clip-info', action='store_true',
+                    help='anim_library.clip_info（移動クリップの速度など）を clips に足す')
+    args = ap.parse_args(argv)
+    clip_info = None
+    if args.clip_info:
+        import anim_library
+        clip_info = anim_library.clip_info
+    add_metadata_file(args.src, args.out, tuple(j for j in args.joints.split(',') if j),
+                      args.bounds, clip_info)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,563 @@
+"""
+glb_optimize.py — 書き出し済み GLB の軽量化パス（bpy 非依存）
+
+Blender の glTF エクスポーターは頂点属性もアニメーションも float32 で、
+同じデータのアクセサも別々に書き出す。書き出し直後の GLB に対して:
+
+  1. 量子化（KHR_mesh_quantization）
+       POSITION   → int16 normalized（メッシュごとの中心・スケールを子ノードに移す）
+                    ※スキンメッシュはノード変換が無視されるので float のまま
+       NORMAL     → int8 normalized
+       TEXCOORD_n → uint16 normalized（0〜1 に収まる場合）
+       WEIGHTS_n  → uint8 normalized（合計 255 に補正）
+       回転キー   → int16 normalized
+  2. 同一内容のアクセサ・バッファビューを 1 つにまとめる
+  3. シーンから辿れないノード、使われないメッシュ・マテリアル・スキンを削除
+  4. （任意）EXT_meshopt_compression で頂点属性・アニメーション・インデックスを圧縮
+     ランタイム側は GLTFLoader.setMeshoptDecoder が必要
+
+圧縮済みの GLB は --decompress で圧縮前に戻せる（配置済みのファイルに後から
+anim_optimize などのパスを掛け直すとき用）。
+
+使い方:
+  python glb_optimize.py in.glb [-o out.glb] [--meshopt]
+  python glb_optimize.py in.glb -o raw.glb --decompress
+"""
+import argparse
+import os
+import struct
+import sys
+
+import glb
+from glb import ARRAY_BUFFER, BYTE, ELEMENT_ARRAY_BUFFER, FLOAT, SHORT, UBYTE, USHORT
+
+EXT_QUANT = 'KHR_mesh_quantization'
+EXT_MESHOPT = glb.EXT_MESHOPT
+EXT_VARIANTS = 'KHR_materials_variants'
+
+
+def _require(g, ext, required=True):
+    if ext not in g.setdefault('extensionsUsed', []):
+        g['extensionsUsed'].append(ext)
+    if required and ext not in g.setdefault('extensionsRequired', []):
+        g['extensionsRequired'].append(ext)
+
+
+def _qn(v, scale):
+    """[-1, 1] の float → normalized 整数"""
+    return int(round(max(-1.0, min(1.0, v)) * scale))
+
+
+# ──────────────────────────────────────────────────────────────────────
+# 1. 量子化
+# ──────────────────────────────────────────────────────────────────────
+def _is_float(g, i, ncomp=None):
+    a = g['accessors'][i]
+    return (a['componentType'] == FLOAT and 'sparse' not in a
+            and (ncomp is None or glb.NCOMP[a['type']] == ncomp))
+
+
+def _quantize_positions(asset, mi, nodes):
+    """メッシュ mi の POSITION を int16 化し、逆量子化の変換を子ノードに持たせる"""
+    g = asset.gltf
+    prims = g['meshes'][mi]['primitives']
+    rows = {p['attributes']['POSITION']: asset.read(p['attributes']['POSITION'])
+            for p in prims}
+    pts = [r for rs in rows.values() for r in rs]
+    lo = [min(p[k] for p in pts) for k in range(3)]
+    hi = [max(p[k] for p in pts) for k in range(3)]
+    center = [(a + b) / 2 for a, b in zip(lo, hi)]
+    # 法線を歪めないよう一様スケール
+    s = max(max((b - a) / 2 for a, b in zip(lo, hi)), 1e-8)
+
+    done = {}
+    for p in prims:
+        src = p['attributes']['POSITION']
+        if src not in done:
+            q = [tuple(_qn((c - o) / s, 32767.0) for c, o in zip(r, center))
+                 for r in rows[src]]
+            done[src] = asset.add_accessor(q, SHORT, normalized=True, target=ARRAY_BUFFER,
+                                           minmax=True, stride=8)
+        p['attributes']['POSITION'] = done[src]
+
+    # メッシュを持つノードは中身を子ノードへ（ランタイムが触るノードの TRS はそのまま）
+    for ni in nodes:
+        n = g['nodes'][ni]
+        child = {'mesh': mi, 'translation': center, 'scale': [s, s, s]}
+        if 'weights' in n:
+            child['weights'] = n.pop('weights')
+        del n['mesh']
+        g['nodes'].append(child)
+        n.setdefault('children', []).append(len(g['nodes']) - 1)
+
+
+def _quantize_attr(asset, i, name):
+    """POSITION 以外の頂点属性。量子化したアクセサを返す（対象外なら i）"""
+    g = asset.gltf
+    if name == 'NORMAL' and _is_float(g, i, 3):
+        rows = [tuple(_qn(c, 127.0) for c in r) for r in asset.read(i)]
+        return asset.add_accessor(rows, BYTE, normalized=True, target=ARRAY_BUFFER, stride=4)
+    if name == 'TANGENT' and _is_float(g, i, 4):
+        rows = [tuple(_qn(c, 127.0) for c in r) for r in asset.read(i)]
+        return asset.add_accessor(rows, BYTE, normalized=True, target=ARRAY_BUFFER)
+    if name.startswith('TEXCOORD_') and _is_float(g, i, 2):
+        rows = asset.read(i)
+        if all(0.0 <= c <= 1.0 for r in rows for c in r):
+            rows = [tuple(int(round(c * 65535.0)) for c in r) for r in rows]
+            return asset.add_accessor(rows, USHORT, normalized=True, target=ARRAY_BUFFER)
+    if name.startswith('WEIGHTS_') and _is_float(g, i, 4):
+        out = []
+        for r in asset.read(i):
+            q = [int(round(max(0.0, c) * 255.0)) for c in r]
+            if sum(q):
+                q[q.index(max(q))] += 255 - sum(q)
+            out.append(tuple(q))
+        return asset.add_accessor(out, UBYTE, normalized=True, target=ARRAY_BUFFER)
+    return i
+
+
+def quantize(asset):
+    g = asset.gltf
+    users = {}
+    skinned = set()
+    for ni, n in enumerate(g.get('nodes', [])):
+        if 'mesh' in n:
+            users.setdefault(n['mesh'], []).append(ni)
+            if 'skin' in n:
+                skinned.add(n['mesh'])
+
+    for mi, m in enumerate(g.get('meshes', [])):
+        prims = m['primitives']
+        if mi not in skinned and not any(p.get('targets') for p in prims) \
+                and all('POSITION' in p['attributes']
+                        and _is_float(g, p['attributes']['POSITION'], 3) for p in prims):
+            _quantize_positions(asset, mi, users.get(mi, []))
+        cache = {}
+        for p in prims:
+            for name, i in list(p['attributes'].items()):
+                if name == 'POSITION':
+                    continue
+                if (name, i) not in cache:
+                    cache[name, i] = _quantize_attr(asset, i, name)
+                p['attributes'][name] = cache[name, i]
+
+    cache = {}
+    for an in g.get('animations', []):
+        for ch in an['channels']:
+            s = an['samplers'][ch['sampler']]
+            if ch['target']['path'] != 'rotation' or not _is_float(g, s['output'], 4):
+                continue
+            if s['output'] not in cache:
+                rows = [tuple(_qn(c, 32767.0) for c in r) for r in asset.read(s['output'])]
+                cache[s['output']] = asset.add_accessor(rows, SHORT, normalized=True)
+            s['output'] = cache[s['output']]
+    _require(g, EXT_QUANT)
+    asset.compact()
+
+
+# ──────────────────────────────────────────────────────────────────────
+# 2. 重複除去
+# ──────────────────────────────────────────────────────────────────────
+def _raw(asset, i):
+    """アクセサ i の要素バイト列（stride の詰め物を除く）"""
+    a = asset.gltf['accessors'][i]
+    v = asset.gltf['bufferViews'][a['bufferView']]
+    size = glb.NCOMP[a['type']] * struct.calcsize(glb.FMT[a['componentType']])
+    stride = v.get('byteStride', size)
+    base = v.get('byteOffset', 0) + a.get('byteOffset', 0)
+    return b''.join(bytes(asset.bin[base + k * stride:base + k * stride + size])
+                    for k in range(a['count']))
+
+
+def dedupe(asset):
+    """同じ内容のアクセサ / バッファビューを先頭の 1 つに寄せる。まとめた数を返す"""
+    g = asset.gltf
+    seen, amap = {}, {}
+    for i, a in enumerate(g.get('accessors', [])):
+        if 'bufferView' not in a or 'sparse' in a:
+            amap[i] = i
+            continue
+        v = g['bufferViews'][a['bufferView']]
+        key = (a['componentType'], a['type'], a['count'], a.get('normalized', False),
+               v.get('target'), v.get('byteStride'), _raw(asset, i))
+        amap[i] = seen.setdefault(key, i)
+    asset._remap_accessors(amap)
+    n_acc = sum(1 for k, v in amap.items() if k != v)
+
+    vseen, vmap = {}, {}
+    for vi, v in enumerate(g.get('bufferViews', [])):
+        key = (v.get('target'), v.get('byteStride'), asset.view_bytes(vi))
+        vmap[vi] = vseen.setdefault(key, vi)
+    asset._remap_views(vmap)
+    asset.compact()
+    return n_acc + sum(1 for k, v in vmap.items() if k != v)
+
+
+# ──────────────────────────────────────────────────────────────────────
+# 3. 未使用データの削除
+# ──────────────────────────────────────────────────────────────────────
+def prune(asset):
+    """辿れないノードと使われないメッシュ・スキン・マテリアルを消す。消した数を返す"""
+    g = asset.gltf
+    nodes = g.get('nodes', [])
+    keep = set()
+    stack = [n for sc in g.get('scenes', []) for n in sc.get('nodes', [])]
+    for sk in g.get('skins', []):
+        stack += sk['joints'] + ([sk['skeleton']] if 'skeleton' in sk else [])
+    while stack:
+        ni = stack.pop()
+        if ni not in keep:
+            keep.add(ni)
+            stack += nodes[ni].get('children', [])
+
+    nmap = {old: new for new, old in enumerate(sorted(keep))}
+    g['nodes'] = [nodes[i] for i in sorted(keep)]
+    for n in g['nodes']:
+        if 'children' in n:
+            n['children'] = [nmap[c] for c in n['children']]
+    for sc in g.get('scenes', []):
+        sc['nodes'] = [nmap[n] for n in sc.get('nodes', [])]
+    for an in g.get('animations', []):
+        chans = [c for c in an['channels'] if c['target'].get('node') in nmap]
+        for c in chans:
+            c['target']['node'] = nmap[c['target']['node']]
+        an['channels'] = chans
+
+    for sk in g.get('skins', []):
+        sk['joints'] = [nmap[j] for j in sk['joints']]
+        if 'skeleton' in sk:
+            sk['skeleton'] = nmap[sk['skeleton']]
+    removed = len(nodes) - len(g['nodes'])
+    removed += _prune_list(g, 'meshes', 'mesh') + _prune_list(g, 'skins', 'skin')
+
+    used = set()
+    for m in g.get('meshes', []):
+        for p in m['primitives']:
+            if 'material' in p:
+                used.add(p['material'])
+            for mp in p.get('extensions', {}).get(EXT_VARIANTS, {}).get('mappings', []):
+                used.add(mp['material'])
+    mats = g.get('materials', [])
+    if mats:
+        mmap = {old: new for new, old in enumerate(sorted(used))}
+        g['materials'] = [mats[i] for i in sorted(used)]
+        for m in g.get('meshes', []):
+            for p in m['primitives']:
+                if 'material' in p:
+                    p['material'] = mmap[p['material']]
+                for mp in p.get('extensions', {}).get(EXT_VARIANTS, {}).get('mappings', []):
+                    mp['material'] = mmap[mp['material']]
+        removed += len(mats) - len(g['materials'])
+    asset.compact()
+    return removed
+
+
+def _prune_list(g, key, field):
+    """ノードの field から参照されない g[key] の要素を消す"""
+    items = g.get(key)
+    if not items:
+        return 0
+    used = sorted({n[field] for n in g['nodes'] if field in n})
+    imap = {old: new for new, old in enumerate(used)}
+    g[key] = [items[i] for i in used]
+    for n in g['nodes']:
+        if field in n:
+            n[field] = imap[n[field]]
+    return len(items) - len(g[key])
+
+
+# ──────────────────────────────────────────────────────────────────────
+# 4. EXT_meshopt_compression（meshoptimizer のコーデック v0 を Python で実装）
+# ──────────────────────────────────────────────────────────────────────
+def _zigzag8(d):
+    d &= 0xff
+    return ((d << 1) & 0xff) ^ (0xff if d & 0x80 else 0)
+
+
+def _encode_group(group):
+    """16 バイトのグループを最小のビット幅（0/2/4/8）で符号化 → (bitslog2, bytes)"""
+    if not any(group):
+        return 0, b''
+    best = (3, bytes(group))
+    for bitslog2, bits in ((1, 2), (2, 4)):
+        sentinel = (1 << bits) - 1
+        per = 8 // bits
+        out = bytearray()
+        for i in range(0, 16, per):
+            b = 0
+            for k in range(per):
+                b = (b << bits) | min(group[i + k], sentinel)
+            out.append(b)
+        out += bytes(x for x in group if x >= sentinel)
+        if len(out) < len(best[1]):
+            best = (bitslog2, bytes(out))
+    return best
+
+
+def _encode_bytes(buf):
+    header = bytearray((len(buf) // 16 + 3) // 4)
+    body = bytearray()
+    for gi in range(len(buf) // 16):
+        bitslog2, data = _encode_group(buf[gi * 16:gi * 16 + 16])
+        header[gi // 4] |= bitslog2 << ((gi % 4) * 2)
+        body += data
+    return bytes(header + body)
+
+
+def encode_vertex_buffer(data, count, size):
+    """meshopt_encodeVertexBuffer（バージョン 0）と同じ形式"""
+    out = bytearray([0xa0])
+    block = min((8192 // size) & ~15, 256)
+    last = bytearray(data[:size])
+    for start in range(0, count, block):
+        n = min(block, count - start)
+        aligned = (n + 15) & ~15
+        for k in range(size):
+            buf = bytearray(aligned)
+            p = last[k]
+            for i in range(n):
+                c = data[(start + i) * size + k]
+                buf[i] = _zigzag8(c - p)
+                p = c
+            out += _encode_bytes(buf)
+        last = bytearray(data[(start + n - 1) * size:(start + n) * size])
+    out += bytes(max(0, 32 - size)) + bytes(data[:size])
+    return bytes(out)
+
+
+def _vbyte(v):
+    out = bytearray()
+    while v >= 128:
+        out.append((v & 127) | 128)
+        v >>= 7
+    out.append(v)
+    return out
+
+
+def encode_index_sequence(indices):
+    """meshopt_encodeIndexSequence（バージョン 1）と同じ形式"""
+    out = bytearray([0xd1])
+    last, cur = [0, 0], 0
+    for idx in indices:
+        cd = idx - last[cur]
+        cur ^= abs(cd) >= 30
+        d = (idx - last[cur]) & 0xffffffff
+        v = ((d << 1) ^ (0xffffffff if d & 0x80000000 else 0)) & 0xffffffff
+        out += _vbyte((v << 1) | cur)
+        last[cur] = idx
+    return bytes(out + bytes(4))
+
+
+# ── 復号（上の符号化の逆。フィルタ無し・ATTRIBUTES / INDICES のみ） ──────────
+def _decode_bytes(src, pos, n):
+    """_encode_bytes の逆。n バイト（16 の倍数）と次の読み出し位置を返す"""
+    groups = n // 16
+    header = src[pos:pos + (groups + 3) // 4]
+    pos += len(header)
+    out = bytearray()
+    for gi in range(groups):
+        bitslog2 = (header[gi // 4] >> ((gi % 4) * 2)) & 3
+        if bitslog2 == 0:
+            out += bytes(16)
+        elif bitslog2 == 3:
+            out += src[pos:pos + 16]
+            pos += 16
+        else:
+            bits = 2 if bitslog2 == 1 else 4
+            per, sentinel = 8 // bits, (1 << bits) - 1
+            vals = []
+            for b in src[pos:pos + 16 // per]:
+                vals += [(b >> (bits * (per - 1 - k))) & sentinel for k in range(per)]
+            pos += 16 // per
+            for i, v in enumerate(vals):
+                if v == sentinel:           # 収まらなかった値は後ろに生のまま
+                    vals[i] = src[pos]
+                    pos += 1
+            out += bytes(vals)
+    return out, pos
+
+
+def decode_vertex_buffer(enc, count, size):
+    if enc[0] != 0xa0:
+        raise ValueError('unsupported meshopt vertex codec version')
+    out = bytearray(count * size)
+    block = min((8192 // size) & ~15, 256)
+    last, pos = bytearray(enc[-size:]), 1
+    for start in range(0, count, block):
+        n = min(block, count - start)
+        for k in range(size):
+            buf, pos = _decode_bytes(enc, pos, (n + 15) & ~15)
+            p = last[k]
+            for i in range(n):
+                z = buf[i]
+                p = (p + ((z >> 1) ^ -(z & 1))) & 0xff
+                out[(start + i) * size + k] = p
+        last = out[(start + n - 1) * size:(start + n) * size]
+    return bytes(out)
+
+
+def decode_index_sequence(enc, count, size):
+    if enc[0] != 0xd1:
+        raise ValueError('unsupported meshopt index codec version')
+    last, pos, out = [0, 0], 1, []
+    for _ in range(count):
+        v = shift = 0
+        while True:
+            b = enc[pos]
+            pos += 1
+            v |= (b & 127) << shift
+            shift += 7
+            if b < 128:
+                break
+        cur, v = v & 1, v >> 1
+        idx = (last[cur] + ((v >> 1) ^ -(v & 1))) & 0xffffffff
+        out.append(idx)
+        last[cur] = idx
+    return struct.pack('<%d%s' % (count, 'H' if size == 2 else 'I'), *out)
+
+
+def meshopt_decompress(asset):
+    """meshopt_compress の逆。圧縮ビューを buffer 0 に展開し拡張を外す。戻り値: 展開したビュー数"""
+    g = asset.gltf
+    new_bin, n = bytearray(), 0
+    for v in g.get('bufferViews', []):
+        ext = v.get('extensions', {}).pop(EXT_MESHOPT, None)
+        if ext is None:
+            data = bytes(asset.bin[v.get('byteOffset', 0):][:v['byteLength']])
+        else:
+            if ext.get('filter', 'NONE') != 'NONE' or ext['mode'] == 'TRIANGLES':
+                raise ValueError(f"unsupported meshopt mode/filter: {ext['mode']} {ext.get('filter')}")
+            enc = bytes(asset.bin[ext.get('byteOffset', 0):][:ext['byteLength']])
+            decode = decode_index_sequence if ext['mode'] == 'INDICES' else decode_vertex_buffer
+            data = decode(enc, ext['count'], ext['byteStride'])
+            if not v['extensions']:
+                del v['extensions']
+            n += 1
+        new_bin += b'\0' * glb._pad4(len(new_bin))
+        v.update(buffer=0, byteOffset=len(new_bin))
+        new_bin += data
+    asset.bin = new_bin
+    if n:
+        g['buffers'] = g['buffers'][:1]
+        for key in ('extensionsUsed', 'extensionsRequired'):
+            if EXT_MESHOPT in g.get(key, []):
+                g[key].remove(EXT_MESHOPT)
+                if not g[key]:
+                    del g[key]
+    return n
+
+
+def _view_layout(g, vi):
+    """バッファビューの (mode, 要素サイズ)。圧縮できなければ None"""
+    v = g['bufferViews'][vi]
+    accs = [a for a in g.get('accessors', []) if a.get('bufferView') == vi]
+    if not accs or any(a.get('byteOffset', 0) or 'sparse' in a for a in accs):
+        return None
+    sizes = {glb.NCOMP[a['type']] * struct.calcsize(glb.FMT[a['componentType']]) for a in accs}
+    if len(sizes) != 1:
+        return None
+    size = v.get('byteStride', sizes.pop())
+    if v.get('target') == ELEMENT_ARRAY_BUFFER:
+        return ('INDICES', size) if size in (2, 4) else None
+    return ('ATTRIBUTES', size) if size % 4 == 0 and size <= 256 else None
+
+
+def meshopt_compress(asset):
+    """頂点属性・アニメーション・インデックスのビューを圧縮する（最後に行うこと）
+
+    圧縮したビューは中身の無いフォールバックバッファ（buffer 1）を指し、
+    実データは拡張の buffer 0 に入る。以降 Asset.read / compact は使えない。
+    戻り値: 圧縮したビュー数
+    """
+    g = asset.gltf
+    new_bin, fallback, n = bytearray(), 0, 0
+    for vi, v in enumerate(g.get('bufferViews', [])):
+        data = asset.view_bytes(vi)
+        layout = _view_layout(g, vi)
+        enc = None
+        if layout:
+            mode, size = layout
+            count = len(data) // size
+            if mode == 'INDICES':
+                idx = struct.unpack('<%d%s' % (count, 'H' if size == 2 else 'I'), data)
+                enc = encode_index_sequence(idx)
+            else:
+                enc = encode_vertex_buffer(data, count, size)
+            if len(enc) >= len(data):
+                enc = None
+        new_bin += b'\0' * glb._pad4(len(new_bin))
+        if enc is None:
+            v['byteOffset'] = len(new_bin)
+            new_bin += data
+            continue
+        ext = {'buffer': 0, 'byteOffset': len(new_bin), 'byteLength': len(enc),
+               'byteStride': size, 'count': count, 'mode': mode}
+        new_bin += enc
+        fallback += glb._pad4(fallback)
+        v.update(buffer=1, byteOffset=fallback)
+        v.setdefault('extensions', {})[EXT_MESHOPT] = ext
+        fallback += len(data)
+        n += 1
+    asset.bin = new_bin
+    if n:
+        g['buffers'][1:] = [{'byteLength': fallback,
+                             'extensions': {EXT_MESHOPT: {'fallback': True}}}]
+        _require(g, EXT_MESHOPT)
+    return n
+
+
+# ──────────────────────────────────────────────────────────────────────
+def optimize(asset, meshopt=False):
+    """全パスを順に実行。[(パス名, 処理後のバイト数, 詳細)] を返す"""
+    steps = [('input', len(asset.to_bytes()), '')]
+    quantize(asset)
+    steps.append(('quantize', len(asset.to_bytes()), EXT_QUANT))
+    n = dedupe(asset)
+    steps.append(('dedupe', len(asset.to_bytes()), f'{n} merged'))
+    n = prune(asset)
+    steps.append(('prune', len(asset.to_bytes()), f'{n} removed'))
+    if meshopt:
+        n = meshopt_compress(asset)
+        steps.append(('meshopt', len(asset.to_bytes()), f'{n} views'))
+    return steps
+
+
+def print_report(name, steps):
+    print(f"[glb_optimize] {name}")
+    prev = steps[0][1]
+    for step, size, note in steps:
+        print(f"  {step:<10}{size:>10} bytes  {size - prev:>+9}  {note}")
+        prev = size
+    b, a = steps[0][1], steps[-1][1]
+    print(f"  total     {b} → {a} bytes ({100 * (b - a) / b:.0f}% smaller)")
+
+
+def optimize_file(src, dst=None, meshopt=False, verbose=True):
+    asset = glb.Asset.load(src)
+    steps = optimize(asset, meshopt)
+    asset.save(dst or src)
+    if verbose:
+        print_report(os.path.basename(src), steps)
+    return steps
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(prog='glb_optimize.py')
+    ap.add_argument('src')
+    ap.add_argument('-o', '--out')
+    ap.add_argument('--meshopt', action='store_true',
+                    help='EXT_meshopt_compression で圧縮（要 MeshoptDecoder）')
+    ap.add_argument('--decompress', action='store_true',
+                    help='EXT_meshopt_compression を展開するだけ（ほかのパスは掛けない）')
+    args = ap.parse_args(argv)
+    if args.decompress:
+        asset = glb.Asset.load(args.src)
+        n = meshopt_decompress(asset)
+        size = asset.save(args.out or args.src)
+        print(f'[glb_optimize] {os.path.basename(args.src)}: {n} views decompressed → {size} bytes')
+        return
+    optimize_file(args.src, args.out, args.meshopt)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
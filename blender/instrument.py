@@ -0,0 +1,193 @@
+"""
+instrument.py — Blender ビルドスクリプトのフェーズ計測
+
+build_kyuroku / animate_bug / create_r4_character の main() はこのモジュールの
+Profiler で処理をフェーズに区切る。フェーズごとに以下を記録する:
+
+  - 壁時計時間（開始オフセットと所要秒数）
+  - bpy.ops の呼び出し回数（オペレーター名ごと）
+  - オブジェクト数・メッシュ数・キーフレーム数の増減
+  - bpy.data の主なデータブロック数
+  - ピーク RSS（プロセス開始からの最大値なのでフェーズ終了時点の値を記録）
+
+--profile DIR を付けたときだけ計測して DIR/<name>.json と
+DIR/<name>.trace.json（chrome://tracing / Perfetto で開ける）を書く。
+--cprofile を足すとフェーズごとの cProfile を DIR/<name>.<phase>.prof に書く。
+（snakeviz や python -m pstats で見る）
+
+使い方（スクリプト側）:
+    prof = instrument.from_args('kyuroku', args)   # args は add_args 済み
+    with prof.phase('mesh'):
+        ...
+    prof.finish()
+"""
+import cProfile
+import collections
+import contextlib
+import json
+import os
+import sys
+import time
+
+import bpy
+
+try:
+    import resource
+except ImportError:          # Windows
+    resource = None
+
+# 記録する bpy.data のコレクション
+DATABLOCKS = ('objects', 'meshes', 'materials', 'armatures', 'actions',
+              'collections', 'images', 'node_groups')
+
+
+# ──────────────────────────────────────────────────────────────────────
+# 計測値
+# ──────────────────────────────────────────────────────────────────────
+def peak_rss():
+    """プロセスのピーク RSS（バイト）。取れない環境では None"""
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == 'darwin' else rss * 1024
+
+
+def _fcurves(action):
+    """Action の全 F カーブ（4.4+ のスロット付き Action と旧 API の両対応）"""
+    layers = getattr(action, 'layers', None)
+    if layers:
+        for layer in layers:
+            for strip in layer.strips:
+                for cb in strip.channelbags:
+                    yield from cb.fcurves
+    elif hasattr(action, 'fcurves'):
+        yield from action.fcurves
+
+
+def keyframe_count():
+    return sum(len(fc.keyframe_points) for a in bpy.data.actions for fc in _fcurves(a))
+
+
+def snapshot():
+    """現在のデータブロック数とキーフレーム数"""
+    s = {k: len(getattr(bpy.data, k)) for k in DATABLOCKS}
+    s['keyframes'] = keyframe_count()
+    return s
+
+
+# ──────────────────────────────────────────────────────────────────────
+# bpy.ops 呼び出しカウント
+# ──────────────────────────────────────────────────────────────────────
+OPS = collections.Counter()
+_orig_call = None
+
+
+def _hook_ops():
+    """bpy.ops.<mod>.<op>(...) の呼び出しを OPS に数える（1 回だけ差し込む）"""
+    global _orig_call
+    if _orig_call is not None:
+        return
+    cls = type(bpy.ops.object.select_all)
+    _orig_call = cls.__call__
+
+    def counted(self, *a, **kw):
+        OPS[f'{self._module}.{self._func}'] += 1
+        return _orig_call(self, *a, **kw)
+    cls.__call__ = counted
+
+
+# ──────────────────────────────────────────────────────────────────────
+# Profiler
+# ──────────────────────────────────────────────────────────────────────
+class Profiler:
+    """フェーズ計測。out_dir が None なら何も記録しない（phase はそのまま通す）"""
+
+    def __init__(self, name, out_dir=None, cprofile=False):
+        self.name = name
+        self.out_dir = out_dir
+        self.cprofile = cprofile and out_dir is not None
+        self.phases = []
+        self.t0 = time.perf_counter()
+        if out_dir:
+            os.makedirs(out_dir, exist_ok=True)
+            _hook_ops()
+
+    @property
+    def enabled(self):
+        return self.out_dir is not None
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        if not self.enabled:
+            yield
+            return
+        before, ops = snapshot(), OPS.copy()
+        prof = cProfile.Profile() if self.cprofile else None
+        start = time.perf_counter()
+        if prof:
+            prof.enable()
+        try:
+            yield
+        finally:
+            if prof:
+                prof.disable()
+            end = time.perf_counter()
+            after = snapshot()
+            row = {
+                'phase': name,
+                'start': round(start - self.t0, 6),
+                'seconds': round(end - start, 6),
+                'ops': dict((OPS - ops).most_common()),
+                'delta': {k: after[k] - before[k] for k in after if after[k] != before[k]},
+                'datablocks': after,
+                'peak_rss': peak_rss(),
+            }
+            if prof:
+                row['cprofile'] = os.path.join(self.out_dir, f'{self.name}.{name}.prof')
+                prof.dump_stats(row['cprofile'])
+            self.phases.append(row)
+            print(f"[{self.name}] {name:<12} {row['seconds']:8.3f}s"
+                  f"  ops={sum(row['ops'].values())}")
+
+    def report(self):
+        return {'name': self.name, 'argv': sys.argv,
+                'blender': bpy.app.version_string,
+                'seconds': round(time.perf_counter() - self.t0, 6),
+                'peak_rss': peak_rss(), 'phases': self.phases}
+
+    def chrome_trace(self):
+        """Chrome Trace Event 形式（フェーズ = 完了イベント、RSS = カウンター）"""
+        events = []
+        for p in self.phases:
+            ts = p['start'] * 1e6
+            events.append({'name': p['phase'], 'cat': self.name, 'ph': 'X',
+                           'ts': ts, 'dur': p['seconds'] * 1e6, 'pid': 1, 'tid': 1,
+                           'args': {'ops': p['ops'], 'delta': p['delta']}})
+            if p['peak_rss'] is not None:
+                events.append({'name': 'peak_rss_mb', 'ph': 'C', 'pid': 1,
+                               'ts': ts + p['seconds'] * 1e6,
+                               'args': {'MB': round(p['peak_rss'] / 2**20, 1)}})
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def finish(self):
+        """JSON とトレースを書き出す。戻り値: JSON のパス（無効時は None）"""
+        if not self.enabled:
+            return None
+        path = os.path.join(self.out_dir, f'{self.name}.json')
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.report(), f, indent=2)
+        with open(os.path.join(self.out_dir, f'{self.name}.trace.json'), 'w') as f:
+            json.dump(self.chrome_trace(), f)
+        print(f"[{self.name}] profile → {path}")
+        return path
+
+
+def add_args(ap):
+    ap.add_argument('--profile', metavar='DIR',
+                    help='フェーズごとの計測を DIR/<name>.json と .trace.json に書く')
+    ap.add_argument('--cprofile', action='store_true',
+                    help='--profile と併用: フェーズごとの cProfile も書く')
+
+
+def from_args(name, args):
+    return Profiler(name, args.profile, args.cprofile)
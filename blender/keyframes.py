@@ -0,0 +1,117 @@
+"""
+keyframes.py — ボーンのキーフレームの書き込みレイヤー
+
+InsertKeys : 従来経路。pose_bone.keyframe_insert を 1 キーずつ呼ぶ（比較用）
+KeyLayer   : (bone, prop, channel, frame, value) を溜めておき、F カーブごとに
+             keyframe_points.add(n) + foreach_set('co') で一括書き込み
+
+どちらも kf(name, xyz, frame) / euler(name, frames, x, y, z) /
+vec(name, prop, frames, x, y, z) / flush(action) を持つので、クリップ作成関数は
+どちらの経路でもそのまま動く。x/y/z にはスカラーか frames と同じ長さの
+NumPy 配列を渡せる。prop は 'rotation_euler' / 'location' / 'scale'。
+
+write_clip(k, clip) は anim_library.retarget の結果を書き込みレイヤーに積む。
+"""
+import numpy as np
+
+
+def bone_path(name, prop='rotation_euler'):
+    return f'pose.bones["{name}"].{prop}'
+
+
+def write_clip(k, clip):
+    """anim_library.retarget の (名前, フレーム列, チャンネル, 誤差) を k に積む
+
+    location は静止位置からのオフセット、scale は静止スケールに掛ける値で、
+    ポーズボーンの location / scale と同じ意味なのでそのまま書く。
+    """
+    _, frames, channels, _ = clip
+    for bone, prop, rows in channels:
+        v = np.asarray(rows, dtype=np.float32)
+        k.vec(bone, prop, frames, v[:, 0], v[:, 1], v[:, 2])
+
+
+def fcurve_api(action, id_obj):
+    """(fcurves, groups) を返す。Blender 4.4+ のスロット付き Action と旧 API の両対応"""
+    if hasattr(action, 'slots'):
+        from bpy_extras.anim_utils import action_ensure_channelbag_for_slot
+        ad = id_obj.animation_data
+        if ad.action_slot is None:
+            ad.action_slot = action.slots.new(id_type=id_obj.id_type, name=id_obj.name)
+        cb = action_ensure_channelbag_for_slot(action, ad.action_slot)
+        return cb.fcurves, cb.groups
+    return action.fcurves, action.groups
+
+
+class InsertKeys:
+    """pose_bone.keyframe_insert を毎回呼ぶ従来の書き込み"""
+
+    def __init__(self, arm):
+        self.arm = arm
+
+    def kf(self, name, xyz, frame, prop='rotation_euler'):
+        """ボーンにキーフレームを挿入（既定は Euler XYZ 回転）"""
+        pb = self.arm.pose.bones.get(name)
+        if not pb:
+            return
+        if prop == 'rotation_euler':
+            pb.rotation_mode = 'XYZ'
+        setattr(pb, prop, xyz)
+        pb.keyframe_insert(data_path=prop, frame=frame)
+
+    def euler(self, name, frames, x=0.0, y=0.0, z=0.0):
+        self.vec(name, 'rotation_euler', frames, x, y, z)
+
+    def vec(self, name, prop, frames, x=0.0, y=0.0, z=0.0):
+        frames = np.atleast_1d(frames)
+        xs, ys, zs = (np.broadcast_to(v, frames.shape) for v in (x, y, z))
+        for f, a, b, c in zip(frames, xs, ys, zs):
+            self.kf(name, (float(a), float(b), float(c)), int(f), prop)
+
+    def flush(self, action):
+        pass
+
+
+class KeyLayer:
+    """キーを溜めて F カーブ単位で一括書き込み"""
+
+    def __init__(self, arm):
+        self.arm = arm
+        self.keys = {}   # (bone, prop, channel) -> [(frames, values), ...]
+
+    def kf(self, name, xyz, frame, prop='rotation_euler'):
+        self.vec(name, prop, frame, *xyz)
+
+    def euler(self, name, frames, x=0.0, y=0.0, z=0.0):
+        self.vec(name, 'rotation_euler', frames, x, y, z)
+
+    def vec(self, name, prop, frames, x=0.0, y=0.0, z=0.0):
+        if name not in self.arm.pose.bones:
+            return
+        frames = np.atleast_1d(np.asarray(frames, dtype=np.float32))
+        for ch, v in enumerate((x, y, z)):
+            v = np.broadcast_to(np.asarray(v, dtype=np.float32), frames.shape)
+            self.keys.setdefault((name, prop, ch), []).append((frames, v))
+
+    def channels(self):
+        """(bone, prop, channel, frames, values) を返す。同一フレームは後勝ち（keyframe_insert の上書きと同じ）"""
+        for (name, prop, ch), chunks in self.keys.items():
+            f = np.concatenate([c[0] for c in chunks])[::-1]
+            v = np.concatenate([c[1] for c in chunks])[::-1]
+            f, idx = np.unique(f, return_index=True)
+            yield name, prop, ch, f, v[idx]
+
+    def flush(self, action):
+        fcurves, groups = fcurve_api(action, self.arm)
+        for name, prop, ch, f, v in self.channels():
+            co = np.empty(len(f) * 2, dtype=np.float32)
+            co[0::2] = f
+            co[1::2] = v
+            fc = fcurves.new(bone_path(name, prop), index=ch)
+            fc.group = groups.get(name) or groups.new(name)
+            fc.keyframe_points.add(len(f))
+            fc.keyframe_points.foreach_set('co', co)
+            fc.update()
+            if prop == 'rotation_euler':
+                self.arm.pose.bones[name].rotation_mode = 'XYZ'
+        self.keys.clear()
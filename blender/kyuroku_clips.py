@@ -0,0 +1,116 @@
+"""
+kyuroku_clips.py — anim_library のクリップを kyuroku.glb に glTF アニメーションとして書く
+
+kyuroku は Empty 階層をそのままノードとして書き出すので、Blender の Action を
+経由せず、anim_library.retarget_all('kyuroku') の結果を書き出し済みの GLB に
+直接追加する（Z-up → Y-up の軸変換を通さないので値がそのまま残る）。
+ランタイムは bug フォームと同じ AnimationMixer（クロスフェード込み）で再生する。
+
+  - rotation_euler は three.js の Euler 'XYZ' と同じ式でクォータニオンにし、ノードの
+    レスト回転に右から掛ける（Empty 階層の書き出しではレスト回転が無いので
+    scene.js の rotation.set と同じ値になる）
+  - location はノードの静止位置に足し、scale は静止スケールに掛ける
+  - weights はモーフターゲットの重み（face_morphs.py を先に掛けておく）。ターゲットを
+    持つメッシュが無いノード（--skinned）は飛ばす
+  - Blink はループしない 1 回分（ランタイムが乱数の間隔で LoopOnce 再生する）
+
+使い方:
+  python kyuroku_clips.py kyuroku.glb [-o out.glb]
+"""
+import argparse
+import math
+import sys
+
+import anim_library
+import glb
+
+PATHS = {'rotation_euler': 'rotation', 'location': 'translation', 'scale': 'scale',
+         'weights': 'weights'}
+
+
+def euler_xyz_quat(x, y, z):
+    """three.js Quaternion.setFromEuler（order 'XYZ'）と同じ式。(x, y, z, w)"""
+    c1, c2, c3 = math.cos(x / 2), math.cos(y / 2), math.cos(z / 2)
+    s1, s2, s3 = math.sin(x / 2), math.sin(y / 2), math.sin(z / 2)
+    return (s1 * c2 * c3 + c1 * s2 * s3,
+            c1 * s2 * c3 - s1 * c2 * s3,
+            c1 * c2 * s3 + s1 * s2 * c3,
+            c1 * c2 * c3 - s1 * s2 * s3)
+
+
+def quat_mul(a, b):
+    ax, ay, az, aw = a
+    bx, by, bz, bw = b
+    return (aw * bx + ax * bw + ay * bz - az * by,
+            aw * by - ax * bz + ay * bw + az * bx,
+            aw * bz + ax * by - ay * bx + az * bw,
+            aw * bw - ax * bx - ay * by - az * bz)
+
+
+def to_gltf(node, prop, rows):
+    """retarget のチャンネル値 → glTF の出力値（ノードの静止 TRS と合成）"""
+    if prop == 'weights':
+        return [(w,) for r in rows for w in r]     # キーごとに全ターゲットを並べる
+    if prop == 'rotation_euler':
+        rest = tuple(node.get('rotation', (0.0, 0.0, 0.0, 1.0)))
+        return [quat_mul(rest, euler_xyz_quat(*r)) for r in rows]
+    if prop == 'location':
+        base = node.get('translation', (0.0, 0.0, 0.0))
+        return [tuple(b + v for b, v in zip(base, r)) for r in rows]
+    base = node.get('scale', (1.0, 1.0, 1.0))
+    return [tuple(b * v for b, v in zip(base, r)) for r in rows]
+
+
+def _has_targets(g, node):
+    return 'mesh' in node and any(p.get('targets') for p in g['meshes'][node['mesh']]['primitives'])
+
+
+def add_clips(asset, rig='kyuroku', fps=anim_library.FPS):
+    """asset (glb.Asset) に rig の全クリップを追加。戻り値: {名前: (長さ, 周波数の誤差)}"""
+    g = asset.gltf
+    nodes = {n.get('name'): i for i, n in enumerate(g['nodes'])}
+    have = {an.get('name') for an in g.get('animations', [])}
+    report = {}
+    for name, frames, channels, err in anim_library.retarget_all(rig, fps):
+        if name in have:
+            raise ValueError(f'animation {name!r} already present')
+        inp = asset.add_accessor([(f / fps,) for f in frames], minmax=True)
+        an = {'name': name, 'channels': [], 'samplers': []}
+        for bone, prop, rows in channels:
+            if bone not in nodes:
+                continue
+            node = g['nodes'][nodes[bone]]
+            if prop == 'weights' and not _has_targets(g, node):
+                continue
+            an['samplers'].append({'input': inp, 'interpolation': 'LINEAR',
+                                   'output': asset.add_accessor(to_gltf(node, prop, rows))})
+            an['channels'].append({'sampler': len(an['samplers']) - 1,
+                                   'target': {'node': nodes[bone], 'path': PATHS[prop]}})
+        if not an['channels']:      # 書き先が 1 つも無い（--skinned の Blink など）
+            continue
+        g.setdefault('animations', []).append(an)
+        report[name] = (frames[-1] / fps, err)
+    return report
+
+
+def add_clips_file(src, dst=None, rig='kyuroku', verbose=True):
+    asset = glb.Asset.load(src)
+    report = add_clips(asset, rig)
+    size = asset.save(dst or src)
+    if verbose:
+        print('[kyuroku_clips] ' + '  '.join(
+            f'{n} {T:.2f}s' + (f' (freq {err:+.1%})' if err else '')
+            for n, (T, err) in report.items()) + f' → {size} bytes')
+    return report
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(prog='kyuroku_clips.py')
+    ap.add_argument('src')
+    ap.add_argument('-o', '--out')
+    args = ap.parse_args(argv)
+    add_clips_file(args.src, args.out)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
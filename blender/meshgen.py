@@ -0,0 +1,131 @@
+"""
+meshgen.py — オペレーターを使わないプリミティブ生成 (bmesh / データAPI)
+
+bpy.ops.mesh.primitive_*_add + transform_apply + shade_smooth と同じ形状を
+bmesh.ops.create_* / Mesh.from_pydata で直接メッシュデータブロックとして作る。
+回転・スケールは matrix で頂点に焼き込み済みなので transform_apply は不要。
+オペレーターごとの depsgraph 更新・選択操作が無いぶんパーツ数に比例して速い。
+"""
+import math
+import bmesh
+import bpy
+from mathutils import Matrix, Euler, Vector
+
+IDENTITY = Matrix.Identity(4)
+
+
+def xform(sc=(1, 1, 1), rot=(0, 0, 0)):
+    """回転 × スケール の 4x4 行列（transform_apply(rotation, scale) と同じ順序）"""
+    return Euler(rot, 'XYZ').to_matrix().to_4x4() @ Matrix.Diagonal((*sc, 1.0))
+
+
+def _bm_with_uv():
+    """calc_uvs が効くよう UV レイヤーを先に作っておく（オペレーターと同名）"""
+    bm = bmesh.new()
+    bm.loops.layers.uv.new('UVMap')
+    return bm
+
+
+def _to_mesh(bm, name, smooth):
+    if smooth:
+        for f in bm.faces:
+            f.smooth = True
+    me = bpy.data.meshes.new(name)
+    bm.to_mesh(me)
+    bm.free()
+    return me
+
+
+def uv_sphere(name, r, segments=32, rings=16, matrix=IDENTITY, smooth=True):
+    bm = _bm_with_uv()
+    bmesh.ops.create_uvsphere(bm, u_segments=segments, v_segments=rings,
+                              radius=r, matrix=matrix, calc_uvs=True)
+    return _to_mesh(bm, name, smooth)
+
+
+def cylinder(name, r, h, verts=16, matrix=IDENTITY, smooth=True):
+    bm = _bm_with_uv()
+    bmesh.ops.create_cone(bm, cap_ends=True, cap_tris=False, segments=verts,
+                          radius1=r, radius2=r, depth=h,
+                          matrix=matrix, calc_uvs=True)
+    return _to_mesh(bm, name, smooth)
+
+
+def cone(name, r1, r2, h, verts=32, matrix=IDENTITY, smooth=False):
+    bm = _bm_with_uv()
+    bmesh.ops.create_cone(bm, cap_ends=True, cap_tris=False, segments=verts,
+                          radius1=r1, radius2=r2, depth=h,
+                          matrix=matrix, calc_uvs=True)
+    return _to_mesh(bm, name, smooth)
+
+
+def cube(name, size=1.0, matrix=IDENTITY, smooth=True):
+    bm = _bm_with_uv()
+    bmesh.ops.create_cube(bm, size=size, matrix=matrix, calc_uvs=True)
+    return _to_mesh(bm, name, smooth)
+
+
+def torus(name, R, r, major=40, minor=10, matrix=IDENTITY, smooth=True):
+    """bl_operators/add_mesh_torus.py と同じ頂点順・面順・UV で生成"""
+    verts, faces = [], []
+    tot = major * minor
+    for i in range(major):
+        rm = Matrix.Rotation(i / major * math.pi * 2, 3, 'Z')
+        for j in range(minor):
+            a = math.pi * 2 * j / minor
+            verts.append(rm @ Vector((R + math.cos(a) * r, 0.0, math.sin(a) * r)))
+            i1 = i * minor + j
+            if j + 1 == minor:
+                i2, i3, i4 = i * minor, i1 + minor, i * minor + minor
+            else:
+                i2, i3, i4 = i1 + 1, i1 + minor, i1 + minor + 1
+            faces.append((i1, i3 % tot, i4 % tot, i2 % tot))
+
+    me = bpy.data.meshes.new(name)
+    me.from_pydata(verts, [], faces)
+    me.transform(matrix)
+
+    # UV（add_mesh_torus の _add_uvs と同じ折り返し規則）
+    us, vs = 1.0 / major, 1.0 / minor
+    uw, vw = 1.0 - us / 2, 1.0 - vs / 2
+    uv = [0.0] * (len(faces) * 8)
+    k = 0
+    u0 = 0.5 + math.fmod(0.5, us)
+    for _ in range(major):
+        u1 = u0 + us
+        v0 = 0.5 + math.fmod(0.5, vs)
+        for _ in range(minor):
+            v1 = v0 + vs
+            uv[k:k + 8] = (u0, v0, u1, v0, u1, v1, u0, v1)
+            k += 8
+            v0 = v1 - 1.0 if v1 > vw else v1
+        u0 = u1 - 1.0 if u1 > uw else u1
+    me.uv_layers.new(name='UVMap').data.foreach_set('uv', uv)
+
+    if smooth:
+        me.polygons.foreach_set('use_smooth', [True] * len(me.polygons))
+    me.update()
+    return me
+
+
+def link(name, data, loc=(0, 0, 0), collection=None):
+    """オブジェクトを作ってコレクションにリンク（選択・アクティブ化はしない）"""
+    o = bpy.data.objects.new(name, data)
+    o.location = loc
+    (collection or bpy.context.collection).objects.link(o)
+    return o
+
+
+def apply_rot_scale(obj):
+    """transform_apply(location=False, rotation=True, scale=True) のデータAPI版"""
+    basis = obj.matrix_basis.copy()
+    obj.data.transform(basis.to_3x3().to_4x4())
+    obj.matrix_basis = Matrix.Translation(basis.translation)
+
+
+def world_matrix(obj):
+    """depsgraph 未評価でも使えるワールド行列（親チェーンを辿って計算）"""
+    m = obj.matrix_basis
+    if obj.parent is not None:
+        m = world_matrix(obj.parent) @ obj.matrix_parent_inverse @ m
+    return m
@@ -0,0 +1,316 @@
+"""
+palette.py — マテリアルをパレットテクスチャ 1 枚にまとめ、静的なパーツを結合してドローコールを減らす
+
+kyuroku は 10 マテリアル × フォーム数の PBR マテリアルを持ち、パーツごとに
+マテリアルが違うので結合もできなかった。このパスで:
+
+  1. 各マテリアルの値（ベース色・metallic/roughness・発光）をパレットの 1 セルにする
+       列 = 元のマテリアル（フォームでの差し替え先の組）、行 = フォーム（variant）
+     ベース色 / metallicRoughness / 発光の 3 枚（NEAREST）に焼き、プリミティブの
+     TEXCOORD_0 を全頂点そのセルの中心にする
+  2. alphaMode ごとに 1 マテリアル（不透明なら 1 つ）。フォームは KHR_texture_transform の
+     offset で行をずらしたマテリアルを KHR_materials_variants で差し替える
+  3. 同じ親の下の静的なパーツ（子を持たず、名前で参照されず、同じマテリアル）を
+     親の座標系に焼き込んで 1 メッシュに結合する。スキンメッシュは同じスキン同士で結合
+
+keep_materials（ランタイムが個別に光らせるエンブレムなど）はパレットに入れず、
+keep_nodes（scene.js が名前で表示切替・モーフを書くパーツ）は結合しない。
+form_variants の後、face_morphs / kyuroku_clips の前に実行する。
+
+使い方:
+  python palette.py kyuroku.glb [-o out.glb] [--keep-nodes Face,EyeL,...]
+"""
+import argparse
+import json
+import struct
+import sys
+import zlib
+
+import glb
+import glb_meta
+import glb_optimize
+
+EXT_VARIANTS = 'KHR_materials_variants'
+EXT_EMIT = 'KHR_materials_emissive_strength'
+EXT_TT = 'KHR_texture_transform'
+NEAREST, CLAMP = 9728, 33071
+
+KEEP_MATERIALS = ('EmbA', 'EmbB')       # scene.js の _emblemPulse が emissiveIntensity を書く
+
+
+# ──────────────────────────────────────────────────────────────────────
+# PNG
+# ──────────────────────────────────────────────────────────────────────
+def png_rgba(w, h, pixels):
+    """pixels = 行優先の [(r, g, b, a), ...]（0〜255）→ PNG のバイト列"""
+    def chunk(tag, data):
+        return (struct.pack('>I', len(data)) + tag + data
+                + struct.pack('>I', zlib.crc32(tag + data) & 0xffffffff))
+    raw = b''.join(b'\0' + bytes(c for px in pixels[y * w:(y + 1) * w] for c in px)
+                   for y in range(h))
+    return (b'\x89PNG\r\n\x1a\n'
+            + chunk(b'IHDR', struct.pack('>IIBBBBB', w, h, 8, 6, 0, 0, 0))
+            + chunk(b'IDAT', zlib.compress(raw, 9)) + chunk(b'IEND', b''))
+
+
+def srgb8(c):
+    """リニア 0〜1 → sRGB 8 bit"""
+    c = min(max(c, 0.0), 1.0)
+    s = c * 12.92 if c <= 0.0031308 else 1.055 * c ** (1 / 2.4) - 0.055
+    return int(round(s * 255))
+
+
+def lin8(c):
+    return int(round(min(max(c, 0.0), 1.0) * 255))
+
+
+# ──────────────────────────────────────────────────────────────────────
+# 1-2. パレット
+# ──────────────────────────────────────────────────────────────────────
+def _cell(m):
+    """マテリアル → (ベース色 RGBA, (roughness, metallic), 発光 RGB × 強さ)"""
+    pbr = m.get('pbrMetallicRoughness', {})
+    strength = m.get('extensions', {}).get(EXT_EMIT, {}).get('emissiveStrength', 1.0)
+    return (tuple(pbr.get('baseColorFactor', (1.0, 1.0, 1.0, 1.0))),
+            (pbr.get('roughnessFactor', 1.0), pbr.get('metallicFactor', 1.0)),
+            tuple(c * strength for c in m.get('emissiveFactor', (0.0, 0.0, 0.0))))
+
+
+def _add_texture(asset, data, sampler):
+    g = asset.gltf
+    g.setdefault('images', []).append({'bufferView': asset.add_view(data), 'mimeType': 'image/png'})
+    g.setdefault('textures', []).append({'sampler': sampler, 'source': len(g['images']) - 1})
+    return len(g['textures']) - 1
+
+
+def consolidate(asset, keep_materials=KEEP_MATERIALS):
+    """パレットマテリアルに置き換える。戻り値: (列数, 行数, 置き換えたプリミティブ数)"""
+    g = asset.gltf
+    mats = g.get('materials', [])
+    nvar = max(1, len(g.get('extensions', {}).get(EXT_VARIANTS, {}).get('variants', [])))
+    if any(m.get('pbrMetallicRoughness', {}).get('baseColorTexture') for m in mats):
+        raise ValueError('palette: textured materials are not supported')
+
+    # 列: (既定マテリアル, variant ごとのマテリアル) の組
+    prims, cols = [], {}
+    for m in g.get('meshes', []):
+        for p in m['primitives']:
+            if 'material' not in p or mats[p['material']].get('name') in keep_materials:
+                continue
+            per = [p['material']] * nvar
+            for mp in p.get('extensions', {}).get(EXT_VARIANTS, {}).get('mappings', []):
+                for vi in mp['variants']:
+                    per[vi] = mp['material']
+            key = tuple(per)
+            group = (mats[p['material']].get('alphaMode', 'OPAQUE'),
+                     mats[p['material']].get('doubleSided', False))
+            cols.setdefault(key, len(cols))
+            prims.append((p, key, group))
+    if not prims:
+        return 0, nvar, 0
+
+    # テクスチャ（幅 = 列数, 高さ = variant 数）
+    ncol = len(cols)
+    cells = {(c, vi): _cell(mats[key[vi]]) for key, c in cols.items() for vi in range(nvar)}
+    emax = max(max(e) for _, _, e in cells.values()) or 1.0
+    base, mr, emit = [], [], []
+    for vi in range(nvar):
+        for c in range(ncol):
+            col, (rough, metal), e = cells[c, vi]
+            base.append(tuple(srgb8(x) for x in col[:3]) + (lin8(col[3]),))
+            mr.append((0, lin8(rough), lin8(metal), 255))
+            emit.append(tuple(srgb8(x / emax) for x in e) + (255,))
+    g.setdefault('samplers', []).append({'magFilter': NEAREST, 'minFilter': NEAREST,
+                                         'wrapS': CLAMP, 'wrapT': CLAMP})
+    sampler = len(g['samplers']) - 1
+    tex = [_add_texture(asset, png_rgba(ncol, nvar, px), sampler) for px in (base, mr, emit)]
+
+    # マテリアル: (alphaMode, doubleSided) × variant
+    variant_names = [v['name'] for v in
+                     g.get('extensions', {}).get(EXT_VARIANTS, {}).get('variants', [])] or ['']
+    palette = {}
+
+    def material(group, vi):
+        if (group, vi) in palette:
+            return palette[group, vi]
+
+        def ref(t):
+            r = {'index': t}
+            if vi:
+                r['extensions'] = {EXT_TT: {'offset': [0.0, vi / nvar]}}
+            return r
+        name = 'Palette' + ('' if group[0] == 'OPAQUE' else group[0].title()) \
+            + (f'.{variant_names[vi]}' if vi else '')
+        m = {'name': name,
+             'pbrMetallicRoughness': {'baseColorTexture': ref(tex[0]),
+                                      'metallicRoughnessTexture': ref(tex[1])},
+             'emissiveTexture': ref(tex[2]), 'emissiveFactor': [1.0, 1.0, 1.0]}
+        if emax > 1.0:
+            m['extensions'] = {EXT_EMIT: {'emissiveStrength': emax}}
+        if group[0] != 'OPAQUE':
+            m['alphaMode'] = group[0]
+        if group[1]:
+            m['doubleSided'] = True
+        mats.append(m)
+        palette[group, vi] = len(mats) - 1
+        return palette[group, vi]
+
+    uvs = {}
+    for p, key, group in prims:
+        c = cols[key]
+        n = g['accessors'][p['attributes']['POSITION']]['count']
+        if (c, n) not in uvs:
+            uvs[c, n] = asset.add_accessor([((c + 0.5) / ncol, 0.5 / nvar)] * n,
+                                           target=glb.ARRAY_BUFFER)
+        p['attributes']['TEXCOORD_0'] = uvs[c, n]
+        p['material'] = material(group, 0)
+        if nvar > 1:
+            p.setdefault('extensions', {})[EXT_VARIANTS] = {'mappings': [
+                {'material': material(group, vi), 'variants': [vi]} for vi in range(nvar)]}
+
+    used = g.setdefault('extensionsUsed', [])
+    for ext in ([EXT_TT] if nvar > 1 else []) + ([EXT_EMIT] if emax > 1.0 else []):
+        if ext not in used:
+            used.append(ext)
+    return ncol, nvar, len(prims)
+
+
+# ──────────────────────────────────────────────────────────────────────
+# 3. 結合
+# ──────────────────────────────────────────────────────────────────────
+def _det3(m):
+    (a, b, c), (d, e, f), (g, h, i) = m
+    return a * (e * i - f * h) - b * (d * i - f * g) + c * (d * h - e * g)
+
+
+def _inv3(m):
+    (a, b, c), (d, e, f), (g, h, i) = m
+    det = _det3(m)
+    return [[(e * i - f * h) / det, (c * h - b * i) / det, (b * f - c * e) / det],
+            [(f * g - d * i) / det, (a * i - c * g) / det, (c * d - a * f) / det],
+            [(d * h - e * g) / det, (b * g - a * h) / det, (a * e - b * d) / det]]
+
+
+def _bake(rows, name, m):
+    """ローカル行列 m（4x4 行優先）で頂点属性を親の座標系へ"""
+    if name == 'POSITION':
+        return [tuple(glb_meta._apply(m, r)) for r in rows]
+    if name == 'NORMAL':
+        inv = _inv3([row[:3] for row in m[:3]])
+        out = []
+        for r in rows:
+            v = [sum(inv[k][i] * r[k] for k in range(3)) for i in range(3)]   # 逆行列の転置
+            s = sum(c * c for c in v) ** 0.5 or 1.0
+            out.append(tuple(c / s for c in v))
+        return out
+    return rows
+
+
+def _signature(g, node):
+    """結合できるノードのキー（違えば結合しない）。結合対象外なら None"""
+    if 'mesh' not in node or 'children' in node or 'weights' in node:
+        return None
+    prims = g['meshes'][node['mesh']]['primitives']
+    if len(prims) != 1 or prims[0].get('targets') or prims[0].get('mode', 4) != 4:
+        return None
+    p = prims[0]
+    return (node.get('skin'), p.get('material'), tuple(sorted(p['attributes'])),
+            json.dumps(p.get('extensions', {}), sort_keys=True))
+
+
+def merge(asset, keep_nodes=()):
+    """同じ親の下の静的パーツを結合。戻り値: 減ったメッシュノード数"""
+    g = asset.gltf
+    keep = set(keep_nodes)
+    animated = {ch['target']['node'] for an in g.get('animations', []) for ch in an['channels']}
+    merged = 0
+    for pi, parent in enumerate(list(g.get('nodes', []))):
+        groups = {}
+        for ci in parent.get('children', []):
+            node = g['nodes'][ci]
+            if node.get('name') in keep or ci in animated:
+                continue
+            sig = _signature(g, node)
+            if sig:
+                groups.setdefault(sig, []).append(ci)
+        for sig, nodes in groups.items():
+            if len(nodes) < 2:
+                continue
+            attrs, idx = {k: [] for k in sig[2]}, []
+            for ci in nodes:
+                node = g['nodes'][ci]
+                p = g['meshes'][node['mesh']]['primitives'][0]
+                # スキンメッシュはノードの変換が無視されるのでそのまま
+                m = glb_meta.IDENTITY if sig[0] is not None else glb_meta.local_matrix(node)
+                base = len(attrs['POSITION'])
+                for k in attrs:
+                    attrs[k] += _bake(asset.read(p['attributes'][k]), k, m)
+                ids = [i[0] for i in asset.read(p['indices'])] if 'indices' in p \
+                    else range(len(attrs['POSITION']) - base)
+                ids = [i + base for i in ids]
+                if _det3([row[:3] for row in m[:3]]) < 0:
+                    # X 反転で共有しているパーツ（*R）は面の向きを戻す（rigging.merge_by_material と同じ）
+                    for t in range(0, len(ids) - 2, 3):
+                        ids[t + 1], ids[t + 2] = ids[t + 2], ids[t + 1]
+                idx += ids
+            first = g['meshes'][g['nodes'][nodes[0]]['mesh']]['primitives'][0]
+            prim = {'attributes': {}, 'material': first['material']} if 'material' in first \
+                else {'attributes': {}}
+            for k, rows in attrs.items():
+                src = g['accessors'][first['attributes'][k]]
+                prim['attributes'][k] = asset.add_accessor(
+                    rows, src['componentType'], src.get('normalized', False),
+                    glb.ARRAY_BUFFER, minmax=(k == 'POSITION'))
+            ictype = glb.USHORT if len(attrs['POSITION']) <= 0xffff else glb.UINT
+            prim['indices'] = asset.add_accessor([(i,) for i in idx], ictype,
+                                                 target=glb.ELEMENT_ARRAY_BUFFER)
+            if 'extensions' in first:
+                prim['extensions'] = json.loads(json.dumps(first['extensions']))
+            g['meshes'].append({'name': f"{parent.get('name', pi)}.parts", 'primitives': [prim]})
+            new = {'name': f"{parent.get('name', pi)}.parts", 'mesh': len(g['meshes']) - 1}
+            if sig[0] is not None:
+                new['skin'] = sig[0]
+            g['nodes'].append(new)
+            parent['children'] = [c for c in parent['children'] if c not in nodes] \
+                + [len(g['nodes']) - 1]
+            merged += len(nodes) - 1
+    return merged
+
+
+def optimize(asset, keep_nodes=(), keep_materials=KEEP_MATERIALS):
+    """consolidate → merge → 不要になったノード・メッシュ・マテリアルの削除"""
+    before = sum(1 for n in asset.gltf.get('nodes', []) if 'mesh' in n)
+    ncol, nvar, nprim = consolidate(asset, keep_materials)
+    merged = merge(asset, keep_nodes)
+    glb_optimize.prune(asset)
+    return {'columns': ncol, 'rows': nvar, 'primitives': nprim, 'merged': merged,
+            'draws_before': before,
+            'draws_after': sum(1 for n in asset.gltf.get('nodes', []) if 'mesh' in n),
+            'materials': len(asset.gltf.get('materials', []))}
+
+
+def optimize_file(src, dst=None, keep_nodes=(), keep_materials=KEEP_MATERIALS, verbose=True):
+    asset = glb.Asset.load(src)
+    r = optimize(asset, keep_nodes, keep_materials)
+    size = asset.save(dst or src)
+    if verbose:
+        print(f"[palette] {r['columns']}x{r['rows']} palette, {r['primitives']} primitives, "
+              f"mesh nodes {r['draws_before']} → {r['draws_after']}, "
+              f"{r['materials']} materials → {size} bytes")
+    return r
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(prog='palette.py')
+    ap.add_argument('src')
+    ap.add_argument('-o', '--out')
+    ap.add_argument('--keep-nodes', default='', help='結合しないノード名（カンマ区切り）')
+    ap.add_argument('--keep-materials', default=','.join(KEEP_MATERIALS),
+                    help='パレットに入れないマテリアル名（カンマ区切り）')
+    args = ap.parse_args(argv)
+    optimize_file(args.src, args.out, tuple(n for n in args.keep_nodes.split(',') if n),
+                  tuple(n for n in args.keep_materials.split(',') if n))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,121 @@
+"""
+rigging.py — Empty 階層 → アーマチュア変換・剛体ウェイト・マテリアル別結合
+
+パーツ単位で持ち主の関節が決まっているモデル用。ウェイトは常に 1.0 / 1 本。
+ボーンは全て +Z 向き・ロール 0 で作るので、glTF (Y-up) 上の関節ノードは
+元の Empty と同じく回転なしのレスト姿勢になり、ランタイム側の
+rotation.x/y/z 代入がそのまま使える。
+"""
+import bmesh
+import bpy
+from mathutils import Vector
+
+from meshgen import world_matrix
+
+BONE_LEN = 0.05
+
+
+def armature_from_empties(root, name, extra=()):
+    """root 以下の Empty を同名ボーンに置き換えたアーマチュアを作る
+
+    extra: ランタイムが名前で参照するメッシュ（まばたき・表示切替など）。
+           オブジェクト原点に同名ボーンを追加し、親 Empty のボーンにぶら下げる。
+    """
+    joints = [o for o in _walk(root) if o.type == 'EMPTY']
+    heads = {o.name: world_matrix(o).translation.copy() for o in (*joints, *extra)}
+
+    arm = bpy.data.armatures.new(name)
+    arm.display_type = 'STICK'
+    arm_obj = bpy.data.objects.new(name, arm)
+    bpy.context.collection.objects.link(arm_obj)
+    bpy.context.view_layer.objects.active = arm_obj
+    bpy.ops.object.mode_set(mode='EDIT')
+    for o in (*joints, *extra):
+        b = arm.edit_bones.new(o.name)
+        b.head = heads[o.name]
+        b.tail = heads[o.name] + Vector((0, 0, BONE_LEN))
+        b.roll = 0.0
+    for o in (*joints, *extra):
+        if o.parent is not None and o.parent.name in arm.edit_bones:
+            arm.edit_bones[o.name].parent = arm.edit_bones[o.parent.name]
+    bpy.ops.object.mode_set(mode='OBJECT')
+    return arm_obj
+
+
+def owner_bone(obj, bones):
+    """obj を動かすボーン名（自身がボーンならそれ、無ければ最も近い親）"""
+    o = obj
+    while o is not None:
+        if o.name in bones:
+            return o.name
+        o = o.parent
+    return None
+
+
+def set_rigid_weights(obj, bone):
+    """全頂点を bone の頂点グループにウェイト 1.0 で登録"""
+    vg = obj.vertex_groups.get(bone) or obj.vertex_groups.new(name=bone)
+    vg.add(range(len(obj.data.vertices)), 1.0, 'REPLACE')
+    return vg
+
+
+def bind(obj, arm_obj):
+    """オブジェクトをアーマチュアの子にして Armature モディファイアを付ける"""
+    mw = world_matrix(obj)
+    obj.parent = arm_obj
+    obj.matrix_parent_inverse = world_matrix(arm_obj).inverted()
+    obj.matrix_basis = mw
+    mod = obj.modifiers.new('Armature', 'ARMATURE')
+    mod.object = arm_obj
+    return mod
+
+
+def merge_by_material(parts, arm_obj, prefix):
+    """パーツをマテリアルごとに 1 メッシュへ結合し、剛体ウェイトで arm_obj に束縛
+
+    頂点はワールド座標に焼き込み、各パーツの頂点には持ち主ボーンへ 1.0 を書く。
+    戻り値: 結合後オブジェクトのリスト（マテリアル名順）
+    """
+    bones = arm_obj.data.bones
+    groups = {}
+    for o in parts:
+        groups.setdefault(o.active_material.name, []).append(o)
+
+    merged = []
+    for mat_name in sorted(groups):
+        owners = [owner_bone(o, bones) for o in groups[mat_name]]
+        names = list(dict.fromkeys(owners))
+        bm = bmesh.new()
+        for o, b in zip(groups[mat_name], owners):
+            start, fstart = len(bm.verts), len(bm.faces)
+            bm.from_mesh(o.data)      # 既存の bmesh に追記される
+            dl = bm.verts.layers.deform.verify()
+            bm.verts.ensure_lookup_table()
+            new = bm.verts[start:]
+            mw = world_matrix(o)
+            bmesh.ops.transform(bm, matrix=mw, verts=new)
+            if mw.determinant() < 0:  # X 反転で共有しているパーツは面の向きを戻す
+                bm.faces.ensure_lookup_table()
+                bmesh.ops.reverse_faces(bm, faces=bm.faces[fstart:])
+            gi = names.index(b)
+            for v in new:
+                v[dl][gi] = 1.0
+
+        me = bpy.data.meshes.new(f'{prefix}{mat_name}')
+        bm.to_mesh(me)
+        bm.free()
+        me.materials.append(bpy.data.materials[mat_name])
+
+        obj = bpy.data.objects.new(me.name, me)
+        bpy.context.collection.objects.link(obj)
+        for n in names:
+            obj.vertex_groups.new(name=n)
+        bind(obj, arm_obj)
+        merged.append(obj)
+    return merged
+
+
+def _walk(o):
+    yield o
+    for c in o.children:
+        yield from _walk(c)
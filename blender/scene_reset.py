@@ -0,0 +1,37 @@
+"""
+scene_reset.py — ビルド前のシーンを空の factory 状態に戻す（3 スクリプト共通）
+
+select_all + object.delete はオブジェクトしか消さず、メッシュ・マテリアル・Action・
+画像が孤立データとして bpy.data に残る（再ビルドで Suit.001 のような連番が付く）。
+所要時間も起動ファイルの中身に比例する。ここでは
+
+  1. read_homefile(use_factory_startup, use_empty) でユーザーの startup.blend を
+     使わない空のシーンにする（プリファレンス・有効なアドオンはそのまま）
+  2. orphans_purge(do_recursive) で残った孤立データを依存先まで消す
+  3. CONTENT の各コレクションが空であることを確かめる
+
+同じ Blender プロセスでビルドを繰り返す（--compare / --bench、常駐ワーカー）ときに
+前回のデータが混ざらないようにするためのもの。reset() の後は、それ以前に取った
+bpy のオブジェクト参照は無効になる。
+"""
+import bpy
+
+# 空であるべき bpy.data のコレクション（シーン・ワークスペース・画面などは除く）
+CONTENT = ('objects', 'meshes', 'materials', 'armatures', 'actions', 'collections',
+           'images', 'textures', 'node_groups', 'curves', 'cameras', 'lights',
+           'shape_keys', 'libraries')
+
+
+def leftovers():
+    """{コレクション名: 残っているデータブロック数}（空なら {}）"""
+    return {k: len(getattr(bpy.data, k)) for k in CONTENT if len(getattr(bpy.data, k))}
+
+
+def reset(check=True):
+    """空の factory 状態にして孤立データを消す。check なら空でなければ RuntimeError"""
+    bpy.ops.wm.read_homefile(use_factory_startup=True, use_empty=True)
+    bpy.data.orphans_purge(do_local_ids=True, do_linked_ids=True, do_recursive=True)
+    if check:
+        left = leftovers()
+        if left:
+            raise RuntimeError(f'scene not empty after reset: {left}')
@@ -0,0 +1,190 @@
+"""
+watch.py — ソースを監視してインクリメンタルに再ビルドし、ブラウザの GLB を差し替える
+（bpy 不要・素の Python で実行）
+
+マニフェストに挙がったスクリプトと deps（補助モジュール・パレット・元 GLB）の
+mtime を監視し、変わったファイルを入力に持つジョブだけ build.build_all で
+作り直す。ステージのキーが変わった段だけ実行されるので、PALETTE の変更なら
+glb ステージ、zShldr のような寸法なら mesh ステージから。public/ の出力が
+更新されたら WebSocket（既定 ws://localhost:35729）で
+
+  {"type": "reload", "models": ["kyuroku"], "seconds": 0.84}
+
+を送り、scene.js（localhost で開いたとき）がページを再読み込みせずに
+モデルだけ読み直す。--worker を付けると常駐 Blender（worker.py）で実行する。
+
+使い方:
+  python blender/watch.py                        # public/ に出す既定バリアント全部
+  python blender/watch.py kyuroku --worker localhost:8765
+  npx wrangler pages dev public                  # 別端末でページを配信
+"""
+import argparse
+import base64
+import hashlib
+import json
+import os
+import socket
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import build
+
+PORT = 35729            # livereload と同じ番号
+POLL = 0.3              # mtime を見る間隔（秒）
+SETTLE = 0.2            # 保存が落ち着くまで待つ時間（エディタの一時ファイル対策）
+WS_GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+
+
+# ──────────────────────────────────────────────────────────────────────
+# WebSocket（通知を送るだけ。受信はクローズの検出のみ）
+# ──────────────────────────────────────────────────────────────────────
+class Notifier:
+    def __init__(self, port=PORT, host='127.0.0.1'):
+        self.clients = set()
+        self.lock = threading.Lock()
+        self.srv = socket.create_server((host, port))
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def _accept(self):
+        while True:
+            conn, _ = self.srv.accept()
+            threading.Thread(target=self._handshake, args=(conn,), daemon=True).start()
+
+    def _handshake(self, conn):
+        try:
+            head = b''
+            while b'\r\n\r\n' not in head:
+                chunk = conn.recv(1024)
+                if not chunk:
+                    raise ConnectionError
+                head += chunk
+            lines = head.decode('latin-1').split('\r\n')
+            hdr = {k.strip().lower(): v.strip()
+                   for k, _, v in (l.partition(':') for l in lines[1:] if ':' in l)}
+            accept = base64.b64encode(hashlib.sha1(
+                (hdr['sec-websocket-key'] + WS_GUID).encode()).digest()).decode()
+            conn.sendall(('HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\n'
+                          'Connection: Upgrade\r\n'
+                          f'Sec-WebSocket-Accept: {accept}\r\n\r\n').encode())
+        except (OSError, KeyError, ConnectionError):
+            conn.close()
+            return
+        with self.lock:
+            self.clients.add(conn)
+        try:
+            while conn.recv(1024):      # ブラウザからのフレーム（close など）は読み捨て
+                pass
+        except OSError:
+            pass
+        with self.lock:
+            self.clients.discard(conn)
+        conn.close()
+
+    def send(self, msg):
+        """全クライアントにテキストフレームを送る。送れた数を返す"""
+        data = json.dumps(msg).encode()
+        n = len(data)
+        if n < 126:
+            head = bytes([0x81, n])
+        elif n < 1 << 16:
+            head = bytes([0x81, 126]) + n.to_bytes(2, 'big')
+        else:
+            head = bytes([0x81, 127]) + n.to_bytes(8, 'big')
+        with self.lock:
+            for c in list(self.clients):
+                try:
+                    c.sendall(head + data)
+                except OSError:
+                    self.clients.discard(c)
+            return len(self.clients)
+
+
+# ──────────────────────────────────────────────────────────────────────
+# 監視
+# ──────────────────────────────────────────────────────────────────────
+def default_jobs(jobs):
+    """ブラウザが読む既定バリアント（出力が public/ にある 'asset:'）"""
+    return [j for j, a in jobs.items() if j.endswith(':') and a.out.startswith('public/')]
+
+
+def inputs(asset):
+    """ジョブの入力ファイル（スクリプト + 全ステージの deps、絶対パス）"""
+    files = [os.path.join(build.HERE, asset.script)]
+    files += [os.path.join(build.ROOT, d) for st in asset.stages for d in st.deps]
+    return files
+
+
+def snapshot(files):
+    return {f: os.path.getmtime(f) if os.path.exists(f) else None for f in files}
+
+
+def rebuild(jobs, names, notifier, blender=None, addrs=()):
+    """names を作り直し、public/ で中身が変わった出力を通知する"""
+    outs = {j: os.path.join(build.ROOT, jobs[j].out) for j in names}
+    before = snapshot(outs.values())
+    t0 = time.perf_counter()
+    try:
+        results, _ = build.build_all(jobs, names, blender, False, 0, addrs)
+    except SyntaxError as e:        # 保存途中のファイル。次の保存で再試行
+        print(f'[watch] {e.filename}:{e.lineno}: {e.msg}')
+        return
+    wall = time.perf_counter() - t0
+    build.print_summary(results)
+    after = snapshot(outs.values())
+    models = [os.path.splitext(os.path.basename(outs[r['job']]))[0] for r in results
+              if r['ok'] and jobs[r['job']].out.startswith('public/models/')
+              and after[outs[r['job']]] != before[outs[r['job']]]]
+    sent = notifier.send({'type': 'reload', 'models': models,
+                          'seconds': round(wall, 3)}) if models else 0
+    failed = [r['job'] for r in results if not r['ok']]
+    print(f'[watch] {len(results) - len(failed)}/{len(results)} ok in {wall:.2f}s'
+          + (f'  reload {", ".join(models)} → {sent} client(s)' if models else ''))
+
+
+def watch(jobs, names, notifier, blender=None, addrs=()):
+    files = {j: inputs(jobs[j]) for j in names}
+    seen = snapshot({f for fs in files.values() for f in fs})
+    print(f'[watch] {len(seen)} files, jobs: {", ".join(names)}  (Ctrl-C で終了)')
+    while True:
+        time.sleep(POLL)
+        now = snapshot(seen)
+        if now == seen:
+            continue
+        time.sleep(SETTLE)
+        now = snapshot(seen)
+        changed = {f for f in now if now[f] != seen[f]}
+        seen = now
+        hit = [j for j in names if changed & set(files[j])]
+        print(f'[watch] changed: {", ".join(os.path.relpath(f, build.ROOT) for f in sorted(changed))}')
+        rebuild(jobs, hit, notifier, blender, addrs)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(prog='watch.py')
+    ap.add_argument('assets', nargs='*', metavar='ASSET[:VARIANT]')
+    ap.add_argument('--manifest', default=build.MANIFEST)
+    ap.add_argument('--blender')
+    ap.add_argument('--worker', action='append', default=[], metavar='HOST:PORT',
+                    help='常駐ワーカー（blender/worker.py）で実行（複数指定可）')
+    ap.add_argument('--port', type=int, default=PORT, help='WebSocket のポート')
+    args = ap.parse_args(argv)
+    jobs = build.load_manifest(args.manifest)
+    try:
+        names = build.select_jobs(jobs, args.assets) if args.assets else default_jobs(jobs)
+    except KeyError as e:
+        ap.error(f'unknown asset: {e.args[0]} (choose from {", ".join(jobs)})')
+    blender = None if args.worker else build.find_blender(args.blender)
+    notifier = Notifier(args.port)
+    print(f'[watch] live reload on ws://localhost:{args.port}')
+    # 起動時点で古いものがあれば先に揃える
+    rebuild(jobs, names, notifier, blender, args.worker)
+    try:
+        watch(jobs, names, notifier, blender, args.worker)
+    except KeyboardInterrupt:
+        return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
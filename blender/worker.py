@@ -0,0 +1,172 @@
+"""
+worker.py — 常駐するヘッドレス Blender。ビルドスクリプトをプロセス内で繰り返し実行する
+
+`blender --background --python X.py` は毎回 Blender の起動と Python の初期化を
+払い、小さなステージではそちらの方が長い。このスクリプトを 1 度起動しておくと
+localhost の TCP ポートで JSON のジョブを待ち受け、build_kyuroku / animate_bug /
+create_r4_character の main() を同じプロセスで実行する。
+
+  - ジョブの前に scene_reset.reset() で空の factory 状態にする
+  - blender/ 内で更新された .py は importlib.reload してから実行する
+    （寸法定数・パレット・anim_library のクリップを変えても再起動は不要）
+  - スクリプトの print は log に書き、応答は終了コード・所要時間・成果物
+
+起動:
+  blender --background --factory-startup --python blender/worker.py -- --port 8765
+
+プロトコル（1 接続 = 1 リクエスト、JSON 1 行 → JSON 1 行）:
+  {"script": "build_kyuroku.py", "argv": ["--stage", "glb", "--load", "a.blend", "--out", "b.glb"],
+   "log": "b.log"}
+    → {"ok": true, "exit_code": 0, "seconds": 0.41, "artifacts": ["b.glb"], "reloaded": [...]}
+  {"cmd": "ping"} → {"ok": true, "jobs": 件数, "uptime": 秒}
+  {"cmd": "quit"} → {"ok": true}（応答後に終了）
+
+build.py --worker localhost:8765 でステージの実行先にできる（クライアントは
+build.worker_call）。
+"""
+import argparse
+import contextlib
+import importlib
+import json
+import os
+import socket
+import sys
+import time
+import traceback
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, HERE)
+import scene_reset
+
+SCRIPTS = ('build_kyuroku.py', 'animate_bug.py', 'create_r4_character.py')
+OUTPUT_FLAGS = ('--out', '--save')
+
+
+class Worker:
+    def __init__(self):
+        self.t0 = time.perf_counter()
+        self.jobs = 0
+        self.mtimes = {}        # モジュール名 → 読み込んだ（reload した）時点の mtime
+        self.track(time.time())
+
+    # ── モジュールの再読み込み ──────────────────────────────────────────
+    def _local_modules(self):
+        """blender/ の .py から読み込んだモジュール（worker.py 自身 = __main__ は除く）"""
+        for name, mod in list(sys.modules.items()):
+            path = getattr(mod, '__file__', None) or ''
+            if name == '__main__' or os.path.abspath(path) == os.path.abspath(__file__):
+                continue
+            if os.path.dirname(os.path.abspath(path)) == HERE and path.endswith('.py'):
+                yield name, mod, path
+
+    def track(self, since):
+        """まだ記録していない（ジョブ中に初めて import された）モジュールの mtime を記録
+
+        import 後に保存されたかどうかは分からないので、since（ジョブ開始時刻）より
+        新しいものは since を入れておき、次の refresh で reload させる
+        """
+        for name, mod, path in self._local_modules():
+            if name not in self.mtimes:
+                self.mtimes[name] = min(os.path.getmtime(path), since)
+
+    def refresh(self):
+        """前回から更新された補助モジュール（glb / anim_library など）を reload
+
+        スクリプトの `import glb` は同じモジュールオブジェクトを指すので、
+        reload した中身がそのまま使われる。reload した名前のリストを返す。
+        """
+        changed = []
+        for name, mod, path in self._local_modules():
+            if name + '.py' in SCRIPTS:
+                continue
+            m = os.path.getmtime(path)
+            if name in self.mtimes and self.mtimes[name] != m:
+                changed.append((name, mod))
+                self.mtimes[name] = m
+        for name, mod in sorted(changed):
+            importlib.reload(mod)
+        return [name for name, _ in sorted(changed)]
+
+    def script(self, filename):
+        """ビルドスクリプトのモジュール。ジョブごとに読み直す
+
+        build() が書き換えるモジュール変数（DETAIL・BACKEND など）は argparse の
+        既定値にもなるので、前のジョブの値を持ち越さないよう毎回 reload する。
+        """
+        if filename not in SCRIPTS:
+            raise ValueError(f'unknown script: {filename}')
+        name = filename[:-3]
+        if name in sys.modules:
+            return importlib.reload(sys.modules[name])
+        return importlib.import_module(name)
+
+    # ── ジョブ ──────────────────────────────────────────────────────────
+    def run(self, req):
+        reloaded = self.refresh()           # スクリプトより先に補助モジュールを読み直す
+        argv = [str(a) for a in req.get('argv', [])]
+        log = req.get('log') or os.devnull
+        t0, since = time.perf_counter(), time.time()
+        code = 0
+        with open(log, 'w') as f, contextlib.redirect_stdout(f), contextlib.redirect_stderr(f):
+            try:
+                mod = self.script(req['script'])
+                scene_reset.reset()
+                sys.argv = [sys.argv[0], '--', *argv]
+                mod.main()
+            except SystemExit as e:
+                code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+            except Exception:
+                traceback.print_exc()
+                code = 1
+        self.track(since)
+        self.jobs += 1
+        outs = [argv[i + 1] for i, a in enumerate(argv[:-1]) if a in OUTPUT_FLAGS]
+        return {'ok': code == 0, 'exit_code': code,
+                'seconds': round(time.perf_counter() - t0, 3),
+                'artifacts': [p for p in outs if os.path.exists(p)], 'reloaded': reloaded}
+
+    def handle(self, req):
+        cmd = req.get('cmd', 'run')
+        if cmd == 'ping':
+            return {'ok': True, 'jobs': self.jobs,
+                    'uptime': round(time.perf_counter() - self.t0, 1)}
+        if cmd == 'quit':
+            return {'ok': True}
+        if cmd == 'run':
+            return self.run(req)
+        return {'ok': False, 'error': f'unknown cmd: {cmd}'}
+
+
+def serve(port, host='127.0.0.1'):
+    w = Worker()
+    with socket.create_server((host, port)) as srv:
+        print(f'[worker] listening on {host}:{port}', flush=True)
+        while True:
+            conn, _ = srv.accept()
+            with conn, conn.makefile('rwb') as f:
+                try:
+                    req = json.loads(f.readline())
+                    res = w.handle(req)
+                except Exception as e:      # 壊れたリクエストでも常駐は続ける
+                    req, res = {}, {'ok': False, 'error': repr(e)}
+                f.write(json.dumps(res).encode() + b'\n')
+                f.flush()
+            if req.get('cmd', 'run') == 'run':
+                print(f"[worker] {req.get('script')} {' '.join(req.get('argv', [])[:2])} "
+                      f"→ exit {res.get('exit_code', 1)} {res.get('seconds', 0)}s", flush=True)
+            if req.get('cmd') == 'quit':
+                return
+
+
+def main():
+    ap = argparse.ArgumentParser(prog='worker.py')
+    ap.add_argument('--port', type=int, default=8765)
+    ap.add_argument('--host', default='127.0.0.1')
+    args = ap.parse_args(sys.argv[sys.argv.index('--') + 1:] if '--' in sys.argv else [])
+    os.chdir(ROOT)          # build.py の子プロセスと同じくルート相対のパスを解決する
+    serve(args.port, args.host)
+
+
+if __name__ == '__main__':
+    main()
@@ -310,6 +310,8 @@ function speak(text) {
     utter.onstart = () => setCharState('talking');
     utter.onend   = () => setCharState('idle');
     utter.onerror = () => setCharState('idle');
+    // 単語/文の区切りごとに口を開く（kyuroku の Mouth モーフ）
+    utter.onboundary = () => window.kyurokuScene?.setMouth(1);
 
     // iOS Safari: 途中停止バグ対策
     if (isIOS()) {
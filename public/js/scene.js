@@ -7,90 +7,41 @@
 'use strict';
 import * as THREE from 'three';
 import { GLTFLoader } from 'three/addons/loaders/GLTFLoader.js';
-
-// ── フォームカラー ───────────────────────────────────────────────────
-const FC = {
-    castoff: {
-        Suit: 0x0c1828, Armor: 0x1e4e96, Trim: 0xc8a030,
-        Visor: 0x88ccff, visorEmi: 0x2266bb,
-        EmbA: 0xdd2222, EmbB: 0x2244cc,
-        Eye: 0x44aaff, eyeEmi: 0x2288ff,
-        showFace: true,
-        ambient: 0x1a3060, fog: 0x060e1e, embPt: 0xdd2222, eyePt: 0x2288ff,
-    },
-    caston: {
-        Suit: 0x182840, Armor: 0x2a5a9e, Trim: 0x4a8ae0,
-        Visor: 0xe8851a, visorEmi: 0xcc5500,
-        EmbA: 0x2255bb, EmbB: 0x4488ff,
-        Eye: 0xe8851a, eyeEmi: 0xcc5500,
-        showFace: false,
-        ambient: 0x101840, fog: 0x060e18, embPt: 0x4488ff, eyePt: 0xcc5500,
-    },
-    aqua: {
-        Suit: 0x0a1e38, Armor: 0x38b0cc, Trim: 0xeecc00,
-        Visor: 0xaaeeff, visorEmi: 0x44ccee,
-        EmbA: 0xdd2222, EmbB: 0x2244aa,
-        Eye: 0x66eeff, eyeEmi: 0x33ccee,
-        showFace: true,
-        ambient: 0x004050, fog: 0x02080c, embPt: 0xdd2222, eyePt: 0x33ccee,
-    },
-    heat: {
-        Suit: 0x180808, Armor: 0xcc2200, Trim: 0xd4a820,
-        Visor: 0x88ccff, visorEmi: 0x2266aa,
-        EmbA: 0x4488ff, EmbB: 0x2255dd,
-        Eye: 0x4499ff, eyeEmi: 0x2266ee,
-        showFace: true,
-        ambient: 0x401010, fog: 0x120404, embPt: 0x4488ff, eyePt: 0x2266ee,
-    },
-    marine: {
-        Suit: 0x0a1020, Armor: 0xe05020, Trim: 0x20ff40,
-        Visor: 0x88ccff, visorEmi: 0x2266aa,
-        EmbA: 0xee6600, EmbB: 0xcc4400,
-        Eye: 0x20ff40, eyeEmi: 0x10cc30,
-        showFace: true,
-        ambient: 0x402010, fog: 0x120804, embPt: 0xee6600, eyePt: 0x10cc30,
-    },
-    sight: {
-        Suit: 0x081808, Armor: 0x22aa44, Trim: 0xddeedd,
-        Visor: 0xaaffaa, visorEmi: 0x44cc66,
-        EmbA: 0xdd2222, EmbB: 0x2244aa,
-        Eye: 0x44ff66, eyeEmi: 0x22cc44,
-        showFace: true,
-        ambient: 0x104010, fog: 0x040c04, embPt: 0xdd2222, eyePt: 0x22cc44,
-    },
-    bug: {
-        Suit: 0x060e22, Armor: 0x0e1e44, Trim: 0x00ddff,
-        Visor: 0x00aaff, visorEmi: 0x0088dd,
-        EmbA: 0xffcc00, EmbB: 0xeeaa00,
-        Eye: 0x00ffee, eyeEmi: 0x00ddcc,
-        showFace: true,
-        ambient: 0x080840, fog: 0x020210, embPt: 0xffcc00, eyePt: 0x00ddcc,
-    },
-};
-
-// Biped ボーン名 → 抽象関節名 マッピング
-const BIPED_MAP = {
-    Head:      'Bip Head_031',
-    Spine:     'Bip Spine1_010',
-    ThighL:    'Bip L Thigh_03',
-    ThighR:    'Bip R Thigh_06',
-    ShinL:     'Bip L Calf_04',
-    ShinR:     'Bip R Calf_07',
-    FootL:     'Bip L Foot_05',
-    FootR:     'Bip R Foot_08',
-    UpperArmL: 'Bip L UpperArm_012',
-    UpperArmR: 'Bip R UpperArm_035',
-    LowerArmL: 'Bip L Forearm_013',
-    LowerArmR: 'Bip R Forearm_036',
-    HandL:     'Bip L Hand_014',
-    HandR:     'Bip R Hand_037',
-};
-
-const KYUROKU_JOINTS = [
-    'Head','Spine',
-    'UpperArmL','UpperArmR','LowerArmL','LowerArmR','HandL','HandR',
-    'ThighL','ThighR','ShinL','ShinR','FootL','FootR',
+import { MeshoptDecoder } from 'three/addons/libs/meshopt_decoder.module.js';
+
+// ── フォーム環境色 ───────────────────────────────────────────────────
+// kyuroku のフォーム配色は kyuroku.glb の KHR_materials_variants に入っている
+// （blender/form_variants.py）。ライト・フォグ色は variant.extras から読む。
+// バグフォームは別 GLB なのでここに残す。
+const BUG_ENV = { ambient: 0x080840, fog: 0x020210, embPt: 0xffcc00, eyePt: 0x00ddcc };
+const DEFAULT_ENV = { ambient: 0x1a3060, fog: 0x060e1e, embPt: 0xdd2222, eyePt: 0x2288ff, showFace: true };
+// bug のまぶたのボーン（Blink クリップが無い GLB ではこれをスケールして瞬きする）
+const BUG_EYELIDS = ['Bone Eyelid_L_032', 'Bone Eyelid_R_033'];
+
+// ── LOD ─────────────────────────────────────────────────────────────
+// blender/build.py が書き出す段階別 GLB（*_lod1 / *_lod2）。カメラは固定なので
+// キャラクターの画面上の高さ（デバイスピクセル）で段階を選ぶ。配置済みの段階は
+// build.py が LOD_INDEX に書くので、無い GLB は取りに行かない（404 を出さない）。
+const CHAR_H = 1.88;
+const LOD_LEVELS = [
+    { suffix: '',      minPx: 700 },
+    { suffix: '_lod1', minPx: 400 },
+    { suffix: '_lod2', minPx: 0   },
 ];
+const LOD_INDEX = '/models/lods.json';   // { GLB 名: [接尾辞, ...] }
+
+// ── ライブリロード（開発時のみ） ───────────────────────────────────
+// blender/watch.py が再ビルドした GLB の名前を WebSocket で送ってくる。
+// localhost で開いたときだけ繋ぎ、ページを再読み込みせずにモデルだけ差し替える。
+const LIVE_PORT = 35729;
+const LIVE = ['localhost', '127.0.0.1'].includes(location.hostname);
+
+// 状態 → クリップ名（kyuroku.glb / bug_animated.glb 共通）
+// どちらのクリップも blender/anim_library.py の共通クリップをリターゲットしたもの
+const STATE_CLIPS = { idle:'Idle', running:'Run', talking:'Talk', listening:'Listen', thinking:'Think' };
+// running は Walk / Jog / Run の 1D ブレンド。各クリップの速度（m/s）は glb_meta が
+// scene extras の clips[].speed に書く。速度の指定が無ければ Run の速度で走る。
+const LOCO_FADE = 0.3;
 
 // =====================================================================
 class KyurokuScene {
@@ -99,30 +50,35 @@ class KyurokuScene {
         this.clock      = new THREE.Clock();
         this.state      = 'idle';
         this.form       = 'castoff';
-        this.runPhase   = 0;
         this.blinkTimer = 4 + Math.random() * 3;
-        this.isBlinking = false;
-        this.blinkT     = 0;
+        this.blinkT     = null;   // まぶたのボーンで瞬き中の位相（Blink クリップが無い GLB 用）
 
         // モデル参照
         this.kyurokuModel = null;
         this.bugModel     = null;
         this.model        = null;   // アクティブモデル
 
-        // ジョイント・マテリアルキャッシュ（フォームで切り替え）
-        this.J      = {};   // 抽象関節名 → Object3D
+        // マテリアルキャッシュ（フォームで切り替え）
         this.matMap = {};   // マテリアル名 → THREE.Material
 
-        this.kyurokuJ    = {};
         this.kyurokuMats = {};
-        this.bugJ        = {};
+        this.formEnv     = {};   // フォーム名 → 環境色（variant.extras）
+        this.formIndex   = {};   // フォーム名 → variant インデックス
+        this.variantMeshes = []; // [{ mesh, mats: {variant: Material} }]
         this.bugMat      = null;   // bug単一マテリアル
-        this.baseY       = { kyuroku: 0, bug: 0 };  // floor Y
+        this.bugLids     = [];     // bug のまぶたのボーン（BUG_EYELIDS）
+        this.anim        = {};     // 'kyuroku' | 'bug' → { mixer, clips, current, loco, locoOn }
+        this.speed       = null;   // 移動速度（m/s）。null = Run の速度
+        this.mouth       = null;   // kyuroku の Mouth メッシュ（モーフ Open / A / I / U / E / O）
+        this.lip         = { target: 0, value: 0, viseme: 'Open' };
+        this.urls        = {};     // 'kyuroku' | 'bug_animated' → 読み込んだ URL（LOD 込み）
+        this.liveUp      = false;  // blender/watch.py に繋がったことがあるか
 
         this._initRenderer();
         this._initScene();
         this._loadGLBs();
         this._startLoop();
+        if (LIVE) this._connectLive();
     }
 
     // ── レンダラー ─────────────────────────────────────────────────────
@@ -211,9 +167,45 @@ class KyurokuScene {
     // ================================================================
     // GLB ロード（2モデル並行）
     // ================================================================
-    _loadGLBs() {
-        const loader = new GLTFLoader();
+    // キャラクターの画面上の高さ → LOD 段階（LOD_LEVELS の番号）。低スペック端末は 1 段下げる
+    _pickLOD() {
+        const h = this.canvas.offsetHeight || window.innerHeight;
+        const frac = CHAR_H / (2 * this.camera.position.z * Math.tan(THREE.MathUtils.degToRad(this.camera.fov / 2)));
+        const px = frac * h * this.renderer.getPixelRatio();
+        let i = LOD_LEVELS.findIndex(l => px >= l.minPx);
+        const lowEnd = (navigator.deviceMemory ?? 8) <= 2 || (navigator.hardwareConcurrency ?? 8) <= 4;
+        if (lowEnd) i = Math.min(i + 1, LOD_LEVELS.length - 1);
+        return i;
+    }
+
+    // 段階 level の接尾辞。その GLB に無ければ 1 段ずつ詳細側へ、最後はフル版
+    _lodSuffix(base, level, lods) {
+        const have = lods[base] ?? [];
+        for (let i = level; i > 0; i--) {
+            if (have.includes(LOD_LEVELS[i].suffix)) return LOD_LEVELS[i].suffix;
+        }
+        return '';
+    }
+
+    // LOD 版の読み込みに失敗したらフル版にフォールバック（LOD_INDEX と配置がずれたとき）
+    _loadModel(loader, base, suffix, onLoad, onProgress, onError) {
+        const url = `/models/${base}${suffix}.glb`;
+        loader.load(url, gltf => { this.urls[base] = url; onLoad(gltf); }, onProgress, e => {
+            if (!suffix) return onError(e);
+            console.warn(`${url} not found, falling back to ${base}.glb`);
+            this._loadModel(loader, base, '', onLoad, onProgress, onError);
+        });
+    }
+
+    async _loadGLBs() {
+        // GLB は blender/glb_optimize.py で量子化 + EXT_meshopt_compression 済み
+        const loader = new GLTFLoader().setMeshoptDecoder(MeshoptDecoder);
+        const level = this._pickLOD();
         this._showLoading(true);
+        // 一覧が無い・読めないときは LOD 無し（フル版だけ）として扱う
+        const lods = level === 0 ? {} : await fetch(LOD_INDEX)
+            .then(r => r.ok ? r.json() : {})
+            .catch(() => ({}));
         let count = 0;
         const done = () => {
             if (++count >= 2) {
@@ -222,91 +214,159 @@ class KyurokuScene {
             }
         };
 
-        loader.load('/models/kyuroku.glb',
-            gltf => { this._onKyurokuLoaded(gltf); done(); },
+        this._loadModel(loader, 'kyuroku', this._lodSuffix('kyuroku', level, lods),
+            gltf => { this._onKyurokuLoaded(gltf).then(done, e => { console.error(e); done(); }); },
             p    => { if (p.lengthComputable) this._setLoadingText(`${Math.round(p.loaded/p.total*100)}%`); },
             e    => { console.error('kyuroku GLB error:', e); done(); }
         );
 
-        loader.load('/models/bug_animated.glb',
-            gltf => { this._onBugLoaded(gltf); done(); },
+        this._loadModel(loader, 'bug_animated', this._lodSuffix('bug_animated', level, lods),
+            gltf => { this._onBugLoaded(gltf).then(done, e => { console.error(e); done(); }); },
             null,
             e    => { console.error('bug GLB error:', e); done(); }
         );
     }
 
     // ── kyuroku.glb ロード完了 ──────────────────────────────────────
-    _onKyurokuLoaded(gltf) {
+    // 床の高さ・マテリアルの番号は blender/glb_meta.py が
+    // シーンの extras（= gltf.scene.userData）に書いている。無い GLB は走査で求める
+    async _onKyurokuLoaded(gltf) {
         const m = gltf.scene;
+        const meta = m.userData;
         m.rotation.y = Math.PI;  // Blender +Y → glTF -Z → 180°補正
-        const box = new THREE.Box3().setFromObject(m);
-        m.position.y = -box.min.y;
-        this.baseY.kyuroku = m.position.y;
+        m.position.y = meta.groundOffset ?? -new THREE.Box3().setFromObject(m).min.y;
         m.traverse(o => { if (o.isMesh) o.castShadow = true; });
         m.visible = (this.form !== 'bug');
         this.scene.add(m);
         this.kyurokuModel = m;
 
         // マテリアルキャッシュ
-        m.traverse(o => {
-            if (o.isMesh && o.material) {
-                (Array.isArray(o.material) ? o.material : [o.material])
-                    .forEach(mat => { if (mat.name) this.kyurokuMats[mat.name] = mat; });
-            }
-        });
+        if (meta.materials) {
+            await Promise.all(Object.entries(meta.materials).map(([name, i]) =>
+                gltf.parser.getDependency('material', i).then(mat => { this.kyurokuMats[name] = mat; })));
+        } else {
+            m.traverse(o => {
+                if (o.isMesh && o.material) {
+                    (Array.isArray(o.material) ? o.material : [o.material])
+                        .forEach(mat => { if (mat.name) this.kyurokuMats[mat.name] = mat; });
+                }
+            });
+        }
+        await this._loadFormVariants(gltf);
 
-        // 関節キャッシュ
-        KYUROKU_JOINTS.forEach(name => {
-            const obj = m.getObjectByName(name);
-            if (obj) this.kyurokuJ[name] = obj;
-            else console.warn(`kyuroku joint not found: ${name}`);
-        });
+        // 口のモーフターゲット（blender/face_morphs.py）。リップシンクで重みを 1 つ書く
+        const mouth = m.getObjectByName('Mouth');
+        if (mouth?.morphTargetDictionary) this.mouth = mouth;
 
-        console.log('kyuroku loaded. Joints:', Object.keys(this.kyurokuJ));
+        const clips = this._initMixer('kyuroku', gltf);
+        console.log('kyuroku loaded. Clips:', Object.keys(clips));
     }
 
     // ── bug GLB ロード完了 ──────────────────────────────────────────
-    _onBugLoaded(gltf) {
+    async _onBugLoaded(gltf) {
         const m = gltf.scene;
+        const meta = m.userData;
 
         // Blender製GLBはSkinnedMeshの頂点がZ=-80にあり
         // Box3.setFromObjectは幾何頂点ベースのため使えない。
         // → ボーン（Bip*/Bone*ノード）のglTF-Y位置でキャラクター高さを計算する
-        m.updateMatrixWorld(true);
-        let minBoneY = Infinity, maxBoneY = -Infinity;
-        m.traverse(o => {
-            if (o.name && (o.name.startsWith('Bip') || o.name.startsWith('Bone'))) {
-                const wp = new THREE.Vector3();
-                o.getWorldPosition(wp);
-                if (wp.y < minBoneY) minBoneY = wp.y;
-                if (wp.y > maxBoneY) maxBoneY = wp.y;
-            }
-        });
-        const charH = maxBoneY - minBoneY;
+        //   （glb_meta.py が書き出し時に同じ値を extras に入れている）
+        let charH = meta.height, minBoneY = -meta.groundOffset;
+        if (charH === undefined) {
+            m.updateMatrixWorld(true);
+            let maxBoneY = -Infinity;
+            minBoneY = Infinity;
+            m.traverse(o => {
+                if (o.name && (o.name.startsWith('Bip') || o.name.startsWith('Bone'))) {
+                    const wp = new THREE.Vector3();
+                    o.getWorldPosition(wp);
+                    if (wp.y < minBoneY) minBoneY = wp.y;
+                    if (wp.y > maxBoneY) maxBoneY = wp.y;
+                }
+            });
+            charH = maxBoneY - minBoneY;
+        }
         const scale = (charH > 0.5) ? 1.88 / charH : 1.0;
         m.scale.setScalar(scale);
         m.position.y = -minBoneY * scale;  // 最低ボーンをY=0に
-        this.baseY.bug = m.position.y;
         m.traverse(o => { if (o.isMesh) o.castShadow = true; });
         m.visible = (this.form === 'bug');
         this.scene.add(m);
         this.bugModel = m;
 
         // マテリアル（単一: EXE_Dark）
-        m.traverse(o => {
-            if (o.isMesh && o.material && !this.bugMat) {
-                this.bugMat = Array.isArray(o.material) ? o.material[0] : o.material;
-            }
-        });
+        const matIndex = Object.values(meta.materials ?? {})[0];
+        if (matIndex !== undefined) {
+            this.bugMat = await gltf.parser.getDependency('material', matIndex);
+        } else {
+            m.traverse(o => {
+                if (o.isMesh && o.material && !this.bugMat) {
+                    this.bugMat = Array.isArray(o.material) ? o.material[0] : o.material;
+                }
+            });
+        }
+
+        this.bugLids = BUG_EYELIDS.map(n => m.getObjectByName(n)).filter(Boolean);
 
         // AnimationMixer でアニメーション再生
-        this.bugMixer = new THREE.AnimationMixer(m);
-        this.bugClips = {};
-        gltf.animations.forEach(clip => {
-            this.bugClips[clip.name] = clip;
+        const clips = this._initMixer('bug', gltf);
+        console.log('bug GLB loaded. Clips:', Object.keys(clips));
+    }
+
+    // ── AnimationMixer とクリップ表（kyuroku / bug 共通） ─────────────
+    _initMixer(key, gltf) {
+        const clips = {};
+        gltf.animations.forEach(clip => { clips[clip.name] = clip; });
+        const mixer = new THREE.AnimationMixer(gltf.scene);
+        // 移動クリップ（速度の昇順）。extras に speed が無い古い GLB では空 → Run 単体
+        const loco = (gltf.scene.userData.clips ?? [])
+            .filter(c => c.speed > 0 && clips[c.name])
+            .sort((p, q) => p.speed - q.speed)
+            .map(c => ({ speed: c.speed, action: mixer.clipAction(clips[c.name]) }));
+        this.anim[key] = { mixer, clips, current: null, loco, locoOn: false };
+        this._playClip(key, STATE_CLIPS[this.state] ?? 'Idle');
+        return clips;
+    }
+
+    // ── KHR_materials_variants: フォームごとのマテリアルを先読み ──────
+    async _loadFormVariants(gltf) {
+        const { parser } = gltf;
+        const variants = parser.json.extensions?.KHR_materials_variants?.variants ?? [];
+        variants.forEach((v, i) => {
+            this.formIndex[v.name] = i;
+            const env = { ...DEFAULT_ENV };
+            for (const [k, val] of Object.entries(v.extras ?? {}))
+                env[k] = typeof val === 'string' ? parseInt(val, 16) : val;
+            this.formEnv[v.name] = env;
+        });
+
+        const jobs = [];
+        gltf.scene.traverse(o => {
+            const assoc = o.isMesh && parser.associations.get(o);
+            if (!assoc || assoc.primitives === undefined) return;
+            const prim = parser.json.meshes[assoc.meshes].primitives[assoc.primitives];
+            const maps = prim.extensions?.KHR_materials_variants?.mappings;
+            if (!maps) return;
+            const entry = { mesh: o, mats: {} };
+            this.variantMeshes.push(entry);
+            maps.forEach(mp => jobs.push(
+                parser.getDependency('material', mp.material).then(mat => {
+                    mp.variants.forEach(vi => { entry.mats[vi] = mat; });
+                })
+            ));
+        });
+        await Promise.all(jobs);
+    }
+
+    // マテリアル差し替えのみ（同構成なのでシェーダーは共有）
+    _applyVariant(formKey) {
+        const vi = this.formIndex[formKey] ?? 0;
+        this.variantMeshes.forEach(({ mesh, mats }) => {
+            const mat = mats[vi];
+            if (!mat) return;
+            mesh.material = mat;
+            this.kyurokuMats[mat.name] = mat;
         });
-        this.bugCurrentClip = null;
-        console.log('bug GLB loaded. Clips:', Object.keys(this.bugClips));
     }
 
     // ================================================================
@@ -315,7 +375,7 @@ class KyurokuScene {
     setForm(formKey) {
         this.form = formKey;
         const isBug = formKey === 'bug';
-        const c = FC[formKey] ?? FC.castoff;
+        const c = isBug ? BUG_ENV : (this.formEnv[formKey] ?? DEFAULT_ENV);
 
         // モデル表示切り替え
         if (this.kyurokuModel) this.kyurokuModel.visible = !isBug;
@@ -323,38 +383,22 @@ class KyurokuScene {
 
         // アクティブ参照の更新
         this.model  = isBug ? this.bugModel  : this.kyurokuModel;
-        this.J      = isBug ? this.bugJ      : this.kyurokuJ;
         this.matMap = isBug ? {}             : this.kyurokuMats;
 
         if (isBug) {
-            // バグフォームに切り替えたら Idle アニメを開始
-            this.bugCurrentClip = null;
-            const stateMap = { idle:'Idle', running:'Run', talking:'Talk', listening:'Listen', thinking:'Think' };
-            this._bugPlayClip(stateMap[this.state] ?? 'Idle');
             if (this.bugMat) {
                 this.bugMat.emissiveIntensity = 0.18;
             }
         } else {
-            // kyuroku フォーム: マテリアル色を変える
-            const MAT_KEYS = ['Suit','Armor','Trim','Visor','Eye','EmbA','EmbB'];
-            MAT_KEYS.forEach(k => {
-                const mat = this.matMap[k];
-                if (mat) mat.color.setHex(c[k]);
-            });
-            if (this.matMap['Visor']) {
-                this.matMap['Visor'].emissive.setHex(c.visorEmi);
-                this.matMap['Visor'].emissiveIntensity = 0.8;
-            }
-            if (this.matMap['Eye']) {
-                this.matMap['Eye'].emissive.setHex(c.eyeEmi);
-                this.matMap['Eye'].emissiveIntensity = 1.6;
-            }
-            if (this.matMap['EmbA']) { this.matMap['EmbA'].emissive.setHex(c.EmbA); this.matMap['EmbA'].emissiveIntensity = 1.0; }
-            if (this.matMap['EmbB']) { this.matMap['EmbB'].emissive.setHex(c.EmbB); this.matMap['EmbB'].emissiveIntensity = 1.0; }
+            // kyuroku フォーム: variant のマテリアルに差し替え
+            this._applyVariant(formKey);
 
             ['Face','EyeL','EyeR','Mouth','VisorBar','HairBack','HairSideL','HairSideR'].forEach(n => {
                 const o = this.kyurokuModel?.getObjectByName(n);
-                if (o) o.visible = c.showFace !== false;
+                if (!o) return;
+                // スキンメッシュ版 (--skinned) では同名ボーン → スケール 0 で隠す
+                if (o.isBone) o.scale.setScalar(c.showFace !== false ? 1 : 0);
+                else o.visible = c.showFace !== false;
             });
         }
 
@@ -366,32 +410,133 @@ class KyurokuScene {
         this.eyePt.color.setHex(c.eyePt);
     }
 
+    // ================================================================
+    // ライブリロード（blender/watch.py）
+    // ================================================================
+    _connectLive() {
+        const ws = new WebSocket(`ws://${location.hostname}:${LIVE_PORT}`);
+        ws.onopen = () => { this.liveUp = true; console.log('[live] connected to blender/watch.py'); };
+        ws.onmessage = e => {
+            const msg = JSON.parse(e.data);
+            if (msg.type === 'reload') msg.models.forEach(name => this.reloadModel(name));
+        };
+        // 一度繋がった後は watch.py の再起動に備えて繋ぎ直す（最初から居なければ諦める）
+        ws.onclose = () => { if (this.liveUp) setTimeout(() => this._connectLive(), 2000); };
+    }
+
+    // name: 拡張子なしの GLB 名（'kyuroku' / 'bug_animated_lod1' など）。
+    // 表示中のものだけ読み直す。読み込みが終わるまで古いモデルを出しておく
+    async reloadModel(name) {
+        const base = Object.keys(this.urls).find(b => this.urls[b] === `/models/${name}.glb`);
+        if (!base) return;
+        const key = base === 'kyuroku' ? 'kyuroku' : 'bug';
+        const loader = new GLTFLoader().setMeshoptDecoder(MeshoptDecoder);
+        const gltf = await loader.loadAsync(`/models/${name}.glb?v=${Date.now()}`);
+        this._unloadModel(key);
+        await (key === 'kyuroku' ? this._onKyurokuLoaded(gltf) : this._onBugLoaded(gltf));
+        this.setForm(this.form);
+        console.log(`[live] ${name}.glb reloaded`);
+    }
+
+    // モデル・ミキサー・キャッシュを捨てる（variant のマテリアルは表示中以外も破棄）
+    _unloadModel(key) {
+        const m = key === 'kyuroku' ? this.kyurokuModel : this.bugModel;
+        if (!m) return;
+        const a = this.anim[key];
+        if (a) { a.mixer.stopAllAction(); a.mixer.uncacheRoot(m); }
+        delete this.anim[key];
+        this.scene.remove(m);
+
+        const mats = new Set();
+        m.traverse(o => {
+            if (!o.isMesh) return;
+            o.geometry.dispose();
+            [].concat(o.material).forEach(x => mats.add(x));
+        });
+        if (key === 'kyuroku') {
+            this.variantMeshes.forEach(v => Object.values(v.mats).forEach(x => mats.add(x)));
+            this.kyurokuModel = null;
+            this.kyurokuMats = {};
+            this.formEnv = {}; this.formIndex = {}; this.variantMeshes = [];
+            this.mouth = null;
+        } else {
+            this.bugModel = null;
+            this.bugMat = null; this.bugLids = []; this.blinkT = null;
+        }
+        mats.forEach(x => {
+            Object.values(x).forEach(v => { if (v?.isTexture) v.dispose(); });
+            x.dispose();
+        });
+    }
+
     setState(state) {
         this.state = state;
-        if (this.form === 'bug') {
-            const map = { idle:'Idle', running:'Run', talking:'Talk', listening:'Listen', thinking:'Think' };
-            this._bugPlayClip(map[state] ?? 'Idle');
-        }
+        // 両フォームとも切り替える（非表示側のミキサーは止まっているだけ）
+        const name = STATE_CLIPS[state] ?? 'Idle';
+        Object.keys(this.anim).forEach(key => this._playClip(key, name));
+    }
+
+    // 口の開き（0〜1）と口形（'Open' | 'A' | 'I' | 'U' | 'E' | 'O'）。
+    // 発話の区切りごとに 1 を渡せば、毎フレーム減衰して口パクになる
+    setMouth(level, viseme = 'Open') {
+        this.lip.target = THREE.MathUtils.clamp(level, 0, 1);
+        this.lip.viseme = viseme;
     }
 
-    // ── Bug モデル: アニメーションクリップ切り替え ────────────────────
-    _bugPlayClip(name) {
-        if (!this.bugMixer || !this.bugClips) return;
-        const clip = this.bugClips[name];
-        if (!clip) return;
-        if (this.bugCurrentClip === name) return;
-        this.bugCurrentClip = name;
+    // 移動速度（m/s）。running 中は Walk / Jog / Run の重みと再生速度に反映される
+    setSpeed(v) {
+        this.speed = v;
+        Object.values(this.anim).forEach(a => { if (a.locoOn) this._updateLoco(a); });
+    }
+
+    // ── アニメーションクリップ切り替え（0.3 秒クロスフェード） ────────
+    _playClip(key, name) {
+        const a = this.anim[key];
+        if (name === 'Run' && a?.loco.length > 1) return this._playLoco(a);
+        const clip = a?.clips[name];
+        if (!clip || a.current?.getClip() === clip) return;
 
-        const next = this.bugMixer.clipAction(clip);
+        const next = a.mixer.clipAction(clip);
         next.setLoop(THREE.LoopRepeat, Infinity);
         next.reset();
 
-        // 現在再生中のものをクロスフェード
-        const prev = this.bugMixer._actions.find(a => a.isRunning() && a !== next);
-        if (prev) {
-            next.crossFadeFrom(prev, 0.3, true);
+        // 現在再生中のものをクロスフェード（Blink など重ねて再生するものは除く）
+        if (a.locoOn) {
+            a.loco.forEach(l => l.action.fadeOut(LOCO_FADE));
+            a.locoOn = false;
+            next.fadeIn(LOCO_FADE);
+        } else if (a.current) {
+            next.crossFadeFrom(a.current, LOCO_FADE, true);
         }
         next.play();
+        a.current = next;
+    }
+
+    // ── 移動ブレンド（Walk / Jog / Run を同時再生して重みで混ぜる） ──────
+    // 全クリップを時刻 0 から揃えて始め、再生速度を「1 周期の長さ / 混ぜた周期」に
+    // するので、正規化した位相（= 接地のタイミング）は常に一致し足が滑らない。
+    _playLoco(a) {
+        if (a.locoOn) return;
+        a.current?.fadeOut(LOCO_FADE);
+        a.current = null;
+        a.loco.forEach(l => l.action.setLoop(THREE.LoopRepeat, Infinity).reset().fadeIn(LOCO_FADE).play());
+        a.locoOn = true;
+        this._updateLoco(a);
+    }
+
+    _updateLoco(a) {
+        const L = a.loco;
+        const v = THREE.MathUtils.clamp(this.speed ?? L[L.length - 1].speed, L[0].speed, L[L.length - 1].speed);
+        // 区分線形の 1D ブレンド（隣り合う 2 クリップだけが重みを持つ）
+        const i = Math.max(1, L.findIndex(l => l.speed >= v));
+        const f = (v - L[i - 1].speed) / (L[i].speed - L[i - 1].speed);
+        const w = L.map((_, j) => j === i - 1 ? 1 - f : j === i ? f : 0);
+        const period = L.reduce((s, l, j) => s + w[j] * l.action.getClip().duration, 0);
+        // weight はフェードの係数と掛け合わされるので、フェード中でも直接書いてよい
+        L.forEach((l, j) => {
+            l.action.weight = w[j];
+            l.action.timeScale = l.action.getClip().duration / period;
+        });
     }
 
     // ================================================================
@@ -403,66 +548,49 @@ class KyurokuScene {
             const dt = Math.min(this.clock.getDelta(), 0.05);
             const t  = this.clock.getElapsedTime();
             if (this.model) {
-                if (this.form === 'bug') {
-                    // AnimationMixer で再生
-                    if (this.bugMixer) this.bugMixer.update(dt);
-                    this.bugModel.position.y = this.baseY.bug;
-                } else {
-                    this._blink(dt);
-                    this._emblemPulse(t);
-                    switch (this.state) {
-                        case 'running':   this._animRun(dt, t);  break;
-                        case 'talking':   this._animTalk(t);     break;
-                        case 'listening': this._animListen(t);   break;
-                        case 'thinking':  this._animThink(t);    break;
-                        default:          this._animIdle(t);     break;
-                    }
-                }
+                // 関節・揺れ・まばたきは GLB のクリップを AnimationMixer で再生
+                const key = this.form === 'bug' ? 'bug' : 'kyuroku';
+                this._blink(key, dt);
+                if (key === 'kyuroku') this._emblemPulse(t);
+                this.anim[key]?.mixer.update(dt);
+                if (key === 'kyuroku') this._lipSync(dt);
             }
             this.renderer.render(this.scene, this.camera);
         };
         loop();
     }
 
-    // ── まばたき ─────────────────────────────────────────────────────
-    _blink(dt) {
+    // ── まばたき（Blink クリップを乱数の間隔で 1 回重ねて再生） ─────────
+    // kyuroku は目のモーフ Blink の重み、bug はまぶたのボーンを動かすクリップ。
+    // Blink クリップの無い bug GLB（配置中の bug_animated.glb）はまぶたのボーンを直接縮める
+    _blink(key, dt) {
+        if (key === 'bug' && this.blinkT !== null) this._blinkLids(dt);
         this.blinkTimer -= dt;
-        if (this.blinkTimer <= 0 && !this.isBlinking) {
-            this.isBlinking = true; this.blinkT = 0;
-            this.blinkTimer = 4 + Math.random() * 3.5;
-        }
-        if (!this.isBlinking) return;
+        if (this.blinkTimer > 0) return;
+        this.blinkTimer = 4 + Math.random() * 3.5;
+        const a = this.anim[key];
+        if (a?.clips.Blink) a.mixer.clipAction(a.clips.Blink).setLoop(THREE.LoopOnce, 1).reset().play();
+        else if (key === 'bug' && this.bugLids.length) this.blinkT = 0;
+    }
 
+    // まぶたのボーンの y スケール（クリップはこのボーンのスケールを書かないので上書きされない）
+    _blinkLids(dt) {
         this.blinkT += dt * 9;
         const sy = this.blinkT < Math.PI ? Math.max(0.05, 1 - Math.sin(this.blinkT) * 7) : 1;
+        this.bugLids.forEach(o => { o.scale.y = sy; });
+        if (this.blinkT >= Math.PI) this.blinkT = null;
+    }
 
-        if (this.form === 'bug') {
-            // Biped eyelid ボーンをスケール
-            ['Bone Eyelid_L_032','Bone Eyelid_R_033'].forEach(n => {
-                const o = this.bugModel?.getObjectByName(n);
-                if (o) o.scale.y = sy;
-            });
-        } else {
-            ['EyeL','EyeR'].forEach(n => {
-                const o = this.kyurokuModel?.getObjectByName(n);
-                if (o) o.scale.z = sy;
-            });
-        }
-
-        if (this.blinkT >= Math.PI) {
-            this.isBlinking = false;
-            if (this.form === 'bug') {
-                ['Bone Eyelid_L_032','Bone Eyelid_R_033'].forEach(n => {
-                    const o = this.bugModel?.getObjectByName(n);
-                    if (o) o.scale.y = 1;
-                });
-            } else {
-                ['EyeL','EyeR'].forEach(n => {
-                    const o = this.kyurokuModel?.getObjectByName(n);
-                    if (o) o.scale.z = 1;
-                });
-            }
-        }
+    // ── リップシンク（Mouth のモーフの重みを 1 つだけ書く。混ぜるのは GPU） ──
+    _lipSync(dt) {
+        if (!this.mouth) return;
+        const L = this.lip;
+        L.value += (L.target - L.value) * Math.min(1, dt * 25);
+        L.target = Math.max(0, L.target - dt * 6);
+        const dict = this.mouth.morphTargetDictionary;
+        const inf  = this.mouth.morphTargetInfluences;
+        inf.fill(0);
+        inf[dict[L.viseme] ?? dict.Open] = L.value;
     }
 
     // ── エンブレム脈動（kyuroku のみ） ───────────────────────────────
@@ -472,97 +600,6 @@ class KyurokuScene {
         this.emblemPt.intensity = 0.8 + Math.sin(t * 2.5) * 0.3;
     }
 
-    // ── 関節リセット ─────────────────────────────────────────────────
-    _reset() {
-        if (!this.model) return;
-        const baseY = (this.form === 'bug') ? this.baseY.bug : this.baseY.kyuroku;
-        this.model.position.y = baseY;
-        // bug モデルは向きを変えない（Sketchfab標準向き）、kyuroku は 180°補正
-        this.model.rotation.set(0, this.form === 'bug' ? 0 : Math.PI, 0);
-        Object.values(this.J).forEach(j => j.rotation.set(0, 0, 0));
-    }
-
-    // ── idle ─────────────────────────────────────────────────────────
-    _animIdle(t) {
-        this._reset();
-        const J = this.J;
-        const bob = Math.sin(t * 1.1) * 0.018;
-        if (this.model) this.model.position.y += bob;
-
-        if (J.Head)  { J.Head.rotation.y = Math.sin(t * 0.66) * 0.07; J.Head.rotation.z = Math.sin(t * 0.52) * 0.03; }
-        if (J.Spine) J.Spine.rotation.x = Math.sin(t * 0.7) * 0.008;
-
-        if (J.UpperArmL) { J.UpperArmL.rotation.z =  0.10; J.UpperArmL.rotation.x = 0.06; }
-        if (J.UpperArmR) { J.UpperArmR.rotation.z = -0.10; J.UpperArmR.rotation.x = 0.06; }
-        if (J.LowerArmL) J.LowerArmL.rotation.x = 0.12;
-        if (J.LowerArmR) J.LowerArmR.rotation.x = 0.12;
-    }
-
-    // ── running ──────────────────────────────────────────────────────
-    _animRun(dt, t) {
-        this._reset();
-        const J = this.J;
-        this.runPhase += dt * 7.0;
-        const ph = this.runPhase;
-
-        const bob = Math.abs(Math.sin(ph)) * 0.055 - 0.022;
-        if (this.model) this.model.position.y += bob;
-
-        if (J.Spine) J.Spine.rotation.x = -0.14;
-        if (J.Head)  J.Head.rotation.x  =  0.10;
-
-        if (J.ThighL) J.ThighL.rotation.x =  Math.sin(ph) * 0.70;
-        if (J.ThighR) J.ThighR.rotation.x = -Math.sin(ph) * 0.70;
-        if (J.ShinL)  J.ShinL.rotation.x  =  Math.max(0, -Math.sin(ph)) * 0.85;
-        if (J.ShinR)  J.ShinR.rotation.x  =  Math.max(0,  Math.sin(ph)) * 0.85;
-        if (J.FootL)  J.FootL.rotation.x  = -0.20 + Math.sin(ph) * 0.20;
-        if (J.FootR)  J.FootR.rotation.x  = -0.20 - Math.sin(ph) * 0.20;
-
-        if (J.UpperArmL) { J.UpperArmL.rotation.x = -Math.sin(ph) * 0.60; J.UpperArmL.rotation.z =  0.16; }
-        if (J.UpperArmR) { J.UpperArmR.rotation.x =  Math.sin(ph) * 0.60; J.UpperArmR.rotation.z = -0.16; }
-        if (J.LowerArmL) J.LowerArmL.rotation.x = 0.45 + Math.max(0,  Math.sin(ph)) * 0.45;
-        if (J.LowerArmR) J.LowerArmR.rotation.x = 0.45 + Math.max(0, -Math.sin(ph)) * 0.45;
-    }
-
-    // ── talking ───────────────────────────────────────────────────────
-    _animTalk(t) {
-        this._reset();
-        const J = this.J;
-        if (this.model) this.model.position.y += Math.sin(t * 4.2) * 0.012;
-        if (J.Head)  { J.Head.rotation.x = Math.sin(t * 4.2) * 0.13; J.Head.rotation.y = Math.sin(t * 2.6) * 0.09; }
-        if (J.Spine) J.Spine.rotation.x = -0.06;
-        if (J.UpperArmR) { J.UpperArmR.rotation.x = -0.58 + Math.sin(t * 4.2) * 0.16; J.UpperArmR.rotation.z = -0.32; }
-        if (J.LowerArmR) J.LowerArmR.rotation.x = 0.70 + Math.sin(t * 4.2) * 0.14;
-        if (J.UpperArmL) { J.UpperArmL.rotation.z = 0.14; J.UpperArmL.rotation.x = 0.05; }
-        if (J.LowerArmL) J.LowerArmL.rotation.x = 0.15;
-    }
-
-    // ── listening ────────────────────────────────────────────────────
-    _animListen(t) {
-        this._reset();
-        const J = this.J;
-        if (this.model) this.model.position.y += Math.sin(t * 0.9) * 0.010;
-        if (J.Spine) J.Spine.rotation.x = -0.09;
-        if (J.Head)  { J.Head.rotation.z = 0.145; J.Head.rotation.x = -0.07; J.Head.rotation.y = Math.sin(t * 0.48) * 0.04; }
-        if (J.UpperArmL) { J.UpperArmL.rotation.z =  0.14; J.UpperArmL.rotation.x = 0.04; }
-        if (J.UpperArmR) { J.UpperArmR.rotation.z = -0.14; J.UpperArmR.rotation.x = 0.04; }
-        if (J.LowerArmL) J.LowerArmL.rotation.x = 0.12;
-        if (J.LowerArmR) J.LowerArmR.rotation.x = 0.12;
-    }
-
-    // ── thinking ──────────────────────────────────────────────────────
-    _animThink(t) {
-        this._reset();
-        const J = this.J;
-        if (this.model) this.model.position.y += Math.sin(t * 0.8) * 0.010;
-        if (J.Head)  { J.Head.rotation.z = -0.16; J.Head.rotation.x = 0.09; J.Head.rotation.y = Math.sin(t * 0.55) * 0.05; }
-        if (J.Spine) J.Spine.rotation.x = -0.05;
-        if (J.UpperArmR) { J.UpperArmR.rotation.x = -0.82; J.UpperArmR.rotation.z = -0.58; }
-        if (J.LowerArmR) J.LowerArmR.rotation.x = 1.12;
-        if (J.UpperArmL) { J.UpperArmL.rotation.z = 0.14; J.UpperArmL.rotation.x = 0.06; }
-        if (J.LowerArmL) J.LowerArmL.rotation.x = 0.18;
-    }
-
     // ── ローディングUI ────────────────────────────────────────────────
     _showLoading(show) {
         let el = document.getElementById('glb-loading');